@@ -15,13 +15,15 @@ import logging
 import json
 import signal
 import time
-import asyncio
-from typing import Dict, Any, Optional, List
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional, List, Tuple
 from datetime import datetime
-from functools import wraps
 
 import requests
-from flask import Flask, request, jsonify, render_template
+from requests.adapters import HTTPAdapter
+from flask import Flask, Response, request, jsonify, render_template, stream_with_context
 from flask_cors import CORS
 import paho.mqtt.client as mqtt
 
@@ -44,6 +46,11 @@ except ImportError:
     
     DECK_AVAILABLE = False
 
+try:
+    from deck_worker import DeckWorker, DeckQueueFull, DeckCallTimeout
+except ImportError:
+    from nextcloud.deck_worker import DeckWorker, DeckQueueFull, DeckCallTimeout
+
 # Konfiguration aus Umgebungsvariablen
 APP_ID = os.environ.get('APP_ID', 'swissairdry')
 APP_VERSION = os.environ.get('APP_VERSION', '1.0.0')
@@ -63,6 +70,28 @@ MQTT_PASSWORD = os.environ.get('MQTT_PASSWORD', '')
 MQTT_CLIENT_ID = f'exapp-{APP_ID}-daemon'
 MQTT_TOPIC_PREFIX = os.environ.get('MQTT_TOPIC_PREFIX', 'swissairdry')
 
+# API-Proxy
+PROXY_POOL_SIZE = int(os.environ.get('PROXY_POOL_SIZE', 20))
+PROXY_CHUNK_SIZE = int(os.environ.get('PROXY_CHUNK_SIZE', 64 * 1024))
+PROXY_TIMEOUT = float(os.environ.get('PROXY_TIMEOUT', 30))
+PROXY_CONNECT_TIMEOUT = float(os.environ.get('PROXY_CONNECT_TIMEOUT', 5))
+# Zwischenspeicher für GET-Antworten (TTL 0 = deaktiviert)
+PROXY_CACHE_TTL = float(os.environ.get('PROXY_CACHE_TTL', 0))
+PROXY_CACHE_MAX_ENTRIES = int(os.environ.get('PROXY_CACHE_MAX_ENTRIES', 256))
+PROXY_CACHE_MAX_BYTES = int(os.environ.get('PROXY_CACHE_MAX_BYTES', 256 * 1024))
+
+# Header, die nicht weitergereicht werden (Verbindungs-Header nach RFC 7230)
+HOP_BY_HOP_HEADERS = {
+    'connection', 'keep-alive', 'proxy-authenticate', 'proxy-authorization',
+    'te', 'trailers', 'transfer-encoding', 'upgrade', 'host',
+}
+# Content-Length der Anfrage setzt requests selbst (siehe SizedStream), sonst würden
+# Content-Length und Transfer-Encoding: chunked gleichzeitig gesendet
+PROXY_REQUEST_SKIP_HEADERS = HOP_BY_HOP_HEADERS | {'content-length'}
+# Anfrage-Header, die in den Cache-Schlüssel eingehen; eine Antwort mit Vary auf
+# andere Header wird nicht zwischengespeichert
+PROXY_CACHE_KEY_HEADERS = ('Authorization', 'X-API-Key', 'Cookie', 'Accept-Encoding')
+
 # Logging konfigurieren
 logging.basicConfig(
     level=logging.INFO,
@@ -81,27 +110,21 @@ CORS(app)
 # MQTT-Client initialisieren
 mqtt_client = None
 
+# Gemeinsame HTTP-Session mit Verbindungspool für den API-Proxy
+api_session = requests.Session()
+_adapter = HTTPAdapter(pool_connections=PROXY_POOL_SIZE, pool_maxsize=PROXY_POOL_SIZE, max_retries=0)
+api_session.mount('http://', _adapter)
+api_session.mount('https://', _adapter)
+
+# Zwischenspeicher für GET-Antworten: Schlüssel -> (Ablaufzeit, Status, Header, Inhalt)
+proxy_cache: "OrderedDict[str, Tuple[float, int, List[Tuple[str, str]], bytes]]" = OrderedDict()
+proxy_cache_lock = threading.Lock()
+
 # Deck-Integration
 deck_integration: Optional[SwissAirDryDeckIntegration] = None
 deck_initialized = False
-
-
-def async_route(route_function):
-    """Decorator für asynchrone Flask-Routen"""
-    @wraps(route_function)
-    def wrapper(*args, **kwargs):
-        try:
-            loop = asyncio.get_event_loop()
-        except RuntimeError:
-            # Kein Event-Loop im aktuellen Thread, erstelle einen neuen
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-        
-        # Führe die asynchrone Funktion aus und warte auf das Ergebnis
-        result = loop.run_until_complete(route_function(*args, **kwargs))
-        return result
-    
-    return wrapper
+# Führt alle Deck-Operationen in einem gemeinsamen Event-Loop aus
+deck_worker: Optional[DeckWorker] = None
 
 
 def setup_mqtt():
@@ -131,7 +154,7 @@ def setup_mqtt():
 
 def setup_deck_integration():
     """Initialisiert die Deck-Integration, falls konfiguriert"""
-    global deck_integration, deck_initialized
+    global deck_integration, deck_initialized, deck_worker
     
     if not DECK_AVAILABLE:
         logger.warning("Deck-Integration nicht verfügbar. Stelle sicher, dass swissairdry.integration.deck importiert werden kann.")
@@ -150,10 +173,10 @@ def setup_deck_integration():
             board_name="SwissAirDry ExApp"
         )
         
-        # Event-Loop für die asynchrone Initialisierung
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        deck_initialized = loop.run_until_complete(deck_integration.initialize())
+        # Worker-Thread mit eigenem Event-Loop für alle Deck-Operationen
+        deck_worker = DeckWorker(deck_integration)
+        deck_worker.start()
+        deck_initialized = deck_worker.call(deck_integration.initialize())
         
         if deck_initialized:
             logger.info("Deck-Integration erfolgreich initialisiert")
@@ -187,7 +210,7 @@ def on_mqtt_message(client, userdata, msg):
         logger.debug(f"MQTT-Nachricht empfangen: {topic} - {payload}")
         
         # Überprüfe auf Alarme für die Deck-Integration
-        if DECK_AVAILABLE and deck_initialized and deck_integration and "/alarm" in topic:
+        if DECK_AVAILABLE and deck_initialized and deck_integration and topic.endswith("/alarm"):
             try:
                 parts = topic.split('/')
                 if len(parts) >= 2:
@@ -195,26 +218,15 @@ def on_mqtt_message(client, userdata, msg):
                     
                     # Parse JSON payload
                     alarm_data = json.loads(payload)
+                    if alarm_data.get('state') == 'resolved':
+                        # Aufgehobene Alarme erzeugen keine Karte
+                        return
                     alarm_type = alarm_data.get('type', 'Unbekannt')
                     alarm_description = alarm_data.get('description', 'Keine Details verfügbar')
                     
-                    # Erstelle Event-Loop für die asynchrone Funktion
-                    loop = asyncio.new_event_loop()
-                    asyncio.set_event_loop(loop)
-                    
-                    # Erstelle Alarm-Karte in Deck
-                    success = loop.run_until_complete(
-                        deck_integration.create_alarm_card(
-                            device_id=device_id,
-                            alarm_type=alarm_type,
-                            description=alarm_description
-                        )
-                    )
-                    
-                    if success:
-                        logger.info(f"Alarm-Karte für {device_id} erstellt: {alarm_type}")
-                    else:
-                        logger.error(f"Fehler beim Erstellen der Alarm-Karte für {device_id}")
+                    # Alarm-Karte im Deck-Worker anlegen lassen (nicht blockierend,
+                    # Wiederholungen werden dort zusammengefasst)
+                    deck_worker.submit_alarm(device_id, alarm_type, alarm_description)
             except Exception as e:
                 logger.error(f"Fehler bei der Verarbeitung der Alarm-Nachricht: {e}")
         
@@ -261,36 +273,145 @@ def status():
     })
 
 
+class SizedStream:
+    """
+    Eingabestrom der Anfrage mit bekannter Länge.
+
+    requests erkennt die Länge über __len__ und sendet den Inhalt mit
+    Content-Length statt mit Transfer-Encoding: chunked.
+    """
+
+    def __init__(self, stream, length: int):
+        self.stream = stream
+        self.length = length
+
+    def __len__(self) -> int:
+        return self.length
+
+    def read(self, size: int = -1) -> bytes:
+        return self.stream.read(size)
+
+
+def proxy_cache_key(url: str) -> str:
+    """Cache-Schlüssel aus URL, Query-Parametern, Zugangsdaten und Accept-Encoding der Anfrage"""
+    key_headers = '|'.join(request.headers.get(name, '') for name in PROXY_CACHE_KEY_HEADERS)
+    query = '&'.join(f"{k}={v}" for k, v in sorted(request.args.items(multi=True)))
+    return hashlib.sha256(f"{url}?{query}#{key_headers}".encode('utf-8')).hexdigest()
+
+
+def proxy_cache_get(key: str) -> Optional[Tuple[int, List[Tuple[str, str]], bytes]]:
+    """Gibt eine gültige Antwort aus dem Zwischenspeicher zurück"""
+    with proxy_cache_lock:
+        entry = proxy_cache.get(key)
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic():
+            del proxy_cache[key]
+            return None
+        proxy_cache.move_to_end(key)
+        return entry[1:]
+
+
+def proxy_cache_put(key: str, status_code: int, headers: List[Tuple[str, str]], content: bytes):
+    """Legt eine Antwort im Zwischenspeicher ab und verdrängt die älteste bei Bedarf"""
+    with proxy_cache_lock:
+        proxy_cache[key] = (time.monotonic() + PROXY_CACHE_TTL, status_code, headers, content)
+        proxy_cache.move_to_end(key)
+        while len(proxy_cache) > PROXY_CACHE_MAX_ENTRIES:
+            proxy_cache.popitem(last=False)
+
+
+def is_cacheable(resp: requests.Response) -> bool:
+    """Prüft, ob eine GET-Antwort zwischengespeichert werden darf"""
+    if PROXY_CACHE_TTL <= 0 or resp.status_code != 200:
+        return False
+    cache_control = resp.headers.get('Cache-Control', '').lower()
+    if 'no-store' in cache_control or 'private' in cache_control:
+        return False
+    # Nur Varianten zwischenspeichern, die der Cache-Schlüssel unterscheidet
+    vary = {name.strip().lower() for name in resp.headers.get('Vary', '').split(',') if name.strip()}
+    if vary - {name.lower() for name in PROXY_CACHE_KEY_HEADERS}:
+        return False
+    length = resp.headers.get('Content-Length')
+    return length is not None and length.isdigit() and int(length) <= PROXY_CACHE_MAX_BYTES
+
+
 @app.route('/api/proxy', methods=['GET', 'POST', 'PUT', 'DELETE'])
 def api_proxy():
-    """Proxy-Endpunkt für API-Anfragen"""
+    """
+    Proxy-Endpunkt für API-Anfragen.
+    
+    Anfrage- und Antwortinhalte werden blockweise durchgereicht, damit auch
+    große Exporte und Berichte mit konstantem Speicherbedarf übertragen werden.
+    Kleine GET-Antworten können optional zwischengespeichert werden.
+    """
     if not API_URL:
         return jsonify({'error': 'API_URL nicht konfiguriert'}), 500
     
+    # Ziel-URL konstruieren
+    path = request.args.get('path', '')
+    url = f"{API_URL}/{path.lstrip('/')}"
+    
+    cache_key = None
+    if request.method == 'GET' and PROXY_CACHE_TTL > 0:
+        cache_key = proxy_cache_key(url)
+        cached = proxy_cache_get(cache_key)
+        if cached is not None:
+            status_code, headers, content = cached
+            return Response(content, status=status_code, headers=headers)
+    
     try:
-        # Ziel-URL konstruieren
-        path = request.args.get('path', '')
-        url = f"{API_URL}/{path.lstrip('/')}"
-        
-        # Anfrage an API weiterleiten
-        headers = {k: v for k, v in request.headers.items() if k.lower() not in ['host', 'content-length']}
-        resp = requests.request(
+        # Anfrage über die gemeinsame Session weiterleiten, der Inhalt wird
+        # direkt aus dem Eingabestrom gelesen
+        headers = {k: v for k, v in request.headers.items() if k.lower() not in PROXY_REQUEST_SKIP_HEADERS}
+        if request.content_length:
+            # Bekannte Länge: mit Content-Length weiterleiten
+            body = SizedStream(request.stream, request.content_length)
+        elif request.headers.get('Transfer-Encoding', '').lower() == 'chunked':
+            # Unbekannte Länge: requests sendet den Inhalt chunked
+            body = request.stream
+        else:
+            body = None
+        resp = api_session.request(
             method=request.method,
             url=url,
             headers=headers,
             params=request.args,
-            json=request.json if request.is_json else None,
-            data=request.form if request.form else request.data,
-            cookies=request.cookies,
-            allow_redirects=False
+            data=body,
+            allow_redirects=False,
+            stream=True,
+            timeout=(PROXY_CONNECT_TIMEOUT, PROXY_TIMEOUT),
         )
-        
-        # Antwort zurückgeben
-        response_headers = {k: v for k, v in resp.headers.items() if k.lower() not in ['content-encoding', 'transfer-encoding']}
-        return (resp.content, resp.status_code, response_headers)
-    except Exception as e:
+    except requests.RequestException as e:
         logger.error(f"Proxy-Fehler: {e}")
-        return jsonify({'error': str(e)}), 500
+        return jsonify({'error': str(e)}), 502
+    
+    # Inhalte unverändert (auch komprimiert) weiterreichen, Content-Encoding
+    # und Content-Length bleiben daher gültig
+    response_headers = [(k, v) for k, v in resp.headers.items() if k.lower() not in HOP_BY_HOP_HEADERS]
+    
+    if cache_key is not None and is_cacheable(resp):
+        try:
+            content = resp.raw.read(decode_content=False)
+        finally:
+            resp.close()
+        proxy_cache_put(cache_key, resp.status_code, response_headers, content)
+        return Response(content, status=resp.status_code, headers=response_headers)
+    
+    def generate():
+        try:
+            for chunk in resp.raw.stream(PROXY_CHUNK_SIZE, decode_content=False):
+                yield chunk
+        finally:
+            # Verbindung an den Pool zurückgeben
+            resp.close()
+    
+    return Response(
+        stream_with_context(generate()),
+        status=resp.status_code,
+        headers=response_headers,
+        direct_passthrough=True,
+    )
 
 
 @app.route('/mqtt/publish', methods=['POST'])
@@ -340,13 +461,14 @@ def deck_status():
         'status': 'ok',
         'initialized': deck_initialized,
         'board_id': getattr(deck_integration, 'board_id', None),
-        'stacks': getattr(deck_integration, 'stacks', {})
+        'stacks': getattr(deck_integration, 'stacks', {}),
+        'worker': deck_worker.status() if deck_worker else None,
+        'metadata_cache': deck_integration.metadata.status() if hasattr(deck_integration, 'metadata') else None
     })
 
 
 @app.route('/deck/boards')
-@async_route
-async def get_boards():
+def get_boards():
     """Holt alle verfügbaren Boards von Deck"""
     if not DECK_AVAILABLE:
         return jsonify({'error': 'Deck-Integration nicht verfügbar'}), 501
@@ -367,8 +489,7 @@ async def get_boards():
 
 
 @app.route('/deck/jobs', methods=['POST'])
-@async_route
-async def create_job_board():
+def create_job_board():
     """Erstellt ein neues Job-Board in Deck"""
     if not DECK_AVAILABLE:
         return jsonify({'error': 'Deck-Integration nicht verfügbar'}), 501
@@ -387,8 +508,10 @@ async def create_job_board():
         status = data.get('status', 'Aktiv')
         details = data.get('details', {})
         
-        # Job-Karte erstellen
-        success = await deck_integration.create_job_card(job_id, title, description, status, details)
+        # Job-Karte im Deck-Worker erstellen
+        success = deck_worker.call(
+            deck_integration.create_job_card(job_id, title, description, status, details)
+        )
         
         if success:
             return jsonify({
@@ -401,14 +524,17 @@ async def create_job_board():
                 'message': f"Fehler beim Erstellen des Job-Boards für {job_id}"
             }), 500
             
+    except DeckQueueFull as e:
+        return jsonify({'error': str(e)}), 503
+    except DeckCallTimeout as e:
+        return jsonify({'error': str(e)}), 504
     except Exception as e:
         logger.error(f"Fehler beim Erstellen des Job-Boards: {e}")
         return jsonify({'error': str(e)}), 500
 
 
 @app.route('/deck/alarms', methods=['POST'])
-@async_route
-async def create_alarm():
+def create_alarm():
     """Erstellt eine Alarm-Karte in Deck"""
     if not DECK_AVAILABLE:
         return jsonify({'error': 'Deck-Integration nicht verfügbar'}), 501
@@ -426,8 +552,10 @@ async def create_alarm():
         description = data.get('description', '')
         timestamp = datetime.now()
         
-        # Alarm-Karte erstellen
-        success = await deck_integration.create_alarm_card(device_id, alarm_type, description, timestamp)
+        # Alarm-Karte im Deck-Worker erstellen
+        success = deck_worker.call(
+            deck_integration.create_alarm_card(device_id, alarm_type, description, timestamp)
+        )
         
         if success:
             return jsonify({
@@ -440,6 +568,10 @@ async def create_alarm():
                 'message': f"Fehler beim Erstellen der Alarm-Karte für {device_id}"
             }), 500
             
+    except DeckQueueFull as e:
+        return jsonify({'error': str(e)}), 503
+    except DeckCallTimeout as e:
+        return jsonify({'error': str(e)}), 504
     except Exception as e:
         logger.error(f"Fehler beim Erstellen der Alarm-Karte: {e}")
         return jsonify({'error': str(e)}), 500
@@ -451,6 +583,8 @@ def signal_handler(sig, frame):
     if mqtt_client:
         mqtt_client.loop_stop()
         mqtt_client.disconnect()
+    if deck_worker:
+        deck_worker.stop()
     sys.exit(0)
 
 
@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+SwissAirDry ExApp - Deck-Worker
+
+Führt alle Deck-Operationen des Daemons in einem langlebigen asyncio-Thread aus,
+statt pro MQTT-Nachricht oder Flask-Anfrage einen eigenen Event-Loop zu erstellen.
+
+Alarme werden nicht sofort als Karte angelegt, sondern in einer begrenzten
+Warteschlange gesammelt. Wiederholte Alarme desselben Geräts und Typs werden
+zusammengefasst: solange ein Alarm wartet, erhöht sich nur sein Zähler, und
+innerhalb von DECK_ALARM_COALESCE Sekunden nach einer angelegten Karte entsteht
+keine weitere. Der Worker verarbeitet die Alarme in Batches mit begrenzter
+Parallelität, sodass ein Alarmsturm nur wenige HTTP-Aufrufe erzeugt.
+
+@author Swiss Air Dry Team <info@swissairdry.com>
+@copyright 2023-2025 Swiss Air Dry Team
+"""
+
+import os
+import time
+import asyncio
+import logging
+import threading
+import concurrent.futures
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Awaitable, Dict, Optional, Tuple
+
+logger = logging.getLogger('exapp_daemon')
+
+DECK_QUEUE_SIZE = int(os.environ.get('DECK_QUEUE_SIZE', 1000))
+DECK_BATCH_WINDOW = float(os.environ.get('DECK_BATCH_WINDOW', 1.0))
+DECK_BATCH_SIZE = int(os.environ.get('DECK_BATCH_SIZE', 20))
+DECK_CONCURRENCY = int(os.environ.get('DECK_CONCURRENCY', 4))
+DECK_ALARM_COALESCE = float(os.environ.get('DECK_ALARM_COALESCE', 300))
+DECK_CALL_TIMEOUT = float(os.environ.get('DECK_CALL_TIMEOUT', 30))
+
+
+class DeckQueueFull(Exception):
+    """Die Warteschlange des Deck-Workers ist voll"""
+    pass
+
+
+class DeckCallTimeout(Exception):
+    """Ein Deck-Aufruf hat das Zeitlimit überschritten und wurde abgebrochen"""
+    pass
+
+
+class PendingAlarm:
+    """Ein wartender Alarm mit allen zusammengefassten Wiederholungen"""
+
+    def __init__(self, device_id: str, alarm_type: str, description: str, timestamp: datetime):
+        self.device_id = device_id
+        self.alarm_type = alarm_type
+        self.description = description
+        self.first_seen = timestamp
+        self.last_seen = timestamp
+        self.count = 1
+
+    def merge(self, description: str, timestamp: datetime):
+        """Fasst eine Wiederholung mit diesem Alarm zusammen"""
+        self.description = description or self.description
+        self.last_seen = timestamp
+        self.count += 1
+
+    def card_description(self) -> str:
+        """Beschreibung der Karte inklusive Anzahl der Meldungen"""
+        if self.count == 1:
+            return self.description
+        return (
+            f"{self.description}\n\n"
+            f"{self.count} Meldungen zwischen {self.first_seen.strftime('%H:%M:%S')} "
+            f"und {self.last_seen.strftime('%H:%M:%S')}"
+        )
+
+
+class DeckWorker:
+    """Langlebiger asyncio-Thread für Deck-Operationen"""
+
+    def __init__(
+        self,
+        integration: Any,
+        queue_size: int = DECK_QUEUE_SIZE,
+        batch_window: float = DECK_BATCH_WINDOW,
+        batch_size: int = DECK_BATCH_SIZE,
+        concurrency: int = DECK_CONCURRENCY,
+        coalesce_window: float = DECK_ALARM_COALESCE,
+    ):
+        """
+        Initialisiert den Worker.
+
+        Args:
+            integration: Deck-Integration mit der Coroutine create_alarm_card
+            queue_size: Maximale Anzahl wartender Alarme und Aufrufe
+            batch_window: Sammelzeit in Sekunden, bevor ein Batch verarbeitet wird
+            batch_size: Maximale Anzahl an Alarmen pro Batch
+            concurrency: Maximale Anzahl gleichzeitiger Deck-Aufrufe
+            coalesce_window: Sekunden, in denen nach einer Karte keine weitere
+                für denselben Alarm angelegt wird
+        """
+        self.integration = integration
+        self.queue_size = queue_size
+        self.batch_window = batch_window
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.coalesce_window = coalesce_window
+
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._ready = threading.Event()
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._alarms_waiting: Optional[asyncio.Event] = None
+        # (Geräte-ID, Alarmtyp) -> wartender Alarm, nur im Worker-Thread verändert
+        self._pending: "OrderedDict[Tuple[str, str], PendingAlarm]" = OrderedDict()
+        # (Geräte-ID, Alarmtyp) -> Zeitpunkt der letzten angelegten Karte
+        self._recent: Dict[Tuple[str, str], float] = {}
+        self._calls_in_flight = 0
+        self._lock = threading.Lock()
+        self.stats = {
+            'alarms_received': 0,
+            'alarms_coalesced': 0,
+            'alarms_dropped': 0,
+            'cards_created': 0,
+            'cards_failed': 0,
+            'batches': 0,
+        }
+
+    # Steuerung (aus beliebigen Threads)
+
+    def start(self):
+        """Startet den Worker-Thread und wartet, bis sein Event-Loop läuft"""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name='deck-worker', daemon=True)
+        self._thread.start()
+        self._ready.wait()
+
+    def stop(self, timeout: float = 5.0):
+        """Beendet den Worker-Thread"""
+        if self.loop is None or self._thread is None:
+            return
+        if self._pending:
+            logger.warning(
+                f"Deck-Worker wird beendet, {len(self._pending)} wartende Alarme werden verworfen: "
+                + ", ".join(f"{device_id}/{alarm_type}" for device_id, alarm_type in self._pending)
+            )
+            self.stats['alarms_dropped'] += len(self._pending)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def call(self, coro: Awaitable, timeout: float = DECK_CALL_TIMEOUT) -> Any:
+        """
+        Führt eine Coroutine im Worker aus und wartet auf das Ergebnis.
+
+        Raises:
+            DeckQueueFull: Wenn bereits zu viele Aufrufe warten
+            DeckCallTimeout: Wenn der Aufruf länger als timeout dauert (er wird abgebrochen)
+        """
+        with self._lock:
+            if self._calls_in_flight >= self.queue_size:
+                # Coroutine schließen, damit keine Warnung "never awaited" entsteht
+                getattr(coro, 'close', lambda: None)()
+                raise DeckQueueFull("Zu viele ausstehende Deck-Aufrufe")
+            self._calls_in_flight += 1
+        try:
+            future = asyncio.run_coroutine_threadsafe(self._limited(coro), self.loop)
+        except BaseException:
+            self._call_finished(None)
+            raise
+        # Erst freigeben, wenn der Aufruf im Worker wirklich beendet ist, damit
+        # abgebrochene Aufrufe bis dahin gegen queue_size zählen
+        future.add_done_callback(self._call_finished)
+        try:
+            return future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise DeckCallTimeout(f"Deck-Aufruf nach {timeout:g} s abgebrochen")
+
+    def _call_finished(self, future):
+        """Gibt den Platz eines beendeten Aufrufs frei"""
+        with self._lock:
+            self._calls_in_flight -= 1
+
+    def submit_alarm(self, device_id: str, alarm_type: str, description: str,
+                     timestamp: Optional[datetime] = None):
+        """
+        Stellt einen Alarm zur Erstellung einer Karte ein (nicht blockierend).
+
+        Wiederholungen desselben Alarms werden zusammengefasst.
+        """
+        self.loop.call_soon_threadsafe(
+            self._enqueue_alarm, device_id, alarm_type, description, timestamp or datetime.now()
+        )
+
+    def status(self) -> Dict[str, Any]:
+        """Kennzahlen des Workers"""
+        return {
+            **self.stats,
+            'pending_alarms': len(self._pending),
+            'calls_in_flight': self._calls_in_flight,
+            'running': self._thread is not None and self._thread.is_alive(),
+        }
+
+    # Im Worker-Thread
+
+    def _run(self):
+        """Event-Loop des Worker-Threads"""
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self._alarms_waiting = asyncio.Event()
+        consumer = self.loop.create_task(self._process_alarms())
+        self._ready.set()
+        try:
+            self.loop.run_forever()
+        finally:
+            consumer.cancel()
+            self.loop.run_until_complete(asyncio.gather(consumer, return_exceptions=True))
+            self.loop.close()
+
+    async def _limited(self, coro: Awaitable) -> Any:
+        """Begrenzt die Anzahl gleichzeitiger Deck-Aufrufe"""
+        async with self._semaphore:
+            return await coro
+
+    def _enqueue_alarm(self, device_id: str, alarm_type: str, description: str,
+                       timestamp: datetime):
+        """Fasst einen Alarm mit einem wartenden zusammen oder stellt ihn ein"""
+        self.stats['alarms_received'] += 1
+        key = (device_id, alarm_type)
+
+        pending = self._pending.get(key)
+        if pending is not None:
+            pending.merge(description, timestamp)
+            self.stats['alarms_coalesced'] += 1
+            return
+
+        created_at = self._recent.get(key)
+        if created_at is not None and time.monotonic() - created_at < self.coalesce_window:
+            # Für diesen Alarm existiert bereits eine aktuelle Karte
+            self.stats['alarms_coalesced'] += 1
+            return
+
+        if len(self._pending) >= self.queue_size:
+            self.stats['alarms_dropped'] += 1
+            logger.warning(f"Deck-Warteschlange voll, Alarm {alarm_type} für {device_id} verworfen")
+            return
+
+        self._pending[key] = PendingAlarm(device_id, alarm_type, description, timestamp)
+        self._alarms_waiting.set()
+
+    async def _process_alarms(self):
+        """Verarbeitet wartende Alarme in Batches"""
+        while True:
+            await self._alarms_waiting.wait()
+            # Kurz sammeln, damit Wiederholungen noch zusammengefasst werden
+            await asyncio.sleep(self.batch_window)
+
+            batch = []
+            while self._pending and len(batch) < self.batch_size:
+                batch.append(self._pending.popitem(last=False)[1])
+            if not self._pending:
+                self._alarms_waiting.clear()
+
+            self.stats['batches'] += 1
+            results = await asyncio.gather(
+                *(self._limited(self._create_alarm_card(alarm)) for alarm in batch),
+                return_exceptions=True
+            )
+            for alarm, result in zip(batch, results):
+                if result is True:
+                    self.stats['cards_created'] += 1
+                    self._recent[(alarm.device_id, alarm.alarm_type)] = time.monotonic()
+                    logger.info(f"Alarm-Karte für {alarm.device_id} erstellt: {alarm.alarm_type}")
+                else:
+                    self.stats['cards_failed'] += 1
+                    error = f": {result}" if isinstance(result, Exception) else ""
+                    logger.error(
+                        f"Fehler beim Erstellen der Alarm-Karte für {alarm.device_id}{error}"
+                    )
+            self._prune_recent()
+
+    async def _create_alarm_card(self, alarm: PendingAlarm) -> bool:
+        """Legt die Karte für einen (zusammengefassten) Alarm an"""
+        return await self.integration.create_alarm_card(
+            device_id=alarm.device_id,
+            alarm_type=alarm.alarm_type,
+            description=alarm.card_description(),
+            timestamp=alarm.last_seen,
+        )
+
+    def _prune_recent(self):
+        """Entfernt abgelaufene Einträge der zuletzt angelegten Karten"""
+        limit = time.monotonic() - self.coalesce_window
+        for key in [key for key, created_at in self._recent.items() if created_at < limit]:
+            del self._recent[key]
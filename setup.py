@@ -25,6 +25,8 @@ setup(
     include_package_data=True,
     install_requires=[
         "aiofiles>=0.8.0",
+        "aiosqlite>=0.17.0",
+        "asyncpg>=0.25.0",
         "bcrypt>=3.2.0",
         "bleak>=0.14.0",
         "fastapi>=0.70.0",
@@ -35,6 +37,7 @@ setup(
         "httpx>=0.22.0",  # Für starlette.testclient
         "jinja2>=3.0.0",
         "markdown>=3.3.0",
+        "orjson>=3.9.0",
         "paho-mqtt>=1.6.0",
         "pandas>=1.3.0",
         "pillow>=9.0.0",
@@ -0,0 +1,465 @@
+"""
+SwissAirDry Alarmregeln
+-----------------------
+
+Serverseitige Auswertung von Alarmregeln auf den eingehenden Sensordaten.
+Regeln werden einmalig aus ihrer Konfiguration in Regelobjekte übersetzt.
+Für jedes Gerät hält die Engine pro Regel einen kleinen Zustandsautomaten
+(ok -> ausstehend -> ausgelöst -> ok), der bei jeder Messung inkrementell
+fortgeschrieben wird. Der Aufwand pro Messung ist damit proportional zur
+Anzahl der Regeln und unabhängig von der Länge des Verlaufs.
+
+Regelarten (Feld "kind"):
+    threshold    Messwert über/unter einem Grenzwert, optional für eine Mindestdauer
+    rate         Änderung eines Messwerts über ein Zeitfenster (z.B. Feuchte sinkt nicht)
+    power_relay  Relais eingeschaltet, aber keine Leistungsaufnahme
+    silence      Gerät sendet seit einer bestimmten Zeit keine Daten (ausgelöst
+                 über die Offline-Erkennung, der Timeout ist deren Standard-Frist)
+
+Die Regeln können über ALERT_RULES_FILE (JSON-Liste) angepasst werden, sonst
+gelten die Standardregeln aus DEFAULT_RULES.
+
+@author Swiss Air Dry Team <info@swissairdry.com>
+@copyright 2023-2025 Swiss Air Dry Team
+"""
+
+import os
+import json
+import time
+import logging
+import operator
+from typing import Dict, Iterable, List, Optional, Any, Tuple
+
+logger = logging.getLogger("swissairdry_api")
+
+ALERT_RULES_FILE = os.getenv("ALERT_RULES_FILE", "")
+
+DEFAULT_RULES = [
+    {"type": "high_humidity", "kind": "threshold", "metric": "humidity",
+     "op": ">", "threshold": 85.0, "duration": 600},
+    {"type": "high_temperature", "kind": "threshold", "metric": "temperature",
+     "op": ">", "threshold": 45.0, "duration": 60},
+    # Bei laufendem Gerät soll die Feuchte innerhalb einer Stunde um mindestens 2 % sinken
+    {"type": "humidity_not_dropping", "kind": "rate", "metric": "humidity",
+     "window": 3600, "max_delta": -2.0, "require_relay": True},
+    {"type": "power_zero_relay_on", "kind": "power_relay", "max_power": 5.0, "duration": 120},
+    {"type": "device_silent", "kind": "silence", "timeout": 900},
+]
+
+_OPERATORS = {
+    ">": operator.gt,
+    ">=": operator.ge,
+    "<": operator.lt,
+    "<=": operator.le,
+}
+
+# Zustände der Regelautomaten
+OK = 0
+PENDING = 1
+FIRING = 2
+
+
+class AlertEvent:
+    """Zustandswechsel einer Regel für ein Gerät"""
+
+    __slots__ = ("device_id", "alert_type", "fired", "message", "value", "threshold", "timestamp")
+
+    def __init__(
+        self,
+        device_id: str,
+        alert_type: str,
+        fired: bool,
+        message: str,
+        value: Optional[float] = None,
+        threshold: Optional[float] = None,
+        timestamp: Optional[float] = None,
+    ):
+        self.device_id = device_id
+        self.alert_type = alert_type
+        self.fired = fired  # True = ausgelöst, False = aufgehoben
+        self.message = message
+        self.value = value
+        self.threshold = threshold
+        self.timestamp = timestamp if timestamp is not None else time.time()
+
+    @property
+    def mqtt_topic(self) -> str:
+        """
+        Topic der Nachricht.
+
+        Ausgelöste Alarme gehen an swissairdry/<device_id>/alarm, aus dem die
+        ExApp-Deck-Integration Karten erstellt. Aufgehobene Alarme gehen an
+        swissairdry/<device_id>/alarm/resolved, damit sie keine Karte erzeugen.
+        """
+        topic = f"swissairdry/{self.device_id}/alarm"
+        return topic if self.fired else f"{topic}/resolved"
+
+    def to_mqtt_payload(self) -> Dict[str, Any]:
+        """Nachricht für mqtt_topic (Format der ExApp-Deck-Integration)."""
+        return {
+            "device_id": self.device_id,
+            "type": self.alert_type,
+            "description": self.message,
+            "state": "active" if self.fired else "resolved",
+            "value": self.value,
+            "threshold": self.threshold,
+            "timestamp": self.timestamp,
+        }
+
+
+class Rule:
+    """Basisklasse für Alarmregeln"""
+
+    # Regeln, die bei jeder Messung ausgewertet werden
+    per_reading = True
+
+    def __init__(self, alert_type: str, message: Optional[str] = None):
+        self.alert_type = alert_type
+        self.message = message
+
+    def new_state(self) -> List[Any]:
+        """Erzeugt den Anfangszustand für ein Gerät: [Zustand, seit, Regeldaten]."""
+        return [OK, 0.0, None]
+
+    def evaluate(self, state: List[Any], reading: Dict[str, Any],
+                 now: float) -> Optional[AlertEvent]:
+        """Schreibt den Zustand mit einer Messung fort und gibt ggf. einen Wechsel zurück."""
+        raise NotImplementedError
+
+
+class ConditionRule(Rule):
+    """Regel, die auslöst, wenn eine Bedingung eine Mindestdauer erfüllt ist"""
+
+    def __init__(self, alert_type: str, duration: float = 0.0, threshold: Optional[float] = None,
+                 message: Optional[str] = None):
+        super().__init__(alert_type, message)
+        self.duration = duration
+        self.threshold = threshold
+
+    def check(self, reading: Dict[str, Any]) -> Optional[float]:
+        """
+        Prüft die Bedingung.
+
+        Returns:
+            Optional[float]: Auslösender Messwert, None wenn die Bedingung nicht
+                erfüllt ist oder nicht geprüft werden kann
+        """
+        raise NotImplementedError
+
+    def describe(self, value: Optional[float]) -> str:
+        """Text der Alarmmeldung."""
+        return self.message or f"{self.alert_type}: {value}"
+
+    def evaluate(self, state, reading, now):
+        value = self.check(reading)
+        if value is None:
+            if state[0] == FIRING:
+                state[0] = OK
+                return AlertEvent(reading["device_id"], self.alert_type, False,
+                                  f"{self.alert_type} aufgehoben",
+                                  threshold=self.threshold, timestamp=now)
+            state[0] = OK
+            return None
+
+        if state[0] == OK:
+            state[0], state[1] = PENDING, now
+        if state[0] == PENDING and now - state[1] >= self.duration:
+            state[0] = FIRING
+            return AlertEvent(reading["device_id"], self.alert_type, True,
+                              self.describe(value), value=value,
+                              threshold=self.threshold, timestamp=now)
+        return None
+
+
+class ThresholdRule(ConditionRule):
+    """Messwert über oder unter einem Grenzwert"""
+
+    def __init__(self, alert_type: str, metric: str, op: str, threshold: float,
+                 duration: float = 0.0, message: Optional[str] = None):
+        if op not in _OPERATORS:
+            raise ValueError(f"Unbekannter Vergleichsoperator: {op}")
+        super().__init__(alert_type, duration, threshold, message)
+        self.metric = metric
+        self.op = op
+        self._compare = _OPERATORS[op]
+
+    def check(self, reading):
+        value = reading.get(self.metric)
+        if value is not None and self._compare(value, self.threshold):
+            return value
+        return None
+
+    def describe(self, value):
+        return self.message or f"{self.metric} {value:g} {self.op} {self.threshold:g}"
+
+
+class PowerRelayRule(ConditionRule):
+    """Relais eingeschaltet, aber Leistungsaufnahme unter max_power"""
+
+    def __init__(self, alert_type: str, max_power: float = 5.0, duration: float = 0.0,
+                 message: Optional[str] = None):
+        super().__init__(alert_type, duration, max_power, message)
+        self.max_power = max_power
+
+    def check(self, reading):
+        power = reading.get("power")
+        if reading.get("relay_state") and power is not None and power <= self.max_power:
+            return power
+        return None
+
+    def describe(self, value):
+        return self.message or f"Relais eingeschaltet, aber Leistung nur {value:g} W"
+
+
+class RateRule(Rule):
+    """Änderung eines Messwerts über ein Zeitfenster"""
+
+    def __init__(self, alert_type: str, metric: str, window: float,
+                 max_delta: Optional[float] = None, min_delta: Optional[float] = None,
+                 require_relay: bool = False, message: Optional[str] = None):
+        super().__init__(alert_type, message)
+        self.metric = metric
+        self.window = window
+        self.max_delta = max_delta
+        self.min_delta = min_delta
+        self.require_relay = require_relay
+
+    def evaluate(self, state, reading, now):
+        value = reading.get(self.metric)
+        if value is None:
+            return None
+
+        if self.require_relay and not reading.get("relay_state"):
+            # Gerät läuft nicht, Fenster zurücksetzen
+            state[2] = None
+            if state[0] == FIRING:
+                state[0] = OK
+                return AlertEvent(reading["device_id"], self.alert_type, False,
+                                  f"{self.alert_type} aufgehoben", timestamp=now)
+            return None
+
+        # Regeldaten: Referenzwert und Zeitpunkt am Fensteranfang
+        if state[2] is None:
+            state[2] = (now, value)
+            return None
+        start, reference = state[2]
+        if now - start < self.window:
+            return None
+
+        # Fenster abgeschlossen: Änderung bewerten und neues Fenster beginnen
+        delta = value - reference
+        state[2] = (now, value)
+        violated = (
+            (self.max_delta is not None and delta > self.max_delta)
+            or (self.min_delta is not None and delta < self.min_delta)
+        )
+        if violated and state[0] != FIRING:
+            state[0] = FIRING
+            message = self.message or (
+                f"{self.metric} hat sich in {self.window / 60:g} min um {delta:+.1f} verändert"
+            )
+            threshold = self.max_delta if self.max_delta is not None else self.min_delta
+            return AlertEvent(reading["device_id"], self.alert_type, True, message,
+                              value=delta, threshold=threshold, timestamp=now)
+        if not violated and state[0] == FIRING:
+            state[0] = OK
+            return AlertEvent(reading["device_id"], self.alert_type, False,
+                              f"{self.alert_type} aufgehoben", value=delta, timestamp=now)
+        return None
+
+
+class SilenceRule(Rule):
+    """Gerät sendet seit timeout Sekunden keine Daten"""
+
+    per_reading = False
+
+    def __init__(self, alert_type: str, timeout: float, message: Optional[str] = None):
+        super().__init__(alert_type, message)
+        self.timeout = timeout
+
+
+def compile_rule(spec: Dict[str, Any]) -> Rule:
+    """
+    Übersetzt eine Regelkonfiguration in ein Regelobjekt.
+
+    Args:
+        spec: Regelkonfiguration (siehe DEFAULT_RULES)
+
+    Returns:
+        Rule: Regelobjekt
+
+    Raises:
+        ValueError: Bei unbekannter oder unvollständiger Regel
+    """
+    kind = spec.get("kind", "threshold")
+    alert_type = spec.get("type")
+    if not alert_type:
+        raise ValueError("Alarmregel ohne type")
+    message = spec.get("message")
+
+    try:
+        if kind == "threshold":
+            return ThresholdRule(alert_type, spec["metric"], spec.get("op", ">"),
+                                 float(spec["threshold"]), float(spec.get("duration", 0)),
+                                 message)
+        if kind == "rate":
+            return RateRule(alert_type, spec["metric"], float(spec["window"]),
+                            spec.get("max_delta"), spec.get("min_delta"),
+                            bool(spec.get("require_relay", False)), message)
+        if kind == "power_relay":
+            return PowerRelayRule(alert_type, float(spec.get("max_power", 5.0)),
+                                  float(spec.get("duration", 0)), message)
+        if kind == "silence":
+            return SilenceRule(alert_type, float(spec["timeout"]), message)
+    except KeyError as e:
+        raise ValueError(f"Alarmregel {alert_type}: Feld {e} fehlt")
+    raise ValueError(f"Alarmregel {alert_type}: unbekannte Regelart {kind}")
+
+
+class AlertEngine:
+    """Wertet alle Regeln inkrementell pro Gerät aus"""
+
+    def __init__(self, rules: List[Rule]):
+        """
+        Initialisiert die Engine.
+
+        Args:
+            rules: Übersetzte Regeln
+        """
+        self.rules = [rule for rule in rules if rule.per_reading]
+        self.silence_rules = [rule for rule in rules if isinstance(rule, SilenceRule)]
+
+        # Regelzustände je Gerät, in der Reihenfolge von self.rules
+        self._states: Dict[str, List[List[Any]]] = {}
+        # Geräte mit ausgelösten Stille-Alarmen
+        self._silent: Dict[str, List[str]] = {}
+
+    @property
+    def silence_timeout(self) -> Optional[float]:
+        """Kürzester Timeout der Stille-Regeln (Frist der Offline-Erkennung)."""
+        if not self.silence_rules:
+            return None
+        return min(rule.timeout for rule in self.silence_rules)
+
+    def evaluate(self, device_id: str, reading: Dict[str, Any],
+                 timestamp: Optional[float] = None) -> List[AlertEvent]:
+        """
+        Wertet eine neue Messung aus.
+
+        Args:
+            device_id: Geräte-ID
+            reading: Messwerte (temperature, humidity, power, relay_state, ...)
+            timestamp: Zeitpunkt der Messung in Epoch-Sekunden (Standard: jetzt)
+
+        Returns:
+            List[AlertEvent]: Ausgelöste und aufgehobene Alarme
+        """
+        now = time.time() if timestamp is None else timestamp
+        states = self._states.get(device_id)
+        if states is None:
+            states = self._states[device_id] = [rule.new_state() for rule in self.rules]
+
+        reading = dict(reading, device_id=device_id)
+        events = []
+        for rule, state in zip(self.rules, states):
+            event = rule.evaluate(state, reading, now)
+            if event is not None:
+                events.append(event)
+
+        # Das Gerät meldet sich wieder: Stille-Alarme aufheben
+        silent = self._silent.pop(device_id, None)
+        if silent:
+            for alert_type in silent:
+                events.append(AlertEvent(device_id, alert_type, False,
+                                         f"{alert_type} aufgehoben", timestamp=now))
+        return events
+
+    def device_offline(self, device_id: str, last_seen: float,
+                       now: Optional[float] = None) -> List[AlertEvent]:
+        """
+        Löst die Stille-Alarme für ein Gerät aus, das seine Meldefrist verpasst hat.
+
+        Die Fristen selbst verwaltet die Offline-Erkennung (offline_detector).
+
+        Args:
+            device_id: Geräte-ID
+            last_seen: Zeitpunkt der letzten Meldung in Epoch-Sekunden
+            now: Aktueller Zeitpunkt in Epoch-Sekunden (Standard: jetzt)
+
+        Returns:
+            List[AlertEvent]: Neu ausgelöste Stille-Alarme
+        """
+        if not self.silence_rules or device_id in self._silent:
+            return []
+        now = time.time() if now is None else now
+        silent_for = now - last_seen
+        self._silent[device_id] = [rule.alert_type for rule in self.silence_rules]
+        return [
+            AlertEvent(device_id, rule.alert_type, True,
+                       rule.message or f"Keine Daten seit {silent_for / 60:.0f} min",
+                       value=silent_for, threshold=rule.timeout, timestamp=now)
+            for rule in self.silence_rules
+        ]
+
+    def restore(self, active: Iterable[Tuple[str, str]]) -> int:
+        """
+        Übernimmt die aktiven Alarme aus der Datenbank nach einem Neustart.
+
+        Die betroffenen Regeln starten im Zustand ausgelöst, damit sie bei der
+        nächsten Messung aufgehoben und nicht erneut ausgelöst werden.
+
+        Args:
+            active: (Geräte-ID, Alarmtyp) der aktiven Alarme
+
+        Returns:
+            int: Anzahl übernommener Alarme
+        """
+        rule_index = {rule.alert_type: i for i, rule in enumerate(self.rules)}
+        silence_types = {rule.alert_type for rule in self.silence_rules}
+        restored = 0
+        for device_id, alert_type in active:
+            if alert_type in rule_index:
+                states = self._states.get(device_id)
+                if states is None:
+                    states = self._states[device_id] = [rule.new_state() for rule in self.rules]
+                states[rule_index[alert_type]][0] = FIRING
+            elif alert_type in silence_types:
+                silent = self._silent.setdefault(device_id, [])
+                if alert_type not in silent:
+                    silent.append(alert_type)
+            else:
+                # Regel existiert nicht mehr
+                continue
+            restored += 1
+        return restored
+
+    def forget(self, device_id: str) -> None:
+        """Entfernt alle Zustände eines Geräts (z.B. nach dem Löschen)."""
+        self._states.pop(device_id, None)
+        self._silent.pop(device_id, None)
+
+
+def load_rule_specs(path: str = ALERT_RULES_FILE) -> List[Dict[str, Any]]:
+    """Lädt die Regelkonfiguration aus einer JSON-Datei oder gibt die Standardregeln zurück."""
+    if path and os.path.exists(path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"Fehler beim Laden der Alarmregeln aus {path}: {e}")
+    return DEFAULT_RULES
+
+
+def build_alert_engine(specs: Optional[List[Dict[str, Any]]] = None) -> AlertEngine:
+    """
+    Erstellt eine Alarm-Engine aus Regelkonfigurationen.
+
+    Ungültige Regeln werden protokolliert und übersprungen.
+    """
+    rules = []
+    for spec in specs if specs is not None else load_rule_specs():
+        try:
+            rules.append(compile_rule(spec))
+        except ValueError as e:
+            logger.error(f"Ungültige Alarmregel: {e}")
+    return AlertEngine(rules)
@@ -4,29 +4,75 @@ SwissAirDry BLE Scanner Modul
 
 Dieses Modul nutzt Bluetooth Low Energy (BLE), um SwissAirDry-Geräte in der Nähe zu erkennen
 und deren Standort basierend auf der Signalstärke zu bestimmen.
+
+Auf Gateways vor Ort kann das Modul als Scanner-Agent gestartet werden. Der Agent
+scannt nur und veröffentlicht gebündelte RSSI-Beobachtungen per MQTT unter
+swissairdry/ble/<scanner_id>/obs, die API wertet sie zentral aus:
+
+    python ble_scanner.py --agent --scanner-id gw-office
 """
 
 import os
+import argparse
 import asyncio
+import heapq
+import hashlib
 import logging
 import json
 import time
 from datetime import datetime
-from typing import Dict, List, Optional, Any, Set
+from typing import Dict, List, Optional, Any, Set, Tuple
 
 from bleak import BleakScanner, BleakClient
 from bleak.backends.device import BLEDevice
 from bleak.backends.scanner import AdvertisementData
 
+try:
+    from rssi_filter import RSSIFilterBank, HysteresisClassifier
+    from location_engine import build_location_engine
+except ImportError:
+    from swissairdry.api.app.rssi_filter import RSSIFilterBank, HysteresisClassifier
+    from swissairdry.api.app.location_engine import build_location_engine
+
 # Logger konfigurieren
 logger = logging.getLogger("swissairdry_ble")
 
 # Konstanten
 DEVICE_PREFIX = "SAD_"  # Präfix für SwissAirDry-Geräte
 SCAN_INTERVAL = 60  # Scan-Intervall in Sekunden
+SCAN_DURATION = 5  # Scandauer pro Intervall im Modus duty_cycle
 RSSI_THRESHOLD = -85  # RSSI-Schwellenwert für die Nähe (-85 dBm)
 MIN_DISCOVERY_COUNT = 2  # Minimale Anzahl an Entdeckungen für valide Geräteerkennung
 
+# RSSI-Glättung und Hysterese, über Umgebungsvariablen anpassbar
+RSSI_FILTER_MODE = os.getenv("BLE_RSSI_FILTER", "ema")  # ema, kalman, median oder none
+RSSI_FILTER_ALPHA = float(os.getenv("BLE_RSSI_ALPHA", "0.3"))
+RSSI_FILTER_WINDOW = int(os.getenv("BLE_RSSI_WINDOW", "5"))
+HYSTERESIS_DB = float(os.getenv("BLE_HYSTERESIS_DB", "4"))
+
+# Trilateration über mehrere Scanner
+LOCAL_SCANNER_ID = os.getenv("BLE_SCANNER_ID", "local")  # ID des Scanners auf diesem Host
+OBSERVATION_MAX_AGE = float(os.getenv("BLE_OBSERVATION_MAX_AGE", "120"))  # Sekunden
+ZONE_HYSTERESIS_M = float(os.getenv("BLE_ZONE_HYSTERESIS_M", "1.0"))  # Meter
+STALE_DEVICE_AGE = 300  # Geräte ohne Beobachtung seit 5 Minuten werden entfernt
+
+# Scanmodus: duty_cycle (5 s scannen, Rest des Intervalls Pause) oder continuous
+# (Adapter scannt dauerhaft, Auswertung alle BLE_EVAL_INTERVAL Sekunden)
+SCAN_MODE = os.getenv("BLE_SCAN_MODE", "duty_cycle")
+EVAL_INTERVAL = float(os.getenv("BLE_EVAL_INTERVAL", "5"))  # Sekunden
+PASSIVE_SCAN = os.getenv("BLE_PASSIVE_SCAN", "false").lower() == "true"
+
+# Scanner-Agenten
+AGENT_TOPIC_FILTER = "swissairdry/ble/+/obs"  # Beobachtungen aller Agenten
+AGENT_BATCH_INTERVAL = float(os.getenv("BLE_AGENT_BATCH_INTERVAL", "5"))  # Sekunden
+
+# RSSI-Bänder der Standortzonen: (Standort, untere Grenze, obere Grenze) in dBm
+ZONE_BANDS = [
+    ("office", -60, None),  # Sehr nah
+    ("workshop", -75, -60),  # Mittlere Entfernung
+    ("warehouse", RSSI_THRESHOLD, -75),  # Weit entfernt, aber noch erkennbar
+]
+
 # Standortdaten
 locations = {}  # Speichert Infos über Standorte: {"location_id": {"name": "Name", "description": "..."}}
 
@@ -36,9 +82,32 @@ device_locations = {}  # Speichert den aktuellen Standort von Geräten: {"device
 # Gerätedaten
 discovered_devices = {}  # Speichert entdeckte Geräte mit RSSI: {"device_id": {"rssi": -70, "last_seen": timestamp, "count": 5}}
 
+# Beobachtungen je Gerät und Scanner: {"device_id": {"scanner_id": (rssi_geglättet, timestamp)}}
+scanner_observations = {}
+
+# Berechnete Positionen: {"device_id": {"x": 1.0, "y": 2.0, "location_id": "office", ...}}
+device_positions = {}
+
+# Trilaterations-Engine, wird aus den Standortdaten erstellt, sobald Scanner konfiguriert sind
+location_engine = None
+
+# Ablaufzeitpunkte der Geräte als Min-Heap: [(ablauf_timestamp, device_id)]
+# Einträge werden erst beim Ablauf geprüft und bei neueren Beobachtungen neu eingeplant
+_expiry_heap = []
+_expiry_scheduled = set()
+
+# Geglättete RSSI-Werte je Gerät und Scanner
+rssi_filters = RSSIFilterBank(
+    mode=RSSI_FILTER_MODE, alpha=RSSI_FILTER_ALPHA, window=RSSI_FILTER_WINDOW
+)
+zone_classifier = HysteresisClassifier(ZONE_BANDS, margin=HYSTERESIS_DB)
+
 # MQTT-Client für die Veröffentlichung von Standortänderungen
 mqtt_client = None
 
+# Speicher für den Standortverlauf (LocationHistoryStore), optional
+history_store = None
+
 
 def set_mqtt_client(client):
     """MQTT-Client für Standort-Updates setzen"""
@@ -46,6 +115,20 @@ def set_mqtt_client(client):
     mqtt_client = client
 
 
+def set_history_store(store):
+    """Speicher für den Standortverlauf setzen"""
+    global history_store
+    history_store = store
+
+
+def rebuild_location_engine():
+    """Erstellt die Trilaterations-Engine aus den aktuellen Standortdaten neu"""
+    global location_engine
+    location_engine = build_location_engine(locations, zone_hysteresis=ZONE_HYSTERESIS_M)
+    if location_engine is not None:
+        logger.info(f"Trilateration mit {location_engine.scanner_count} Scannern aktiviert")
+
+
 def load_locations(file_path: str = "locations.json") -> bool:
     """Standortdaten aus Datei laden"""
     global locations
@@ -55,6 +138,7 @@ def load_locations(file_path: str = "locations.json") -> bool:
             with open(file_path, "r", encoding="utf-8") as f:
                 locations = json.load(f)
             logger.info(f"{len(locations)} Standorte geladen")
+            rebuild_location_engine()
             return True
         else:
             logger.warning(f"Standortdatei {file_path} nicht gefunden")
@@ -66,10 +150,17 @@ def load_locations(file_path: str = "locations.json") -> bool:
 
 def save_locations(file_path: str = "locations.json") -> bool:
     """Standortdaten in Datei speichern"""
+    # Erst in eine temporäre Datei im selben Verzeichnis schreiben und dann
+    # atomar ersetzen, damit ein Absturz keine halbe Datei hinterlässt
+    temp_path = f"{file_path}.tmp"
     try:
-        with open(file_path, "w", encoding="utf-8") as f:
+        with open(temp_path, "w", encoding="utf-8") as f:
             json.dump(locations, f, indent=2, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, file_path)
         logger.info(f"{len(locations)} Standorte gespeichert")
+        rebuild_location_engine()
         return True
     except Exception as e:
         logger.error(f"Fehler beim Speichern der Standorte: {e}")
@@ -81,7 +172,7 @@ def get_device_location(device_id: str) -> Optional[str]:
     return device_locations.get(device_id)
 
 
-def set_device_location(device_id: str, location_id: str, publish: bool = True):
+def set_device_location(device_id: str, location_id: str, publish: bool = True, source: str = "rssi"):
     """Setzt den Standort eines Geräts"""
     old_location = device_locations.get(device_id)
     
@@ -90,6 +181,18 @@ def set_device_location(device_id: str, location_id: str, publish: bool = True):
         device_locations[device_id] = location_id
         logger.info(f"Gerät {device_id} ist jetzt an Standort {location_id}")
         
+        if history_store is not None:
+            # Wechsel für den Standortverlauf vormerken (wird gebündelt geschrieben)
+            position = device_positions.get(device_id) if source in ("trilateration", "nearest_scanner") else None
+            history_store.record(
+                device_id,
+                location_id,
+                previous_location_id=old_location,
+                source=source,
+                x=position["x"] if position else None,
+                y=position["y"] if position else None,
+            )
+        
         if publish and mqtt_client and hasattr(mqtt_client, 'is_connected') and mqtt_client.is_connected():
             # Standortänderung über MQTT veröffentlichen
             location_name = locations.get(location_id, {}).get("name", location_id)
@@ -108,29 +211,141 @@ def set_device_location(device_id: str, location_id: str, publish: bool = True):
                 logger.error(f"Fehler beim Veröffentlichen der Standortänderung: {e}")
 
 
+def _filter_key(device_id: str, scanner_id: str) -> str:
+    """Schlüssel des RSSI-Filters für eine Kombination aus Gerät und Scanner"""
+    return f"{device_id}@{scanner_id}"
+
+
+def record_observation(device_id: str, scanner_id: str, rssi: float, timestamp: float = None) -> float:
+    """
+    Verarbeitet eine RSSI-Messung eines Scanners.
+
+    Args:
+        device_id: ID des Geräts
+        scanner_id: ID des Scanners, der das Gerät gesehen hat
+        rssi: Gemessener RSSI-Wert in dBm
+        timestamp: Zeitpunkt der Messung (Standard: jetzt)
+
+    Returns:
+        float: Geglätteter RSSI-Wert für diese Kombination
+    """
+    if timestamp is None:
+        timestamp = time.time()
+    smoothed = rssi_filters.update(_filter_key(device_id, scanner_id), rssi)
+    scanner_observations.setdefault(device_id, {})[scanner_id] = (smoothed, timestamp)
+    
+    if device_id not in _expiry_scheduled:
+        heapq.heappush(_expiry_heap, (timestamp + STALE_DEVICE_AGE, device_id))
+        _expiry_scheduled.add(device_id)
+    return smoothed
+
+
+class ObservationWindow:
+    """Fasst RSSI-Messungen je Gerät über ein Zeitfenster zusammen"""
+    
+    def __init__(self):
+        # {"device_id": [rssi_summe, anzahl, letzter_zeitpunkt]}
+        self._entries: Dict[str, List[float]] = {}
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def add(self, device_id: str, rssi: float, timestamp: float = None):
+        """Fügt eine Messung zum aktuellen Fenster hinzu"""
+        if timestamp is None:
+            timestamp = time.time()
+        entry = self._entries.get(device_id)
+        if entry is None:
+            self._entries[device_id] = [float(rssi), 1, timestamp]
+        else:
+            entry[0] += rssi
+            entry[1] += 1
+            entry[2] = timestamp
+    
+    def flush(self) -> Dict[str, Tuple[float, int, float]]:
+        """
+        Schließt das Fenster ab und beginnt ein neues.
+        
+        Returns:
+            Dict: Geräte-ID -> (mittlerer RSSI, Anzahl Messungen, letzter Zeitpunkt)
+        """
+        entries, self._entries = self._entries, {}
+        return {
+            device_id: (rssi_sum / count, int(count), last_seen)
+            for device_id, (rssi_sum, count, last_seen) in entries.items()
+        }
+
+
+def forget_device(device_id: str):
+    """Entfernt alle Beobachtungen und Filterzustände eines Geräts"""
+    for scanner_id in scanner_observations.pop(device_id, {}):
+        rssi_filters.remove(_filter_key(device_id, scanner_id))
+    device_positions.pop(device_id, None)
+
+
+def _update_local_device(device_id: str, rssi: float, count: int = 1, timestamp: float = None):
+    """Verarbeitet Messungen des lokalen Adapters"""
+    if timestamp is None:
+        timestamp = time.time()
+    smoothed = record_observation(device_id, LOCAL_SCANNER_ID, rssi, timestamp)
+    
+    # Gerätedaten aktualisieren
+    if device_id not in discovered_devices:
+        discovered_devices[device_id] = {
+            "rssi": rssi,
+            "rssi_smoothed": smoothed,
+            "last_seen": timestamp,
+            "count": count
+        }
+    else:
+        discovered_devices[device_id]["rssi"] = rssi
+        discovered_devices[device_id]["rssi_smoothed"] = smoothed
+        discovered_devices[device_id]["last_seen"] = timestamp
+        discovered_devices[device_id]["count"] += count
+    
+    logger.debug(
+        f"Gerät {device_id} entdeckt, RSSI: {rssi} (geglättet {smoothed:.1f}), "
+        f"Count: {discovered_devices[device_id]['count']}"
+    )
+
+
 async def device_callback(device: BLEDevice, advertisement_data: AdvertisementData):
     """Callback für entdeckte BLE-Geräte"""
     if device.name and device.name.startswith(DEVICE_PREFIX):
         device_id = device.name.replace(DEVICE_PREFIX, "")
-        rssi = device.rssi
-        
-        # Gerätedaten aktualisieren
-        if device_id not in discovered_devices:
-            discovered_devices[device_id] = {
-                "rssi": rssi,
-                "last_seen": time.time(),
-                "count": 1
-            }
-        else:
-            discovered_devices[device_id]["rssi"] = rssi
-            discovered_devices[device_id]["last_seen"] = time.time()
-            discovered_devices[device_id]["count"] += 1
-        
-        logger.debug(f"Gerät {device_id} entdeckt, RSSI: {rssi}, Count: {discovered_devices[device_id]['count']}")
+        _update_local_device(device_id, device.rssi)
+
+
+# Messungen des laufenden Auswertungsfensters im Modus continuous
+scan_window = ObservationWindow()
+
+
+def continuous_callback(device: BLEDevice, advertisement_data: AdvertisementData):
+    """
+    Callback für den Dauerscan.
+    
+    Geräte senden mehrere Advertisements pro Sekunde. Die Messungen werden nur
+    im Fenster gesammelt und pro Auswertung als Mittelwert verarbeitet, damit
+    die Filter unabhängig von der Advertising-Rate reagieren.
+    """
+    if device.name and device.name.startswith(DEVICE_PREFIX):
+        device_id = device.name.replace(DEVICE_PREFIX, "")
+        rssi = getattr(advertisement_data, "rssi", None)
+        scan_window.add(device_id, rssi if rssi is not None else device.rssi)
+
+
+def flush_scan_window():
+    """Übernimmt die im Fenster gesammelten Messungen"""
+    for device_id, (rssi, count, last_seen) in scan_window.flush().items():
+        _update_local_device(device_id, round(rssi, 1), count, last_seen)
 
 
 async def start_scanning():
     """Startet den BLE-Scan in einer Endlosschleife"""
+    if SCAN_MODE == "continuous":
+        await start_continuous_scanning()
+        return
+    
     scanner = BleakScanner(detection_callback=device_callback)
     
     while True:
@@ -138,32 +353,158 @@ async def start_scanning():
             # BLE-Scan durchführen
             logger.info("Starte BLE-Scan nach SwissAirDry-Geräten...")
             await scanner.start()
-            await asyncio.sleep(5)  # 5 Sekunden scannen
+            await asyncio.sleep(SCAN_DURATION)
             await scanner.stop()
             
             # Standortzuordnung basierend auf Signalstärke durchführen
             await process_device_locations()
             
             # Veraltete Geräte entfernen (älter als 5 Minuten)
-            current_time = time.time()
-            to_remove = []
-            
-            for device_id, data in discovered_devices.items():
-                if current_time - data["last_seen"] > 300:  # 5 Minuten = 300 Sekunden
-                    to_remove.append(device_id)
-            
-            for device_id in to_remove:
-                logger.info(f"Entferne veraltetes Gerät {device_id}")
-                discovered_devices.pop(device_id)
+            expire_stale_devices()
             
             # Warten bis zum nächsten Scan
-            await asyncio.sleep(SCAN_INTERVAL - 5)  # 5 Sekunden bereits verbraucht für den Scan
+            await asyncio.sleep(SCAN_INTERVAL - SCAN_DURATION)  # Scandauer bereits verbraucht
             
         except Exception as e:
             logger.error(f"Fehler beim BLE-Scanning: {e}")
             await asyncio.sleep(10)  # Bei Fehler 10 Sekunden warten
 
 
+def _create_scanner(detection_callback) -> BleakScanner:
+    """Erstellt einen BleakScanner, bevorzugt im passiven Modus"""
+    if PASSIVE_SCAN:
+        try:
+            return BleakScanner(detection_callback=detection_callback, scanning_mode="passive")
+        except Exception as e:
+            # Nicht jedes Backend unterstützt passives Scannen ohne weitere Filter
+            logger.warning(f"Passiver BLE-Scan nicht verfügbar, verwende aktiven Scan: {e}")
+    return BleakScanner(detection_callback=detection_callback)
+
+
+async def start_continuous_scanning():
+    """
+    Scannt dauerhaft und wertet die Messungen alle EVAL_INTERVAL Sekunden aus.
+    
+    Der Adapter wird nur einmal gestartet, Standortwechsel werden damit nach
+    wenigen Sekunden statt nach bis zu einer Minute erkannt.
+    """
+    scanner = _create_scanner(continuous_callback)
+    
+    while True:
+        try:
+            logger.info("Starte dauerhaften BLE-Scan nach SwissAirDry-Geräten...")
+            await scanner.start()
+            try:
+                while True:
+                    await asyncio.sleep(EVAL_INTERVAL)
+                    flush_scan_window()
+                    await process_device_locations()
+                    expire_stale_devices()
+            finally:
+                await scanner.stop()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Fehler beim BLE-Scanning: {e}")
+            await asyncio.sleep(10)  # Bei Fehler 10 Sekunden warten, dann Adapter neu starten
+
+
+def _device_last_seen(device_id: str) -> Optional[float]:
+    """Gibt den Zeitpunkt der letzten Beobachtung eines Geräts zurück"""
+    per_scanner = scanner_observations.get(device_id)
+    if not per_scanner:
+        return None
+    return max(timestamp for _, timestamp in per_scanner.values())
+
+
+def expire_stale_devices():
+    """
+    Entfernt Geräte, die von keinem Scanner mehr gesehen wurden.
+    
+    Es werden nur die fälligen Einträge des Heaps geprüft. Wurde ein Gerät
+    inzwischen erneut gesehen, wird es mit dem neuen Ablaufzeitpunkt wieder
+    eingeplant.
+    """
+    current_time = time.time()
+    
+    while _expiry_heap and _expiry_heap[0][0] <= current_time:
+        _, device_id = heapq.heappop(_expiry_heap)
+        last_seen = _device_last_seen(device_id)
+        
+        if last_seen is not None and current_time - last_seen <= STALE_DEVICE_AGE:
+            heapq.heappush(_expiry_heap, (last_seen + STALE_DEVICE_AGE, device_id))
+            continue
+        
+        _expiry_scheduled.discard(device_id)
+        if last_seen is not None or device_id in discovered_devices:
+            logger.info(f"Entferne veraltetes Gerät {device_id}")
+        discovered_devices.pop(device_id, None)
+        forget_device(device_id)
+
+
+def handle_agent_observations(topic: str, payload: Any):
+    """
+    Verarbeitet gebündelte Beobachtungen eines Scanner-Agenten.
+    
+    Wird als MQTT-Callback für swissairdry/ble/+/obs registriert.
+    
+    Args:
+        topic: MQTT-Topic (swissairdry/ble/<scanner_id>/obs)
+        payload: Nachricht im Format {"scanner_id", "timestamp", "observations": [...]}
+    """
+    topic_parts = topic.split("/")
+    if not isinstance(payload, dict) or len(topic_parts) != 4 or not topic_parts[2]:
+        logger.warning(f"Ungültige Agenten-Nachricht auf {topic}")
+        return
+    
+    # Der Scanner ergibt sich aus dem Topic (per ACL absicherbar), nicht aus dem
+    # Inhalt; widersprüchliche Nachrichten werden verworfen
+    scanner_id = topic_parts[2]
+    if payload.get("scanner_id") not in (None, scanner_id):
+        logger.warning(f"Agenten-Nachricht auf {topic} mit abweichender scanner_id verworfen")
+        return
+    # Zeitstempel des Agenten nicht in der Zukunft akzeptieren (Uhrabweichung)
+    current_time = time.time()
+    
+    for observation in payload.get("observations", []):
+        try:
+            device_id = observation["device_id"]
+            rssi = float(observation["rssi"])
+            timestamp = min(float(observation.get("last_seen", current_time)), current_time)
+        except (KeyError, TypeError, ValueError):
+            continue
+        record_observation(device_id, scanner_id, rssi, timestamp)
+
+
+def agent_client_id(scanner_id: str) -> str:
+    """
+    Gibt die MQTT-Client-ID eines Scanner-Agenten zurück.
+
+    MQTT 3.1 erlaubt nur 23 Zeichen. Ein Hash der vollständigen Scanner-ID
+    verhindert, dass Scanner mit gleichem Präfix dieselbe ID erhalten und sich
+    gegenseitig vom Broker trennen.
+    """
+    digest = hashlib.sha256(scanner_id.encode("utf-8")).hexdigest()
+    return f"sard-ble-{digest[:14]}"
+
+
+async def run_evaluation_loop():
+    """
+    Wertet Beobachtungen periodisch aus, ohne selbst zu scannen.
+    
+    Wird verwendet, wenn die API nur Beobachtungen von Scanner-Agenten erhält.
+    """
+    while True:
+        try:
+            await asyncio.sleep(SCAN_INTERVAL)
+            await process_device_locations()
+            expire_stale_devices()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Fehler bei der Standortauswertung: {e}")
+
+
 async def process_device_locations():
     """Ordnet Geräte basierend auf RSSI-Stärke Standorten zu"""
     # Simulierte Standorte für den Test
@@ -175,28 +516,49 @@ async def process_device_locations():
             "workshop": {"name": "Werkstatt", "description": "Werkstattbereich"}
         })
     
-    # In einer echten Implementierung würden wir hier Standortbeacons verwenden
-    # Die folgende Logik basiert auf RSSI-Werten und ist ein vereinfachtes Beispiel
+    # Mit konfigurierten Scannern werden alle Geräte per Trilateration verortet
+    if location_engine is not None:
+        process_trilateration()
+        return
+    
+    # Ohne Scanner-Konfiguration: vereinfachte Zuordnung anhand des lokalen RSSI-Werts
     
     for device_id, data in discovered_devices.items():
         if data["count"] < MIN_DISCOVERY_COUNT:
             # Ignoriere Geräte mit zu wenigen Entdeckungen
             continue
         
-        rssi = data["rssi"]
+        rssi = data.get("rssi_smoothed", data["rssi"])
         
-        # Sehr einfache Standortbestimmung basierend auf RSSI
-        # In einer realen Implementierung würde man mehrere Beacons oder 
-        # eine Trilateration verwenden
-        if rssi > -60:  # Sehr nah
-            set_device_location(device_id, "office")
-        elif rssi > -75:  # Mittlere Entfernung
-            set_device_location(device_id, "workshop")
-        elif rssi > RSSI_THRESHOLD:  # Weit entfernt, aber noch erkennbar
-            set_device_location(device_id, "warehouse")
+        # Standortbestimmung anhand des geglätteten RSSI-Werts. Die Zone wechselt
+        # erst, wenn der Wert das Band der aktuellen Zone um mehr als
+        # HYSTERESIS_DB verlässt, damit Geräte an Zonengrenzen nicht springen.
+        location_id = zone_classifier.classify(rssi, device_locations.get(device_id))
+        if location_id is not None:
+            set_device_location(device_id, location_id)
         # Unterhalb des Schwellenwerts gelten Geräte als "nicht in der Nähe"
 
 
+def process_trilateration():
+    """Bestimmt Positionen aller Geräte mit aktuellen Beobachtungen in einem Durchlauf"""
+    current_time = time.time()
+    observations = {}
+    for device_id, per_scanner in scanner_observations.items():
+        fresh = {
+            scanner_id: rssi
+            for scanner_id, (rssi, timestamp) in per_scanner.items()
+            if current_time - timestamp <= OBSERVATION_MAX_AGE
+        }
+        if fresh:
+            observations[device_id] = fresh
+    
+    results = location_engine.solve(observations, device_locations)
+    for device_id, result in results.items():
+        result["timestamp"] = datetime.fromtimestamp(current_time).isoformat()
+        device_positions[device_id] = result
+        set_device_location(device_id, result["location_id"], source=result["method"])
+
+
 class BLEManager:
     """Verwaltet BLE-Scan und Standortverfolgung"""
     
@@ -211,12 +573,36 @@ class BLEManager:
         # Lade vorhandene Standorte
         load_locations()
     
-    async def start_background_scan(self):
-        """Startet den BLE-Scan im Hintergrund"""
+    async def start_background_scan(self, local_scan: bool = None):
+        """
+        Startet den BLE-Scan im Hintergrund.
+        
+        Args:
+            local_scan: Mit dem eigenen Bluetooth-Adapter scannen. Bei False
+                werden nur Beobachtungen von Scanner-Agenten ausgewertet.
+                Standard: Umgebungsvariable BLE_LOCAL_SCAN (true)
+        """
+        if local_scan is None:
+            local_scan = os.getenv("BLE_LOCAL_SCAN", "true").lower() == "true"
+        
         if not self.is_scanning:
             self.is_scanning = True
-            self.scanning_task = asyncio.create_task(start_scanning())
-            logger.info("BLE-Scan im Hintergrund gestartet")
+            if local_scan:
+                self.scanning_task = asyncio.create_task(start_scanning())
+                logger.info("BLE-Scan im Hintergrund gestartet")
+            else:
+                self.scanning_task = asyncio.create_task(run_evaluation_loop())
+                logger.info("BLE-Standortauswertung für Scanner-Agenten gestartet")
+    
+    def attach_agents(self, client):
+        """
+        Empfängt Beobachtungen der Scanner-Agenten über den MQTT-Client der API.
+        
+        Args:
+            client: MQTTClient mit add_message_callback
+        """
+        client.add_message_callback(AGENT_TOPIC_FILTER, handle_agent_observations)
+        logger.info(f"Beobachtungen von Scanner-Agenten werden über {AGENT_TOPIC_FILTER} empfangen")
     
     async def stop_background_scan(self):
         """Stoppt den BLE-Scan im Hintergrund"""
@@ -278,14 +664,156 @@ class BLEManager:
         """Gibt alle Gerät-Standort-Zuordnungen zurück"""
         return device_locations
     
+    def get_device_positions(self) -> Dict[str, Dict[str, Any]]:
+        """Gibt die per Trilateration berechneten Gerätepositionen zurück"""
+        return device_positions
+    
     def get_discovered_devices(self) -> Dict[str, Dict[str, Any]]:
         """Gibt alle entdeckten BLE-Geräte mit Details zurück"""
         result = {}
         for device_id, data in discovered_devices.items():
             result[device_id] = {
                 "rssi": data["rssi"],
+                "rssi_smoothed": data.get("rssi_smoothed"),
                 "last_seen": datetime.fromtimestamp(data["last_seen"]).isoformat(),
                 "count": data["count"],
                 "location": device_locations.get(device_id, "unknown")
             }
-        return result
\ No newline at end of file
+        return result
+
+
+class ScannerAgent:
+    """
+    Schlanker Scanner für Gateways vor Ort.
+    
+    Scannt dauerhaft, fasst die Messungen je Gerät über AGENT_BATCH_INTERVAL
+    Sekunden zusammen und veröffentlicht sie gebündelt per MQTT. Standort-
+    berechnung und Persistenz übernimmt die API.
+    """
+    
+    def __init__(
+        self,
+        scanner_id: str,
+        mqtt_host: str,
+        mqtt_port: int = 1883,
+        mqtt_user: str = "",
+        mqtt_password: str = "",
+        batch_interval: float = AGENT_BATCH_INTERVAL,
+    ):
+        """
+        Initialisiert den Scanner-Agenten.
+        
+        Args:
+            scanner_id: Eindeutige ID dieses Scanners (wie in locations.json)
+            mqtt_host: MQTT-Broker-Hostname
+            mqtt_port: MQTT-Broker-Port
+            mqtt_user: Benutzername für die Authentifizierung
+            mqtt_password: Passwort für die Authentifizierung
+            batch_interval: Intervall für gebündelte Veröffentlichungen in Sekunden
+        """
+        self.scanner_id = scanner_id
+        self.mqtt_host = mqtt_host
+        self.mqtt_port = mqtt_port
+        self.mqtt_user = mqtt_user
+        self.mqtt_password = mqtt_password
+        self.batch_interval = batch_interval
+        self.topic = f"swissairdry/ble/{scanner_id}/obs"
+        
+        # Messungen des aktuellen Fensters
+        self._window = ObservationWindow()
+    
+    def _detection_callback(self, device: BLEDevice, advertisement_data: AdvertisementData):
+        """Sammelt Messungen von SwissAirDry-Geräten im aktuellen Fenster"""
+        if not device.name or not device.name.startswith(DEVICE_PREFIX):
+            return
+        
+        device_id = device.name.replace(DEVICE_PREFIX, "")
+        rssi = getattr(advertisement_data, "rssi", None)
+        self._window.add(device_id, rssi if rssi is not None else device.rssi)
+    
+    def _flush(self) -> Optional[Dict[str, Any]]:
+        """Erstellt die Nachricht für das abgelaufene Fenster"""
+        window = self._window.flush()
+        if not window:
+            return None
+        
+        return {
+            "scanner_id": self.scanner_id,
+            "timestamp": time.time(),
+            "observations": [
+                {
+                    "device_id": device_id,
+                    "rssi": round(rssi, 1),
+                    "count": count,
+                    "last_seen": last_seen,
+                }
+                for device_id, (rssi, count, last_seen) in window.items()
+            ],
+        }
+    
+    async def run(self):
+        """Scannt dauerhaft und veröffentlicht die Beobachtungen"""
+        import paho.mqtt.client as mqtt
+        
+        client = mqtt.Client(client_id=agent_client_id(self.scanner_id), clean_session=True)
+        if self.mqtt_user and self.mqtt_password:
+            client.username_pw_set(self.mqtt_user, self.mqtt_password)
+        client.reconnect_delay_set(min_delay=3, max_delay=120)
+        # Status des Agenten für das Monitoring, "offline" setzt der Broker bei Verbindungsabbruch
+        client.will_set(f"swissairdry/ble/{self.scanner_id}/status", json.dumps("offline"), retain=True)
+        client.connect_async(self.mqtt_host, self.mqtt_port, keepalive=60)
+        client.loop_start()
+        client.publish(f"swissairdry/ble/{self.scanner_id}/status", json.dumps("online"), retain=True)
+        
+        scanner = _create_scanner(self._detection_callback)
+        await scanner.start()
+        logger.info(f"Scanner-Agent {self.scanner_id} gestartet, veröffentliche auf {self.topic}")
+        
+        try:
+            while True:
+                await asyncio.sleep(self.batch_interval)
+                message = self._flush()
+                if message is not None:
+                    client.publish(self.topic, json.dumps(message))
+                    logger.debug(f"{len(message['observations'])} Beobachtungen veröffentlicht")
+        finally:
+            await scanner.stop()
+            client.publish(f"swissairdry/ble/{self.scanner_id}/status", json.dumps("offline"), retain=True)
+            client.loop_stop()
+            client.disconnect()
+
+
+def main():
+    """Startet den Scanner-Agenten über die Kommandozeile"""
+    parser = argparse.ArgumentParser(description="SwissAirDry BLE Scanner")
+    parser.add_argument("--agent", action="store_true", help="Als Scanner-Agent starten")
+    parser.add_argument("--scanner-id", default=os.getenv("BLE_SCANNER_ID", LOCAL_SCANNER_ID))
+    parser.add_argument("--mqtt-host", default=os.getenv("MQTT_HOST", "localhost"))
+    parser.add_argument("--mqtt-port", type=int, default=int(os.getenv("MQTT_PORT", "1883")))
+    parser.add_argument("--batch-interval", type=float, default=AGENT_BATCH_INTERVAL)
+    args = parser.parse_args()
+    
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    
+    if not args.agent:
+        parser.error("Ohne --agent läuft der Scanner als Teil der API")
+    
+    agent = ScannerAgent(
+        args.scanner_id,
+        args.mqtt_host,
+        args.mqtt_port,
+        os.getenv("MQTT_USER", ""),
+        os.getenv("MQTT_PASSWORD", ""),
+        batch_interval=args.batch_interval,
+    )
+    try:
+        asyncio.run(agent.run())
+    except KeyboardInterrupt:
+        logger.info("Scanner-Agent beendet")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,345 @@
+"""
+SwissAirDry Circuit Breaker
+---------------------------
+
+Schützt ausgehende HTTP-Aufrufe (Nextcloud, ExApp, ExApp-Daemon, API-Server)
+vor dem Warten auf nicht erreichbare Gegenstellen.
+
+Nach CIRCUIT_FAILURE_THRESHOLD Fehlern in Folge öffnet der Breaker einer
+Gegenstelle: Aufrufe schlagen dann sofort mit CircuitOpenError fehl, statt
+jeweils das volle Timeout abzuwarten. Nach CIRCUIT_RESET_TIMEOUT Sekunden
+wird ein einzelner Probeaufruf durchgelassen (halb offen). Gelingt er, schließt
+der Breaker, sonst bleibt er für eine weitere Wartezeit offen.
+
+Wiederholungen nach Fehlern sind über ein Retry-Budget begrenzt, damit
+Wiederholungen eine gestörte Gegenstelle nicht zusätzlich belasten.
+
+@author Swiss Air Dry Team <info@swissairdry.com>
+@copyright 2023-2025 Swiss Air Dry Team
+"""
+
+import os
+import time
+import logging
+import threading
+from collections import deque
+from typing import Any, Callable, Dict, Optional
+from urllib.parse import urlsplit
+
+import requests
+
+logger = logging.getLogger("swissairdry_api")
+
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+CIRCUIT_RESET_TIMEOUT = float(os.getenv("CIRCUIT_RESET_TIMEOUT", "30"))
+# Anteil der Anfragen, der zusätzlich als Wiederholung erlaubt ist
+RETRY_BUDGET_RATIO = float(os.getenv("RETRY_BUDGET_RATIO", "0.2"))
+RETRY_BUDGET_MIN = int(os.getenv("RETRY_BUDGET_MIN", "3"))  # Pro Zeitfenster
+RETRY_BUDGET_WINDOW = float(os.getenv("RETRY_BUDGET_WINDOW", "10"))  # Sekunden
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Methoden, die gefahrlos wiederholt werden können
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+
+
+class CircuitOpenError(Exception):
+    """Der Breaker einer Gegenstelle ist offen, der Aufruf wurde nicht ausgeführt"""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(
+            f"Gegenstelle {name} ist nicht erreichbar "
+            f"(nächster Versuch in {retry_after:.0f} s)"
+        )
+        self.name = name
+        self.retry_after = retry_after
+
+
+class RetryBudget:
+    """
+    Begrenzt Wiederholungen auf einen Anteil der Anfragen im Zeitfenster.
+
+    Erlaubt sind RETRY_BUDGET_MIN Wiederholungen plus ratio mal die Anzahl der
+    Anfragen in den letzten window Sekunden.
+    """
+
+    def __init__(
+        self,
+        ratio: float = RETRY_BUDGET_RATIO,
+        min_retries: int = RETRY_BUDGET_MIN,
+        window: float = RETRY_BUDGET_WINDOW,
+    ):
+        self.ratio = ratio
+        self.min_retries = min_retries
+        self.window = window
+        self._requests: deque = deque()
+        self._retries: deque = deque()
+        self._lock = threading.Lock()
+
+    def _prune(self, now: float) -> None:
+        """Entfernt Einträge außerhalb des Zeitfensters."""
+        limit = now - self.window
+        for entries in (self._requests, self._retries):
+            while entries and entries[0] < limit:
+                entries.popleft()
+
+    def record_request(self, now: Optional[float] = None) -> None:
+        """Vermerkt eine erste Anfrage (keine Wiederholung)."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._prune(now)
+            self._requests.append(now)
+
+    def try_retry(self, now: Optional[float] = None) -> bool:
+        """
+        Prüft, ob eine Wiederholung erlaubt ist, und verbucht sie gegebenenfalls.
+
+        Returns:
+            bool: True, wenn die Wiederholung ausgeführt werden darf
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._prune(now)
+            if len(self._retries) >= self.min_retries + self.ratio * len(self._requests):
+                return False
+            self._retries.append(now)
+            return True
+
+
+class CircuitBreaker:
+    """Circuit Breaker für eine Gegenstelle (threadsicher)"""
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD,
+        reset_timeout: float = CIRCUIT_RESET_TIMEOUT,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Initialisiert den Breaker.
+
+        Args:
+            name: Name der Gegenstelle (für Logs und Status)
+            failure_threshold: Fehler in Folge, nach denen der Breaker öffnet
+            reset_timeout: Sekunden bis zum ersten Probeaufruf
+            clock: Zeitquelle (für Tests austauschbar)
+        """
+        self.name = name
+        self.clock = clock
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.retry_budget = RetryBudget()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        """Aktueller Zustand (closed, open oder half_open)."""
+        with self._lock:
+            if self._state == OPEN and self.clock() - self._opened_at >= self.reset_timeout:
+                return HALF_OPEN
+            return self._state
+
+    def allow(self) -> bool:
+        """
+        Prüft, ob ein Aufruf ausgeführt werden darf.
+
+        Im halb offenen Zustand wird genau ein Probeaufruf zugelassen.
+        """
+        with self._lock:
+            if self._state == CLOSED:
+                return True
+            if self._state == OPEN:
+                if self.clock() - self._opened_at < self.reset_timeout:
+                    return False
+                self._state = HALF_OPEN
+                self._probe_in_flight = False
+            if self._probe_in_flight:
+                return False
+            self._probe_in_flight = True
+            return True
+
+    def retry_after(self) -> float:
+        """Sekunden bis zum nächsten Probeaufruf."""
+        return max(0.0, self._opened_at + self.reset_timeout - self.clock())
+
+    def record_success(self) -> None:
+        """Vermerkt einen erfolgreichen Aufruf und schließt den Breaker."""
+        with self._lock:
+            if self._state != CLOSED:
+                logger.info(
+                    f"Gegenstelle {self.name} wieder erreichbar, Circuit Breaker geschlossen"
+                )
+            self._state = CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        """Vermerkt einen fehlgeschlagenen Aufruf und öffnet den Breaker bei Bedarf."""
+        with self._lock:
+            self._failures += 1
+            self._probe_in_flight = False
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != OPEN:
+                    logger.warning(
+                        f"Gegenstelle {self.name} nicht erreichbar ({self._failures} Fehler), "
+                        f"Circuit Breaker für {self.reset_timeout:.0f} s geöffnet"
+                    )
+                self._state = OPEN
+                self._opened_at = self.clock()
+
+    def release(self) -> None:
+        """
+        Gibt einen abgebrochenen Aufruf frei, ohne ihn zu bewerten.
+
+        Wird z.B. ein Probeaufruf abgebrochen (asyncio.CancelledError), darf der
+        nächste Aufruf die Probe übernehmen.
+        """
+        with self._lock:
+            self._probe_in_flight = False
+
+    def call(self, func: Callable[..., Any], *args,
+             is_failure: Optional[Callable[[Any], bool]] = None, **kwargs) -> Any:
+        """
+        Führt einen Aufruf über den Breaker aus.
+
+        Args:
+            func: Auszuführende Funktion
+            is_failure: Optionale Prüfung, ob ein Ergebnis als Fehler zählt
+
+        Raises:
+            CircuitOpenError: Wenn der Breaker offen ist
+        """
+        if not self.allow():
+            raise CircuitOpenError(self.name, self.retry_after())
+        try:
+            result = func(*args, **kwargs)
+        except Exception:
+            self.record_failure()
+            raise
+        except BaseException:
+            # Abbruch (z.B. KeyboardInterrupt) ist kein Fehler der Gegenstelle
+            self.release()
+            raise
+        if is_failure is not None and is_failure(result):
+            self.record_failure()
+        else:
+            self.record_success()
+        return result
+
+    async def call_async(self, func: Callable[..., Any], *args,
+                         is_failure: Optional[Callable[[Any], bool]] = None,
+                         **kwargs) -> Any:
+        """Wie call(), für Coroutine-Funktionen."""
+        if not self.allow():
+            raise CircuitOpenError(self.name, self.retry_after())
+        try:
+            result = await func(*args, **kwargs)
+        except Exception:
+            self.record_failure()
+            raise
+        except BaseException:
+            # Abgebrochene Aufrufe (asyncio.CancelledError) blockieren sonst die Probe
+            self.release()
+            raise
+        if is_failure is not None and is_failure(result):
+            self.record_failure()
+        else:
+            self.record_success()
+        return result
+
+    def status(self) -> Dict[str, Any]:
+        """Gibt den Zustand für Status-Endpunkte zurück."""
+        state = self.state
+        return {
+            "state": state,
+            "failures": self._failures,
+            "retry_after": round(self.retry_after(), 1) if state == OPEN else 0,
+        }
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(name: str) -> CircuitBreaker:
+    """
+    Gibt den gemeinsamen Breaker einer Gegenstelle zurück.
+
+    Args:
+        name: Name der Gegenstelle, üblicherweise der Hostname (siehe breaker_for_url)
+    """
+    with _breakers_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            breaker = _breakers[name] = CircuitBreaker(name)
+        return breaker
+
+
+def breaker_for_url(url: str) -> CircuitBreaker:
+    """Gibt den Breaker für Host und Port einer URL zurück."""
+    return get_breaker(urlsplit(url).netloc or url)
+
+
+def breaker_states() -> Dict[str, Dict[str, Any]]:
+    """Gibt den Zustand aller Breaker zurück."""
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return {breaker.name: breaker.status() for breaker in breakers}
+
+
+def is_server_error(response: requests.Response) -> bool:
+    """Serverfehler und Überlastung zählen als Fehler der Gegenstelle, 4xx nicht."""
+    return response.status_code >= 500 or response.status_code == 429
+
+
+def http_request(method: str, url: str, retries: int = 1,
+                 session: Optional[requests.Session] = None,
+                 **kwargs) -> requests.Response:
+    """
+    Führt eine HTTP-Anfrage über den Breaker der Gegenstelle aus.
+
+    Verbindungsfehler und Serverfehler werden bei idempotenten Methoden bis zu
+    retries Mal wiederholt, sofern das Retry-Budget der Gegenstelle es zulässt.
+
+    Args:
+        method: HTTP-Methode
+        url: Ziel-URL
+        retries: Maximale Anzahl an Wiederholungen
+        session: Optionale requests-Session (Standard: requests)
+        **kwargs: Weitere Argumente für requests (z.B. timeout, headers)
+
+    Returns:
+        requests.Response: Antwort der Gegenstelle (auch bei Serverfehlern)
+
+    Raises:
+        CircuitOpenError: Wenn die Gegenstelle als nicht erreichbar gilt
+        requests.RequestException: Bei Verbindungsfehlern nach allen Versuchen
+    """
+    breaker = breaker_for_url(url)
+    client = session or requests
+    method = method.upper()
+    attempts = 1 + (retries if method in IDEMPOTENT_METHODS else 0)
+
+    breaker.retry_budget.record_request()
+    attempt = 1
+    while True:
+        can_retry = attempt < attempts
+        try:
+            response = breaker.call(
+                client.request, method, url, is_failure=is_server_error, **kwargs
+            )
+        except requests.RequestException:
+            if not (can_retry and breaker.retry_budget.try_retry()):
+                raise
+        else:
+            if not (is_server_error(response) and can_retry and breaker.retry_budget.try_retry()):
+                return response
+            response.close()
+        attempt += 1
@@ -8,10 +8,15 @@ Diese Datei enthält globale Konfigurationseinstellungen für die SwissAirDry-An
 """
 
 import os
+import time
+import threading
 import requests
 import logging
 from typing import Dict, Optional, Union
 
+# Paketimport, damit die Breaker im selben Register wie in /health landen
+from swissairdry.api.app.circuit_breaker import CircuitOpenError, http_request
+
 # Logger-Konfiguration
 logging.basicConfig(
     level=logging.INFO,
@@ -34,16 +39,80 @@ BACKUP_API_PORT = int(os.environ.get("BACKUP_API_PORT", "443"))
 BACKUP_API_SCHEME = os.environ.get("BACKUP_API_SCHEME", "https")
 BACKUP_API_PREFIX = "/api/v1"
 
+# Health-Checks der API-Server (im Hintergrund, siehe probe_api_servers)
+HEALTH_CHECK_INTERVAL = float(os.environ.get("HEALTH_CHECK_INTERVAL", "30"))
+HEALTH_CHECK_MAX_INTERVAL = float(os.environ.get("HEALTH_CHECK_MAX_INTERVAL", "300"))
+HEALTH_CHECK_TIMEOUT = float(os.environ.get("HEALTH_CHECK_TIMEOUT", "5"))
+# Anzahl erfolgreicher Prüfungen in Folge, bevor zurück zum primären Server gewechselt wird
+HEALTH_FAILBACK_SUCCESSES = int(os.environ.get("HEALTH_FAILBACK_SUCCESSES", "3"))
+
 # Globale Variablen für den Serverstatus
 _using_backup_server = False
 _primary_server_available = True
 _backup_server_available = True
+# Manueller Wechsel zum Backup-Server: kein automatischer Rückwechsel
+_backup_pinned = False
+_state_lock = threading.Lock()
 
 # Nextcloud-Konfiguration
 NEXTCLOUD_URL = os.environ.get("NEXTCLOUD_URL", "https://cloud.vgnc.org")
 NEXTCLOUD_APP_KEY = os.environ.get("NEXTCLOUD_APP_KEY", "")
 
 
+def _base_url(host: str, port: int, scheme: str, prefix: str) -> str:
+    """Setzt die Basis-URL eines API-Servers zusammen."""
+    url = f"{scheme}://{host}"
+    if port != 80 and port != 443:
+        url += f":{port}"
+    return url + prefix
+
+
+_PRIMARY_SERVER = {
+    "host": PRIMARY_API_HOST,
+    "port": PRIMARY_API_PORT,
+    "scheme": PRIMARY_API_SCHEME,
+    "prefix": PRIMARY_API_PREFIX,
+}
+_BACKUP_SERVER = {
+    "host": BACKUP_API_HOST,
+    "port": BACKUP_API_PORT,
+    "scheme": BACKUP_API_SCHEME,
+    "prefix": BACKUP_API_PREFIX,
+}
+_PRIMARY_BASE_URL = _base_url(PRIMARY_API_HOST, PRIMARY_API_PORT, PRIMARY_API_SCHEME, PRIMARY_API_PREFIX)
+_BACKUP_BASE_URL = _base_url(BACKUP_API_HOST, BACKUP_API_PORT, BACKUP_API_SCHEME, BACKUP_API_PREFIX)
+
+# Basis-URL des aktiven Servers, wird nur beim Umschalten geändert
+_active_base_url = _PRIMARY_BASE_URL
+
+
+class _ProbeState:
+    """Prüfzustand eines Servers mit exponentiellem Backoff bei Ausfällen"""
+    
+    def __init__(self):
+        self.successes = 0  # Erfolgreiche Prüfungen in Folge
+        self.failures = 0   # Fehlgeschlagene Prüfungen in Folge
+        self.next_probe = 0.0
+        self.last_probe: Optional[float] = None
+    
+    def record(self, available: bool, now: float) -> None:
+        """Vermerkt das Ergebnis einer Prüfung und plant die nächste."""
+        self.last_probe = now
+        if available:
+            self.successes += 1
+            self.failures = 0
+            delay = HEALTH_CHECK_INTERVAL
+        else:
+            self.failures += 1
+            self.successes = 0
+            delay = min(HEALTH_CHECK_INTERVAL * 2 ** (self.failures - 1), HEALTH_CHECK_MAX_INTERVAL)
+        self.next_probe = now + delay
+
+
+_primary_probe = _ProbeState()
+_backup_probe = _ProbeState()
+
+
 def check_api_availability(host: str, port: int, scheme: str, prefix: str) -> bool:
     """
     Überprüft, ob der angegebene API-Server erreichbar ist.
@@ -57,82 +126,104 @@ def check_api_availability(host: str, port: int, scheme: str, prefix: str) -> bo
     Returns:
         bool: True, wenn der Server erreichbar ist, sonst False
     """
-    url = f"{scheme}://{host}"
-    if port != 80 and port != 443:
-        url += f":{port}"
-    url += f"{prefix}/health"
+    url = f"{_base_url(host, port, scheme, prefix)}/health"
     
     try:
-        response = requests.get(url, timeout=5)
+        # Über den Circuit Breaker: ein ausgefallener Server wird ohne Timeout übersprungen
+        response = http_request("GET", url, retries=0, timeout=HEALTH_CHECK_TIMEOUT)
         return response.status_code == 200
-    except requests.RequestException:
+    except (requests.RequestException, CircuitOpenError):
         return False
 
 
-def get_active_api_server() -> Dict[str, Union[str, int]]:
+def _set_using_backup(using_backup: bool, reason: str) -> None:
+    """Schaltet den aktiven Server um (Aufruf nur mit _state_lock)."""
+    global _using_backup_server, _active_base_url
+    if using_backup == _using_backup_server:
+        return
+    _using_backup_server = using_backup
+    _active_base_url = _BACKUP_BASE_URL if using_backup else _PRIMARY_BASE_URL
+    logger.info("%s: %s", reason, BACKUP_API_HOST if using_backup else PRIMARY_API_HOST)
+
+
+def _update_availability(primary: Optional[bool], backup: Optional[bool]) -> None:
+    """Übernimmt neue Prüfergebnisse und entscheidet über einen Serverwechsel."""
+    global _primary_server_available, _backup_server_available
+    
+    with _state_lock:
+        if primary is not None and primary != _primary_server_available:
+            _primary_server_available = primary
+            if primary:
+                logger.info("Primärer Server ist wieder erreichbar: %s", PRIMARY_API_HOST)
+            else:
+                logger.warning("Primärer Server ist nicht erreichbar: %s", PRIMARY_API_HOST)
+        
+        if backup is not None and backup != _backup_server_available:
+            _backup_server_available = backup
+            if backup:
+                logger.info("Backup-Server ist erreichbar: %s", BACKUP_API_HOST)
+            else:
+                logger.warning("Backup-Server ist nicht erreichbar: %s", BACKUP_API_HOST)
+        
+        if not _using_backup_server:
+            # Sofort wechseln, sobald der primäre Server ausfällt und das Backup erreichbar ist
+            if not _primary_server_available and _backup_server_available:
+                _set_using_backup(True, "Verwende Backup-Server")
+        elif not _backup_pinned or not _backup_server_available:
+            # Rückwechsel erst nach mehreren erfolgreichen Prüfungen in Folge (Hysterese),
+            # damit ein instabiler primärer Server nicht ständig hin und her schaltet
+            if _primary_probe.successes >= HEALTH_FAILBACK_SUCCESSES or (
+                _primary_server_available and not _backup_server_available
+            ):
+                _set_using_backup(False, "Wechsel zurück zum primären Server")
+
+
+def probe_api_servers(now: Optional[float] = None) -> float:
     """
-    Gibt den aktiven API-Server zurück und wechselt bei Bedarf automatisch zwischen
-    dem primären und dem Backup-Server.
+    Prüft alle fälligen API-Server und aktualisiert den zwischengespeicherten Status.
+    
+    Ein erreichbarer Server wird alle HEALTH_CHECK_INTERVAL Sekunden geprüft,
+    bei Ausfällen verdoppelt sich der Abstand bis HEALTH_CHECK_MAX_INTERVAL.
+    Die Funktion blockiert für die Dauer der HTTP-Anfragen und wird von einer
+    Hintergrundaufgabe aufgerufen.
+    
+    Args:
+        now: Aktueller Zeitpunkt (time.monotonic(), Standard: jetzt)
     
     Returns:
-        Dict: Ein Dictionary mit den Verbindungsdaten des aktiven API-Servers
+        float: Sekunden bis zur nächsten fälligen Prüfung
     """
-    global _using_backup_server, _primary_server_available, _backup_server_available
+    now = time.monotonic() if now is None else now
+    primary = backup = None
     
-    # Überprüfen, ob der primäre Server erreichbar ist
-    primary_available = check_api_availability(
-        PRIMARY_API_HOST, PRIMARY_API_PORT, PRIMARY_API_SCHEME, PRIMARY_API_PREFIX
-    )
+    if _primary_probe.next_probe <= now:
+        primary = check_api_availability(
+            PRIMARY_API_HOST, PRIMARY_API_PORT, PRIMARY_API_SCHEME, PRIMARY_API_PREFIX
+        )
+        _primary_probe.record(primary, now)
     
-    # Status des primären Servers aktualisieren
-    if primary_available != _primary_server_available:
-        _primary_server_available = primary_available
-        if primary_available:
-            logger.info("Primärer Server ist wieder erreichbar: %s", PRIMARY_API_HOST)
-        else:
-            logger.warning("Primärer Server ist nicht erreichbar: %s", PRIMARY_API_HOST)
-    
-    # Wenn wir den Backup-Server verwenden und der primäre Server wieder verfügbar ist,
-    # wechseln wir zurück zum primären Server
-    if _using_backup_server and primary_available:
-        _using_backup_server = False
-        logger.info("Wechsel zurück zum primären Server: %s", PRIMARY_API_HOST)
-    
-    # Wenn wir den primären Server verwenden und er nicht verfügbar ist,
-    # prüfen wir, ob der Backup-Server verfügbar ist
-    if not _using_backup_server and not primary_available:
-        backup_available = check_api_availability(
+    # Das Backup sofort prüfen, wenn der primäre Server gerade ausgefallen ist
+    if _backup_probe.next_probe <= now or (primary is False and _primary_probe.failures == 1):
+        backup = check_api_availability(
             BACKUP_API_HOST, BACKUP_API_PORT, BACKUP_API_SCHEME, BACKUP_API_PREFIX
         )
-        
-        # Status des Backup-Servers aktualisieren
-        if backup_available != _backup_server_available:
-            _backup_server_available = backup_available
-            if backup_available:
-                logger.info("Backup-Server ist erreichbar: %s", BACKUP_API_HOST)
-            else:
-                logger.warning("Backup-Server ist nicht erreichbar: %s", BACKUP_API_HOST)
-        
-        # Wenn der Backup-Server verfügbar ist, wechseln wir zu diesem
-        if backup_available:
-            _using_backup_server = True
-            logger.info("Verwende Backup-Server: %s", BACKUP_API_HOST)
-    
-    # Rückgabe der Verbindungsdaten des aktiven Servers
-    if _using_backup_server:
-        return {
-            "host": BACKUP_API_HOST,
-            "port": BACKUP_API_PORT,
-            "scheme": BACKUP_API_SCHEME,
-            "prefix": BACKUP_API_PREFIX
-        }
-    else:
-        return {
-            "host": PRIMARY_API_HOST,
-            "port": PRIMARY_API_PORT,
-            "scheme": PRIMARY_API_SCHEME,
-            "prefix": PRIMARY_API_PREFIX
-        }
+        _backup_probe.record(backup, now)
+    
+    _update_availability(primary, backup)
+    return max(0.0, min(_primary_probe.next_probe, _backup_probe.next_probe) - now)
+
+
+def get_active_api_server() -> Dict[str, Union[str, int]]:
+    """
+    Gibt die Verbindungsdaten des aktiven API-Servers zurück.
+    
+    Der Wechsel zwischen primärem und Backup-Server erfolgt im Hintergrund
+    durch probe_api_servers(), hier wird nur der zwischengespeicherte Status gelesen.
+    
+    Returns:
+        Dict: Ein Dictionary mit den Verbindungsdaten des aktiven API-Servers
+    """
+    return dict(_BACKUP_SERVER if _using_backup_server else _PRIMARY_SERVER)
 
 
 def get_full_url(path: str) -> str:
@@ -145,12 +236,7 @@ def get_full_url(path: str) -> str:
     Returns:
         str: Die vollständige URL zum API-Endpunkt
     """
-    server = get_active_api_server()
-    url = f"{server['scheme']}://{server['host']}"
-    if server['port'] != 80 and server['port'] != 443:
-        url += f":{server['port']}"
-    url += f"{server['prefix']}{path}"
-    return url
+    return f"{_active_base_url}{path}"
 
 
 def get_nextcloud_url(path: str) -> str:
@@ -194,18 +280,20 @@ def get_api_status() -> Dict[str, Union[str, bool]]:
 def switch_to_backup_server() -> None:
     """
     Wechselt manuell zum Backup-Server.
+    
+    Ein automatischer Rückwechsel erfolgt erst, wenn der Backup-Server ausfällt.
     """
-    global _using_backup_server
-    if not _using_backup_server:
-        _using_backup_server = True
-        logger.info("Manueller Wechsel zum Backup-Server: %s", BACKUP_API_HOST)
+    global _backup_pinned
+    with _state_lock:
+        _backup_pinned = True
+        _set_using_backup(True, "Manueller Wechsel zum Backup-Server")
 
 
 def switch_to_primary_server() -> None:
     """
     Wechselt manuell zum primären Server.
     """
-    global _using_backup_server
-    if _using_backup_server:
-        _using_backup_server = False
-        logger.info("Manueller Wechsel zum primären Server: %s", PRIMARY_API_HOST)
\ No newline at end of file
+    global _backup_pinned
+    with _state_lock:
+        _backup_pinned = False
+        _set_using_backup(False, "Manueller Wechsel zum primären Server")
\ No newline at end of file
@@ -7,7 +7,7 @@ Enthält alle Datenbankoperationen für die SwissAirDry API.
 @copyright 2023-2025 Swiss Air Dry Team
 """
 
-from typing import List, Optional, Dict, Any, Union
+from typing import List, Optional, Dict, Any, Union, Tuple
 from datetime import datetime
 from sqlalchemy.orm import Session
 
@@ -15,6 +15,12 @@ from swissairdry.api.app import models
 from swissairdry import schemas
 
 
+# Spalten für die schnellen Listenabfragen, abgeleitet aus den Antwort-Schemas,
+# damit die JSON-Ausgabe identisch zum response_model bleibt
+DEVICE_LIST_COLUMNS = tuple(schemas.Device.model_fields)
+SENSOR_DATA_LIST_COLUMNS = tuple(schemas.SensorData.model_fields)
+
+
 # --- Geräte-Operationen ---
 
 def get_device(db: Session, device_id: int) -> Optional[models.Device]:
@@ -32,6 +38,20 @@ def get_devices(db: Session, skip: int = 0, limit: int = 100) -> List[models.Dev
     return db.query(models.Device).offset(skip).limit(limit).all()
 
 
+def get_device_rows(
+    db: Session, skip: int = 0, limit: int = 100
+) -> Tuple[Tuple[str, ...], List[Tuple[Any, ...]]]:
+    """
+    Gibt eine Liste von Geräten als Spalten-Tupel zurück.
+
+    Es werden nur die Spalten aus DEVICE_LIST_COLUMNS abgefragt, ohne ORM-Objekte
+    zu instanziieren.
+    """
+    columns = [getattr(models.Device, name) for name in DEVICE_LIST_COLUMNS]
+    rows = db.query(*columns).offset(skip).limit(limit).all()
+    return DEVICE_LIST_COLUMNS, [tuple(row) for row in rows]
+
+
 def create_device(db: Session, device: schemas.DeviceCreate) -> models.Device:
     """Erstellt ein neues Gerät."""
     import uuid
@@ -96,6 +116,26 @@ def get_sensor_data_by_device(
     )
 
 
+def get_sensor_data_rows_by_device(
+    db: Session, device_id: str, limit: int = 100
+) -> Tuple[Tuple[str, ...], List[Tuple[Any, ...]]]:
+    """
+    Gibt die Sensordaten eines Geräts als Spalten-Tupel zurück.
+
+    Es werden nur die Spalten aus SENSOR_DATA_LIST_COLUMNS abgefragt, ohne
+    ORM-Objekte zu instanziieren.
+    """
+    columns = [getattr(models.SensorData, name) for name in SENSOR_DATA_LIST_COLUMNS]
+    rows = (
+        db.query(*columns)
+        .filter(models.SensorData.device_id == device_id)
+        .order_by(models.SensorData.timestamp.desc())
+        .limit(limit)
+        .all()
+    )
+    return SENSOR_DATA_LIST_COLUMNS, [tuple(row) for row in rows]
+
+
 def create_sensor_data(
     db: Session, sensor_data: schemas.SensorDataCreate, device_id: int
 ) -> models.SensorData:
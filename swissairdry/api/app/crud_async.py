@@ -0,0 +1,248 @@
+"""
+SwissAirDry - Asynchrone CRUD-Operationen
+
+Enthält die asynchronen Varianten der häufig genutzten Datenbankoperationen
+aus crud.py. Sie arbeiten mit einer AsyncSession und blockieren den Event-Loop
+nicht, sodass Datenaufnahme, MQTT-Callbacks und WebSocket-Pushes auf einem
+Worker parallel laufen können.
+
+@author Swiss Air Dry Team <info@swissairdry.com>
+@copyright 2023-2025 Swiss Air Dry Team
+"""
+
+import uuid
+from datetime import datetime
+from typing import List, Optional, Any, Tuple
+
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from swissairdry.api.app import models
+from swissairdry.api.app.crud import DEVICE_LIST_COLUMNS, SENSOR_DATA_LIST_COLUMNS
+from swissairdry import schemas
+
+
+# --- Geräte-Operationen ---
+
+async def get_device_by_device_id(db: AsyncSession, device_id: str) -> Optional[models.Device]:
+    """Gibt ein Gerät anhand seiner Geräte-ID zurück."""
+    result = await db.execute(
+        select(models.Device).where(models.Device.device_id == device_id).limit(1)
+    )
+    return result.scalars().first()
+
+
+async def get_devices(db: AsyncSession, skip: int = 0, limit: int = 100) -> List[models.Device]:
+    """Gibt eine Liste von Geräten zurück."""
+    result = await db.execute(select(models.Device).offset(skip).limit(limit))
+    return list(result.scalars().all())
+
+
+async def get_device_rows(
+    db: AsyncSession, skip: int = 0, limit: int = 100
+) -> Tuple[Tuple[str, ...], List[Tuple[Any, ...]]]:
+    """
+    Gibt eine Liste von Geräten als Spalten-Tupel zurück.
+
+    Es werden nur die Spalten aus DEVICE_LIST_COLUMNS abgefragt, ohne ORM-Objekte
+    zu instanziieren.
+    """
+    columns = [getattr(models.Device, name) for name in DEVICE_LIST_COLUMNS]
+    result = await db.execute(select(*columns).offset(skip).limit(limit))
+    return DEVICE_LIST_COLUMNS, [tuple(row) for row in result.all()]
+
+
+async def create_device(db: AsyncSession, device: schemas.DeviceCreate) -> models.Device:
+    """Erstellt ein neues Gerät."""
+    db_device = models.Device(
+        id=str(uuid.uuid4()),
+        device_id=device.device_id,
+        name=device.name,
+        description=device.description,
+        type=device.type,
+        location=device.location,
+        customer_id=device.customer_id,
+        job_id=device.job_id,
+        api_key=device.api_key,
+        mqtt_topic=device.mqtt_topic,
+        firmware_version=device.firmware_version,
+        configuration=device.configuration
+    )
+    db.add(db_device)
+    await db.commit()
+    await db.refresh(db_device)
+    return db_device
+
+
+async def update_device(
+    db: AsyncSession, device_id: str, device: schemas.DeviceUpdate
+) -> Optional[models.Device]:
+    """Aktualisiert ein Gerät."""
+    db_device = await get_device_by_device_id(db, device_id)
+    if db_device is None:
+        return None
+
+    # Aktualisiere nur die angegebenen Felder
+    update_data = device.dict(exclude_unset=True)
+    for key, value in update_data.items():
+        setattr(db_device, key, value)
+
+    await db.commit()
+    await db.refresh(db_device)
+    return db_device
+
+
+async def get_online_devices(db: AsyncSession) -> List[Tuple[str, Optional[datetime], Any]]:
+    """Gibt Geräte-ID, letzte Meldung und Konfiguration aller online geführten Geräte zurück."""
+    result = await db.execute(
+        select(models.Device.device_id, models.Device.last_seen, models.Device.configuration)
+        .where(models.Device.status == "online")
+    )
+    return [tuple(row) for row in result.all()]
+
+
+async def mark_devices_offline(db: AsyncSession, device_ids: List[str]) -> None:
+    """Setzt den Status der angegebenen Geräte auf offline (ohne Commit)."""
+    if not device_ids:
+        return
+    await db.execute(
+        update(models.Device)
+        .where(models.Device.device_id.in_(device_ids), models.Device.status == "online")
+        .values(status="offline")
+    )
+
+
+# --- Sensordaten-Operationen ---
+
+async def get_sensor_data_rows_by_device(
+    db: AsyncSession, device_id: str, limit: int = 100
+) -> Tuple[Tuple[str, ...], List[Tuple[Any, ...]]]:
+    """
+    Gibt die Sensordaten eines Geräts als Spalten-Tupel zurück.
+
+    Es werden nur die Spalten aus SENSOR_DATA_LIST_COLUMNS abgefragt, ohne
+    ORM-Objekte zu instanziieren.
+    """
+    columns = [getattr(models.SensorData, name) for name in SENSOR_DATA_LIST_COLUMNS]
+    result = await db.execute(
+        select(*columns)
+        .where(models.SensorData.device_id == device_id)
+        .order_by(models.SensorData.timestamp.desc())
+        .limit(limit)
+    )
+    return SENSOR_DATA_LIST_COLUMNS, [tuple(row) for row in result.all()]
+
+
+async def create_sensor_data(
+    db: AsyncSession,
+    sensor_data: schemas.SensorDataCreate,
+    device_id: str,
+    commit: bool = True,
+) -> models.SensorData:
+    """
+    Erstellt neue Sensordaten für ein Gerät.
+
+    Mit commit=False wird der Datensatz nur zur Session hinzugefügt, damit
+    weitere Änderungen (z.B. der Gerätestatus) im selben Commit landen.
+    """
+    db_sensor_data = models.SensorData(
+        device_id=device_id,
+        # Zeitstempel clientseitig setzen, damit er nach dem Commit ohne
+        # erneute Abfrage verfügbar ist
+        timestamp=sensor_data.timestamp or datetime.now(),
+        temperature=sensor_data.temperature,
+        humidity=sensor_data.humidity,
+        power=sensor_data.power,
+        energy=sensor_data.energy,
+        relay_state=sensor_data.relay_state,
+        runtime=sensor_data.runtime,
+        extra_data=sensor_data.extra_data
+    )
+    db.add(db_sensor_data)
+    if commit:
+        await db.commit()
+        await db.refresh(db_sensor_data)
+    else:
+        await db.flush()
+    return db_sensor_data
+
+
+# --- Alarm-Operationen ---
+
+async def get_alerts(
+    db: AsyncSession,
+    device_id: Optional[str] = None,
+    active_only: bool = True,
+    limit: int = 100,
+) -> List[models.Alert]:
+    """Gibt Alarme zurück, neueste zuerst."""
+    query = select(models.Alert)
+    if device_id is not None:
+        query = query.where(models.Alert.device_id == device_id)
+    if active_only:
+        query = query.where(models.Alert.is_active.is_(True))
+    result = await db.execute(query.order_by(models.Alert.created_at.desc()).limit(limit))
+    return list(result.scalars().all())
+
+
+async def get_active_alert_keys(db: AsyncSession) -> List[Tuple[str, str]]:
+    """Gibt Geräte-ID und Alarmtyp aller aktiven Alarme zurück."""
+    result = await db.execute(
+        select(models.Alert.device_id, models.Alert.alert_type)
+        .where(models.Alert.is_active.is_(True))
+        .distinct()
+    )
+    return [tuple(row) for row in result.all()]
+
+
+async def acknowledge_alert(
+    db: AsyncSession, alert_id: int, user_id: Optional[int] = None
+) -> Optional[models.Alert]:
+    """Markiert einen Alarm als bestätigt."""
+    db_alert = await db.get(models.Alert, alert_id)
+    if db_alert is None:
+        return None
+    db_alert.acknowledged = True
+    db_alert.acknowledged_by = user_id
+    await db.commit()
+    await db.refresh(db_alert)
+    return db_alert
+
+
+async def apply_alert_events(db: AsyncSession, events: List[Any]) -> None:
+    """
+    Überträgt Zustandswechsel der Alarm-Engine in die Datenbank.
+
+    Ausgelöste Alarme werden angelegt, sofern für Gerät und Typ noch kein
+    aktiver Alarm besteht; aufgehobene Alarme werden deaktiviert. Es wird
+    nicht committet, damit die Änderungen mit den Sensordaten gespeichert werden.
+
+    Args:
+        db: Datenbank-Session
+        events: AlertEvent-Objekte aus alerts.AlertEngine
+    """
+    for event in events:
+        result = await db.execute(
+            select(models.Alert).where(
+                models.Alert.device_id == event.device_id,
+                models.Alert.alert_type == event.alert_type,
+                models.Alert.is_active.is_(True),
+            )
+        )
+        active = list(result.scalars().all())
+        if event.fired:
+            if not active:
+                db.add(models.Alert(
+                    device_id=event.device_id,
+                    alert_type=event.alert_type,
+                    message=event.message,
+                    value=event.value,
+                    threshold=event.threshold,
+                    is_active=True,
+                    acknowledged=False,
+                    created_at=datetime.fromtimestamp(event.timestamp),
+                ))
+        else:
+            for db_alert in active:
+                db_alert.is_active = False
+                db_alert.resolved_at = datetime.fromtimestamp(event.timestamp)
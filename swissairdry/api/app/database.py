@@ -6,38 +6,363 @@ SwissAirDry API - Datenbankverbindung
 """
 
 import os
-from typing import Dict, Any
+import time
+import logging
+from typing import Dict, Any, Optional, AsyncIterator
 
 import sqlalchemy
+from sqlalchemy import event, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from dotenv import load_dotenv
 
+# Async-Erweiterung ist optional (benötigt greenlet und einen Async-Treiber)
+try:
+    from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+except ImportError:
+    AsyncSession = None
+    create_async_engine = None
+
 # Umgebungsvariablen laden
 load_dotenv()
 
+logger = logging.getLogger("swissairdry_api")
+
 # Datenbankverbindungs-URL
 SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./swissairdry.db")
 
-# Engine erstellen
-if SQLALCHEMY_DATABASE_URL.startswith("sqlite"):
-    engine = sqlalchemy.create_engine(
-        SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
-    )
-else:
-    engine = sqlalchemy.create_engine(
-        SQLALCHEMY_DATABASE_URL,
-        pool_pre_ping=True,
-        pool_recycle=300,
+# Pool-Einstellungen für Client/Server-Datenbanken (PostgreSQL)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "300"))
+
+# SQLite-Einstellungen für kleine Edge-Installationen
+SQLITE_WAL = os.getenv("SQLITE_WAL", "true").lower() == "true"
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+
+# Zähler für Pool-Ereignisse, je Engine
+_pool_metrics: Dict[str, Dict[str, int]] = {}
+
+
+def _engine_options(url: str) -> Dict[str, Any]:
+    """
+    Gibt die Engine-Optionen für die angegebene Datenbank-URL zurück.
+
+    Args:
+        url: Datenbank-URL
+
+    Returns:
+        Dict: Schlüsselwortargumente für create_engine bzw. create_async_engine
+    """
+    if url.startswith("sqlite"):
+        # Die Wartezeit bei gesperrter Datenbank regelt PRAGMA busy_timeout
+        return {"connect_args": {"check_same_thread": False}}
+    return {
+        "pool_pre_ping": True,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+    }
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    """
+    Setzt die SQLite-Pragmas für jede neue Verbindung.
+
+    Im WAL-Modus blockieren Schreibzugriffe keine Leser mehr, sodass
+    Verlaufsabfragen während der Datenaufnahme nicht mit "database is locked"
+    abbrechen. synchronous=NORMAL ist im WAL-Modus absturzsicher und spart
+    ein fsync pro Commit.
+    """
+    cursor = dbapi_connection.cursor()
+    try:
+        if SQLITE_WAL:
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        if SQLITE_MMAP_SIZE > 0:
+            cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+    finally:
+        cursor.close()
+
+
+def _register_pool_events(sync_engine, name: str) -> None:
+    """
+    Registriert Ereignis-Listener für SQLite-Pragmas und Pool-Metriken.
+
+    Args:
+        sync_engine: Synchrone Engine (bei Async-Engines deren sync_engine)
+        name: Name der Engine in den Metriken
+    """
+    metrics = _pool_metrics.setdefault(
+        name, {"connects": 0, "checkouts": 0, "checkins": 0, "invalidations": 0}
     )
 
+    if sync_engine.dialect.name == "sqlite":
+        event.listen(sync_engine, "connect", _set_sqlite_pragmas)
+
+    def on_connect(dbapi_connection, connection_record):
+        metrics["connects"] += 1
+
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        metrics["checkouts"] += 1
+
+    def on_checkin(dbapi_connection, connection_record):
+        metrics["checkins"] += 1
+
+    def on_invalidate(dbapi_connection, connection_record, exception):
+        metrics["invalidations"] += 1
+
+    event.listen(sync_engine, "connect", on_connect)
+    event.listen(sync_engine, "checkout", on_checkout)
+    event.listen(sync_engine, "checkin", on_checkin)
+    event.listen(sync_engine, "invalidate", on_invalidate)
+
+
+def _pool_snapshot(sync_engine, name: str) -> Dict[str, Any]:
+    """Liefert den aktuellen Zustand des Pools einer Engine."""
+    pool = sync_engine.pool
+    snapshot: Dict[str, Any] = {"pool_class": type(pool).__name__}
+    # Nicht jede Pool-Klasse (z.B. NullPool) führt diese Kennzahlen
+    for attribute in ("size", "checkedin", "checkedout", "overflow"):
+        method = getattr(pool, attribute, None)
+        if callable(method):
+            snapshot[attribute] = method()
+    snapshot.update(_pool_metrics.get(name, {}))
+    return snapshot
+
+
+# Engine erstellen
+engine = sqlalchemy.create_engine(
+    SQLALCHEMY_DATABASE_URL, **_engine_options(SQLALCHEMY_DATABASE_URL)
+)
+_register_pool_events(engine, "primary")
+
 # Sessionmaker erstellen
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+
+def _derive_async_url(url: str) -> Optional[str]:
+    """
+    Leitet aus der synchronen Datenbank-URL die URL für den Async-Treiber ab.
+
+    Args:
+        url: Synchrone Datenbank-URL
+
+    Returns:
+        Optional[str]: URL mit aiosqlite- bzw. asyncpg-Treiber oder None,
+        wenn für das Backend kein Async-Treiber bekannt ist
+    """
+    scheme, separator, rest = url.partition("://")
+    if not separator:
+        return None
+    backend = scheme.split("+", 1)[0]
+    if backend == "sqlite":
+        return f"sqlite+aiosqlite://{rest}"
+    if backend in ("postgresql", "postgres"):
+        return f"postgresql+asyncpg://{rest}"
+    return None
+
+
+# Async-Datenbankverbindungs-URL (kann explizit gesetzt werden)
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or _derive_async_url(SQLALCHEMY_DATABASE_URL)
+
+def _create_async_sessionmaker(url: Optional[str], name: str):
+    """
+    Erstellt eine Async-Engine samt Sessionmaker, falls Erweiterung und
+    Treiber verfügbar sind.
+
+    Args:
+        url: Async-Datenbank-URL
+        name: Name der Engine in den Pool-Metriken
+
+    Returns:
+        Tuple: (Engine, Sessionmaker) oder (None, None)
+    """
+    if create_async_engine is None or not url:
+        return None, None
+    try:
+        async_engine = create_async_engine(url, **_engine_options(url))
+    except ImportError as e:
+        logger.warning(f"Async-Datenbanktreiber nicht verfügbar: {e}")
+        return None, None
+    _register_pool_events(async_engine.sync_engine, name)
+    # expire_on_commit=False, da Attribute nach dem Commit nicht
+    # nachgeladen werden können, ohne erneut auf die Datenbank zu warten
+    session_factory = sessionmaker(
+        bind=async_engine,
+        class_=AsyncSession,
+        autoflush=False,
+        expire_on_commit=False,
+    )
+    return async_engine, session_factory
+
+
+# Async-Engine erstellen, falls Erweiterung und Treiber verfügbar sind
+async_engine, AsyncSessionLocal = _create_async_sessionmaker(ASYNC_DATABASE_URL, "async")
+
+ASYNC_DATABASE_AVAILABLE = AsyncSessionLocal is not None
+
+
+# --- Lesereplikat (optional) ---
+
+# Lesende Abfragen (Verläufe, Listen, Berichte) können auf ein Replikat
+# ausgelagert werden, Schreibzugriffe bleiben auf der primären Datenbank
+DATABASE_REPLICA_URL = os.getenv("DATABASE_REPLICA_URL", "")
+ASYNC_DATABASE_REPLICA_URL = os.getenv("ASYNC_DATABASE_REPLICA_URL") or (
+    _derive_async_url(DATABASE_REPLICA_URL) if DATABASE_REPLICA_URL else None
+)
+
+# Maximal tolerierte Replikationsverzögerung in Sekunden
+DB_REPLICA_MAX_LAG = float(os.getenv("DB_REPLICA_MAX_LAG", "30"))
+# Intervall in Sekunden, in dem die Verzögerung erneut geprüft wird
+DB_REPLICA_CHECK_INTERVAL = float(os.getenv("DB_REPLICA_CHECK_INTERVAL", "10"))
+
+# Liefert (in Recovery, Verzögerung). Die Verzögerung ist 0, wenn der
+# WAL-Receiver streamt und alle empfangenen WAL-Daten eingespielt sind. Sonst
+# ist sie das Alter der zuletzt eingespielten Transaktion, damit ein Replikat
+# mit getrenntem WAL-Receiver (empfangene = eingespielte Position, aber keine
+# neuen Daten) nach DB_REPLICA_MAX_LAG nicht mehr genutzt wird. Ohne
+# pg_read_all_stats ist status NULL, dann zählt ein laufender Receiver.
+_REPLICA_LAG_QUERY = text(
+    "SELECT pg_is_in_recovery(), "
+    "CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() "
+    "AND EXISTS (SELECT 1 FROM pg_stat_wal_receiver "
+    "WHERE status = 'streaming' OR status IS NULL) THEN 0 "
+    "ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+)
+
+replica_engine = None
+ReplicaSessionLocal = None
+if DATABASE_REPLICA_URL:
+    replica_engine = sqlalchemy.create_engine(
+        DATABASE_REPLICA_URL, **_engine_options(DATABASE_REPLICA_URL)
+    )
+    _register_pool_events(replica_engine, "replica")
+    ReplicaSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=replica_engine)
+
+async_replica_engine, AsyncReplicaSessionLocal = _create_async_sessionmaker(
+    ASYNC_DATABASE_REPLICA_URL, "async_replica"
+)
+
+# Zwischengespeichertes Ergebnis der letzten Verzögerungsprüfung
+_replica_state: Dict[str, Any] = {"checked_at": None, "usable": False, "lag": None}
+
+
+def _evaluate_replica_lag(lag: Optional[float], in_recovery: bool = False) -> bool:
+    """
+    Speichert das Ergebnis einer Verzögerungsprüfung und bewertet es.
+
+    Args:
+        lag: Verzögerung in Sekunden, None wenn unbekannt
+        in_recovery: True für ein PostgreSQL-Replikat; ohne Recovery (Primärserver,
+            andere Datenbanken) gibt es keine Verzögerung
+    """
+    lag = float(lag) if lag is not None else None
+    if in_recovery:
+        # Ohne eingespielte Transaktion ist das Alter des Replikats unbekannt
+        usable = lag is not None and lag <= DB_REPLICA_MAX_LAG
+    else:
+        usable = lag is None or lag <= DB_REPLICA_MAX_LAG
+    if _replica_state["usable"] and not usable:
+        behind = f"hinkt {lag:.1f}s hinterher" if lag is not None else "hat keinen bekannten Stand"
+        logger.warning(
+            f"Lesereplikat {behind}, Abfragen gehen an die primäre Datenbank"
+        )
+    _replica_state.update(checked_at=time.monotonic(), usable=usable, lag=lag)
+    return usable
+
+
+def _replica_check_due() -> bool:
+    """Prüft, ob die zwischengespeicherte Verzögerung veraltet ist."""
+    checked_at = _replica_state["checked_at"]
+    return checked_at is None or time.monotonic() - checked_at >= DB_REPLICA_CHECK_INTERVAL
+
+
+def _replica_check_failed(error: Exception) -> bool:
+    """Markiert das Replikat nach einem Verbindungsfehler als nicht nutzbar."""
+    logger.warning(f"Lesereplikat nicht erreichbar, Abfragen gehen an die primäre Datenbank: {error}")
+    _replica_state.update(checked_at=time.monotonic(), usable=False, lag=None)
+    return False
+
+
+def replica_usable() -> bool:
+    """
+    Prüft, ob das Lesereplikat genutzt werden kann.
+
+    Das Ergebnis wird für DB_REPLICA_CHECK_INTERVAL Sekunden zwischengespeichert,
+    damit nicht jede Anfrage eine zusätzliche Abfrage auslöst.
+
+    Returns:
+        bool: True, wenn das Replikat erreichbar ist und die Verzögerung
+        innerhalb von DB_REPLICA_MAX_LAG liegt
+    """
+    if replica_engine is None:
+        return False
+    if not _replica_check_due():
+        return _replica_state["usable"]
+    if replica_engine.dialect.name != "postgresql":
+        return _evaluate_replica_lag(None)
+    try:
+        with replica_engine.connect() as connection:
+            in_recovery, lag = connection.execute(_REPLICA_LAG_QUERY).one()
+            return _evaluate_replica_lag(lag, in_recovery)
+    except Exception as e:
+        return _replica_check_failed(e)
+
+
+async def async_replica_usable() -> bool:
+    """
+    Asynchrone Variante von replica_usable() für die Async-Engine.
+
+    Returns:
+        bool: True, wenn das Replikat genutzt werden kann
+    """
+    if async_replica_engine is None:
+        return False
+    if not _replica_check_due():
+        return _replica_state["usable"]
+    if async_replica_engine.dialect.name != "postgresql":
+        return _evaluate_replica_lag(None)
+    try:
+        async with async_replica_engine.connect() as connection:
+            result = await connection.execute(_REPLICA_LAG_QUERY)
+            in_recovery, lag = result.one()
+            return _evaluate_replica_lag(lag, in_recovery)
+    except Exception as e:
+        return _replica_check_failed(e)
+
+
 # Basisklasse für Modelle
 Base = declarative_base()
 
 
+def get_pool_status() -> Dict[str, Any]:
+    """
+    Gibt Kennzahlen zur Auslastung der Verbindungspools zurück.
+
+    Returns:
+        Dict: Pool-Zustand und Ereigniszähler je Engine
+    """
+    status = {"primary": _pool_snapshot(engine, "primary")}
+    if async_engine is not None:
+        status["async"] = _pool_snapshot(async_engine.sync_engine, "async")
+    if replica_engine is not None:
+        status["replica"] = _pool_snapshot(replica_engine, "replica")
+    if async_replica_engine is not None:
+        status["async_replica"] = _pool_snapshot(async_replica_engine.sync_engine, "async_replica")
+    if replica_engine is not None or async_replica_engine is not None:
+        status["replica_state"] = {
+            "usable": _replica_state["usable"],
+            "lag": _replica_state["lag"],
+            "max_lag": DB_REPLICA_MAX_LAG,
+        }
+    return status
+
+
 # Hilfsfunktion für Datenbankabfragen
 def get_db():
     """
@@ -48,4 +373,69 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+def require_async_database() -> None:
+    """
+    Bricht den Start ab, wenn die Async-Datenbankverbindung fehlt.
+
+    Routen, Alarmauswertung und Offline-Erkennung des API-Servers nutzen die
+    Async-Session. Statt erst bei der ersten Anfrage mit Fehler 500
+    abzubrechen, wird beim Start geprüft, ob Erweiterung und Treiber vorhanden sind.
+
+    Raises:
+        RuntimeError: Wenn keine Async-Engine erstellt werden konnte
+    """
+    if AsyncSessionLocal is None:
+        raise RuntimeError(
+            f"Async-Datenbankverbindung für {ASYNC_DATABASE_URL or SQLALCHEMY_DATABASE_URL} "
+            "nicht verfügbar: sqlalchemy[asyncio] sowie aiosqlite (SQLite) bzw. "
+            "asyncpg (PostgreSQL) installieren oder ASYNC_DATABASE_URL setzen"
+        )
+
+
+async def get_async_db() -> AsyncIterator["AsyncSession"]:
+    """
+    Asynchrone Datenbankverbindung herstellen und als Generator zurückgeben.
+    Wird für Dependency Injection in FastAPI-Routen verwendet, die den
+    Event-Loop nicht durch Datenbankzugriffe blockieren sollen.
+    """
+    if AsyncSessionLocal is None:
+        raise RuntimeError(
+            "Async-Datenbankverbindung nicht verfügbar "
+            "(aiosqlite bzw. asyncpg installieren)"
+        )
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def get_read_db():
+    """
+    Datenbankverbindung für rein lesende Routen herstellen.
+
+    Nutzt das Lesereplikat, falls konfiguriert und aktuell genug, sonst die
+    primäre Datenbank. Über diese Session dürfen keine Änderungen
+    geschrieben werden.
+    """
+    session_factory = ReplicaSessionLocal if replica_usable() else SessionLocal
+    db = session_factory()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def get_async_read_db() -> AsyncIterator["AsyncSession"]:
+    """
+    Asynchrone Datenbankverbindung für rein lesende Routen herstellen.
+
+    Nutzt das Lesereplikat, falls konfiguriert und aktuell genug, sonst die
+    primäre Datenbank.
+    """
+    if await async_replica_usable():
+        async with AsyncReplicaSessionLocal() as db:
+            yield db
+        return
+    async for db in get_async_db():
+        yield db
@@ -0,0 +1,260 @@
+"""
+SwissAirDry Delta-Synchronisation
+---------------------------------
+
+Überträgt nur geänderte Geräte, Aufträge und Sensordaten an die ExApp.
+
+Jede Entität wird über eine Wasserstandsmarke verfolgt: Geräte und Aufträge
+über (updated_at, id), Sensordaten über ihre fortlaufende id. Pro Durchlauf
+werden die Änderungen seit der Marke seitenweise gelesen, als Batch gesendet
+und die Marke erst nach erfolgreicher Übertragung in einer Checkpoint-Datei
+gespeichert. Nach einem Neustart setzt die Synchronisation dort fort, ein
+erneut gesendeter Batch ist für die Gegenstelle ein Upsert nach id.
+
+Neue oder geänderte Datensätze werden erst nach EXAPP_SYNC_LAG Sekunden
+übertragen, damit noch laufende Transaktionen nicht übersprungen werden. Für
+updated_at gilt dabei die Uhr der Datenbank (SELECT now()), sodass Zeitzone
+und Uhrzeit mit den gespeicherten Werten übereinstimmen. Für die id-Marke der
+Sensordaten wird nur bis zu der höchsten id übertragen, die bereits seit
+EXAPP_SYNC_LAG Sekunden sichtbar ist: unter PostgreSQL können gleichzeitige
+Inserts in anderer Reihenfolge als ihre ids committen.
+
+Gelöschte Datensätze werden über die Wasserstandsmarken nicht erfasst.
+
+@author Swiss Air Dry Team <info@swissairdry.com>
+@copyright 2023-2025 Swiss Air Dry Team
+"""
+
+import os
+import json
+import time
+import logging
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, func, or_
+from sqlalchemy.orm import Session
+
+from swissairdry.api.app import models
+
+logger = logging.getLogger("exapp_daemon")
+
+EXAPP_SYNC_BATCH_SIZE = int(os.getenv("EXAPP_SYNC_BATCH_SIZE", "500"))
+# Änderungen, die jünger sind, werden erst in einem späteren Durchlauf übertragen,
+# damit noch laufende Transaktionen mit älterem updated_at bzw. kleinerer id nicht
+# übersprungen werden
+EXAPP_SYNC_LAG = float(os.getenv("EXAPP_SYNC_LAG", "5"))
+
+# Entität -> (Modell, Spalte der Wasserstandsmarke oder None für reine id-Marken)
+ENTITIES = {
+    "devices": (models.Device, models.Device.updated_at),
+    "jobs": (models.Job, models.Job.updated_at),
+    "sensor_data": (models.SensorData, None),
+}
+
+# Sendet einen Batch: (Entität, Änderungen) -> True bei Erfolg
+SendFunc = Callable[[str, List[Dict[str, Any]]], bool]
+
+
+class SyncCheckpoint:
+    """Wasserstandsmarken aller Entitäten, persistent in einer JSON-Datei"""
+
+    def __init__(self, path: str):
+        """
+        Lädt die Checkpoint-Datei, sofern vorhanden.
+
+        Args:
+            path: Pfad der Checkpoint-Datei
+        """
+        self.path = path
+        self.marks: Dict[str, Dict[str, Any]] = {}
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self.marks = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(
+                    f"Checkpoint {path} nicht lesbar, starte vollständige Synchronisation: {e}"
+                )
+
+    def get(self, entity: str) -> Tuple[Optional[datetime], Any]:
+        """Gibt (Zeitstempel, id) der letzten übertragenen Änderung zurück."""
+        mark = self.marks.get(entity) or {}
+        watermark = mark.get("watermark")
+        return (datetime.fromisoformat(watermark) if watermark else None), mark.get("last_id")
+
+    def set(self, entity: str, watermark: Optional[datetime], last_id: Any) -> None:
+        """Setzt die Marke einer Entität und schreibt den Checkpoint atomar."""
+        self.marks[entity] = {
+            "watermark": watermark.isoformat() if watermark else None,
+            "last_id": last_id,
+            "synced_at": datetime.now().isoformat(),
+        }
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(self.marks, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.path)
+
+
+def fetch_changes(
+    db: Session,
+    entity: str,
+    watermark: Optional[datetime],
+    last_id: Any,
+    limit: int,
+    until: Optional[datetime] = None,
+    max_id: Optional[int] = None,
+) -> List[Any]:
+    """
+    Liest die nächsten Änderungen einer Entität nach der Wasserstandsmarke.
+
+    Args:
+        db: Datenbanksession
+        entity: Name der Entität (siehe ENTITIES)
+        watermark: Zeitstempel der letzten übertragenen Änderung
+        last_id: id der letzten übertragenen Änderung
+        limit: Maximale Anzahl an Datensätzen
+        until: Nur Änderungen bis zu diesem Zeitpunkt (Marken über updated_at)
+        max_id: Nur Datensätze bis zu dieser id (reine id-Marken)
+
+    Returns:
+        List: Datensätze, nach Marke aufsteigend sortiert
+    """
+    model, column = ENTITIES[entity]
+    query = db.query(model)
+
+    if column is None:
+        if last_id is not None:
+            query = query.filter(model.id > last_id)
+        if max_id is not None:
+            query = query.filter(model.id <= max_id)
+        return query.order_by(model.id).limit(limit).all()
+
+    query = query.filter(column.isnot(None))
+    if until is not None:
+        query = query.filter(column <= until)
+    if watermark is not None:
+        query = query.filter(or_(column > watermark, and_(column == watermark, model.id > last_id)))
+    return query.order_by(column, model.id).limit(limit).all()
+
+
+class DeltaSyncEngine:
+    """Überträgt Änderungen seit dem letzten Checkpoint in Batches"""
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        send: SendFunc,
+        checkpoint_path: str,
+        batch_size: int = EXAPP_SYNC_BATCH_SIZE,
+        lag: float = EXAPP_SYNC_LAG,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Initialisiert die Synchronisation.
+
+        Args:
+            session_factory: Erzeugt Datenbanksessions (z.B. database.SessionLocal)
+            send: Überträgt einen Batch und gibt True bei Erfolg zurück
+            checkpoint_path: Pfad der Checkpoint-Datei
+            batch_size: Maximale Anzahl an Änderungen pro Batch
+            lag: Sicherheitsabstand in Sekunden für noch laufende Transaktionen
+            clock: Zeitquelle für die Beobachtung der ids (für Tests austauschbar)
+        """
+        self.session_factory = session_factory
+        self.send = send
+        self.checkpoint = SyncCheckpoint(checkpoint_path)
+        self.batch_size = batch_size
+        self.lag = lag
+        self.clock = clock
+        # Entität -> beobachtete (Zeitpunkt, höchste id), älteste zuerst
+        self._id_observations: Dict[str, Deque[Tuple[float, int]]] = {}
+
+    def id_horizon(self, db: Session, entity: str) -> Optional[int]:
+        """
+        Gibt die höchste id zurück, die seit mindestens lag Sekunden sichtbar ist.
+
+        Returns:
+            Optional[int]: id-Grenze oder None, solange noch keine Beobachtung alt genug ist
+        """
+        model, _ = ENTITIES[entity]
+        now = self.clock()
+        observations = self._id_observations.setdefault(entity, deque())
+        max_id = db.query(func.max(model.id)).scalar()
+        if max_id is not None:
+            observations.append((now, max_id))
+
+        # Nur die jüngste ausreichend alte Beobachtung behalten
+        while len(observations) > 1 and now - observations[1][0] >= self.lag:
+            observations.popleft()
+        if observations and now - observations[0][0] >= self.lag:
+            return observations[0][1]
+        return None
+
+    def sync_entity(self, db: Session, entity: str) -> Tuple[int, bool]:
+        """
+        Überträgt alle ausstehenden Änderungen einer Entität.
+
+        Returns:
+            Tuple[int, bool]: (Anzahl übertragener Änderungen, vollständig übertragen)
+        """
+        _, column = ENTITIES[entity]
+        until = max_id = None
+        if column is not None:
+            # Uhr der Datenbank, damit Zeitzone und Uhrzeit zu updated_at (func.now()) passen
+            until = db.query(func.now()).scalar() - timedelta(seconds=self.lag)
+        else:
+            max_id = self.id_horizon(db, entity)
+            if max_id is None:
+                return 0, True
+        sent = 0
+
+        while True:
+            watermark, last_id = self.checkpoint.get(entity)
+            rows = fetch_changes(db, entity, watermark, last_id, self.batch_size, until, max_id)
+            if not rows:
+                return sent, True
+
+            if not self.send(entity, [row.to_dict() for row in rows]):
+                logger.warning(f"Übertragung von {len(rows)} Änderungen ({entity}) fehlgeschlagen")
+                return sent, False
+
+            last = rows[-1]
+            mark = getattr(last, column.key) if column is not None else None
+            self.checkpoint.set(entity, mark, last.id)
+            sent += len(rows)
+            # Übertragene Objekte freigeben, damit die Session nicht anwächst
+            db.expunge_all()
+            if len(rows) < self.batch_size:
+                return sent, True
+
+    def run_once(self) -> Dict[str, int]:
+        """
+        Führt einen Synchronisationsdurchlauf über alle Entitäten aus.
+
+        Returns:
+            Dict[str, int]: Anzahl übertragener Änderungen je Entität
+
+        Raises:
+            RuntimeError: Wenn eine Entität nicht vollständig übertragen wurde
+        """
+        counts = {}
+        failed = []
+        db = self.session_factory()
+        try:
+            for entity in ENTITIES:
+                counts[entity], complete = self.sync_entity(db, entity)
+                if not complete:
+                    failed.append(entity)
+        finally:
+            db.close()
+
+        if failed:
+            raise RuntimeError(f"Synchronisation unvollständig: {', '.join(failed)}")
+        return counts
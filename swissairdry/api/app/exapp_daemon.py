@@ -4,18 +4,50 @@ SwissAirDry ExApp Daemon
 
 Dieser Daemon überwacht die Kommunikation zwischen der API und der Nextcloud ExApp.
 Er stellt sicher, dass die Nextcloud-Integration funktioniert und synchronisiert Daten.
+
+Der Daemon läuft als asyncio-Dienst: Synchronisationen werden durch MQTT-Nachrichten
+der API (Messwerte, Statuswechsel, Alarme) ausgelöst und kurz entprellt, damit eine
+Serie von Nachrichten nur eine Synchronisation auslöst. Ohne Ereignisse wird
+spätestens nach SYNC_INTERVAL synchronisiert. Der Status ist unter GET /status abrufbar.
 """
 
 import os
-import time
 import json
+import asyncio
 import logging
-import threading
 import traceback
 import requests
 from datetime import datetime, timedelta
 import signal
-import sys
+from typing import Any, Dict, Optional
+
+# MQTT ist optional, ohne MQTT wird nur im SYNC_INTERVAL synchronisiert
+try:
+    import paho.mqtt.client as mqtt
+except ImportError:
+    mqtt = None
+
+# Für den Status-Endpunkt
+try:
+    import uvicorn
+    from fastapi import FastAPI
+except ImportError:
+    uvicorn = None
+    FastAPI = None
+
+try:
+    from circuit_breaker import CircuitOpenError, http_request
+except ImportError:
+    from swissairdry.api.app.circuit_breaker import CircuitOpenError, http_request
+
+# Delta-Synchronisation benötigt Zugriff auf die API-Datenbank
+try:
+    from swissairdry.api.app import database
+    from swissairdry.api.app.delta_sync import DeltaSyncEngine
+except ImportError as e:
+    database = None
+    DeltaSyncEngine = None
+    DELTA_SYNC_IMPORT_ERROR = str(e)
 
 # Logging-Konfiguration
 logging.basicConfig(
@@ -34,22 +66,43 @@ NEXTCLOUD_URL = os.environ.get("NEXTCLOUD_URL", "https://localhost")
 API_URL = os.environ.get("API_URL", "http://localhost:5000")
 EXAPP_URL = os.environ.get("EXAPP_URL", "https://exapp.localhost")
 SYNC_INTERVAL = int(os.environ.get("SYNC_INTERVAL", 300))  # 5 Minuten
+# Endpunkt der ExApp für Änderungen, je Entität als <pfad>/<entität>. Die ExApp
+# bietet ihn noch nicht an, ohne ausdrücklich gesetzten Pfad bleibt die
+# Synchronisation deshalb deaktiviert
+EXAPP_SYNC_PATH = os.environ.get("EXAPP_SYNC_PATH", "")
+SYNC_ENABLED = bool(EXAPP_SYNC_PATH)
+EXAPP_SYNC_CHECKPOINT = os.environ.get("EXAPP_SYNC_CHECKPOINT", "/app/data/exapp_sync_checkpoint.json")
+EXAPP_SYNC_TIMEOUT = float(os.environ.get("EXAPP_SYNC_TIMEOUT", 30))
+# Wartezeit nach dem letzten Ereignis und maximale Verzögerung einer Synchronisation
+SYNC_DEBOUNCE = float(os.environ.get("SYNC_DEBOUNCE", 2))
+SYNC_MAX_DELAY = float(os.environ.get("SYNC_MAX_DELAY", 15))
+# Topics, deren Nachrichten eine Synchronisation auslösen (kommagetrennt)
+SYNC_TRIGGER_TOPICS = [
+    topic.strip() for topic in os.environ.get(
+        "SYNC_TRIGGER_TOPICS", "swissairdry/+/data,swissairdry/+/status,swissairdry/+/alarm"
+    ).split(",") if topic.strip()
+]
+DAEMON_HEALTH_INTERVAL = int(os.environ.get("DAEMON_HEALTH_INTERVAL", 60))
+DAEMON_HOST = os.environ.get("DAEMON_HOST", "0.0.0.0")
+DAEMON_PORT = int(os.environ.get("DAEMON_PORT", 8081))
+MQTT_HOST = os.environ.get("MQTT_HOST", "localhost")
+MQTT_PORT = int(os.environ.get("MQTT_PORT", 1883))
+MQTT_USER = os.environ.get("MQTT_USER", "")
+MQTT_PASSWORD = os.environ.get("MQTT_PASSWORD", "")
+VERSION = "1.1.0"
 
 # Status-Flags
-running = True
 last_sync = None
 status = "Initialisierung..."
+sync_engine = None
+services = {"nextcloud": False, "exapp": False, "exapp_installed": False, "last_check": None}
+services_ready = False
+sync_events = 0  # Ereignisse seit der letzten Synchronisation
 
-def signal_handler(sig, frame):
-    """Handle SIGTERM and SIGINT für graceful shutdown"""
-    global running
-    logger.info("Signal erhalten, beende Daemon...")
-    running = False
-    sys.exit(0)
-
-# Signal-Handler registrieren
-signal.signal(signal.SIGTERM, signal_handler)
-signal.signal(signal.SIGINT, signal_handler)
+# Werden in run() im Event-Loop erstellt
+loop: Optional[asyncio.AbstractEventLoop] = None
+sync_requested: Optional[asyncio.Event] = None
+stop_requested: Optional[asyncio.Event] = None
 
 class ExAppConnectionError(Exception):
     """Fehler bei der Verbindung zur ExApp"""
@@ -62,30 +115,31 @@ class NextcloudConnectionError(Exception):
 def check_exapp_health():
     """Prüft, ob die ExApp erreichbar ist"""
     try:
-        response = requests.get(f"{EXAPP_URL}/health", timeout=10)
+        response = http_request("GET", f"{EXAPP_URL}/health", timeout=10)
         if response.status_code != 200:
             raise ExAppConnectionError(f"ExApp Gesundheitscheck fehlgeschlagen: HTTP {response.status_code}")
         return True
-    except requests.RequestException as e:
+    except (requests.RequestException, CircuitOpenError) as e:
         logger.warning(f"ExApp nicht erreichbar: {str(e)}")
         return False
 
 def check_nextcloud_status():
     """Prüft, ob Nextcloud erreichbar ist"""
     try:
-        response = requests.get(f"{NEXTCLOUD_URL}/status.php", timeout=10)
+        response = http_request("GET", f"{NEXTCLOUD_URL}/status.php", timeout=10)
         if response.status_code != 200:
             raise NextcloudConnectionError(f"Nextcloud Status fehlgeschlagen: HTTP {response.status_code}")
         status_data = response.json()
         return status_data.get("installed", False)
-    except (requests.RequestException, json.JSONDecodeError) as e:
+    except (requests.RequestException, json.JSONDecodeError, CircuitOpenError) as e:
         logger.warning(f"Nextcloud nicht erreichbar: {str(e)}")
         return False
 
 def check_exapp_installed():
     """Prüft, ob die SwissAirDry ExApp in Nextcloud installiert ist"""
     try:
-        response = requests.get(
+        response = http_request(
+            "GET",
             f"{NEXTCLOUD_URL}/ocs/v2.php/cloud/apps",
             headers={"OCS-APIRequest": "true"},
             timeout=10
@@ -101,29 +155,51 @@ def check_exapp_installed():
         except (KeyError, json.JSONDecodeError) as e:
             logger.warning(f"Fehler beim Parsen der App-Liste: {str(e)}")
             return False
-    except requests.RequestException as e:
+    except (requests.RequestException, CircuitOpenError) as e:
         logger.warning(f"Fehler bei der Abfrage der installierten Apps: {str(e)}")
         return False
 
+def send_changes(entity, changes):
+    """Sendet einen Batch von Änderungen an die ExApp"""
+    try:
+        response = http_request(
+            "POST",
+            f"{EXAPP_URL}{EXAPP_SYNC_PATH}/{entity}",
+            json={"entity": entity, "changes": changes},
+            timeout=EXAPP_SYNC_TIMEOUT
+        )
+    except (requests.RequestException, CircuitOpenError) as e:
+        logger.warning(f"ExApp nicht erreichbar: {str(e)}")
+        return False
+    if response.status_code >= 300:
+        logger.warning(f"ExApp lehnt Änderungen ({entity}) ab: HTTP {response.status_code}")
+        return False
+    return True
+
+def get_sync_engine():
+    """Erstellt die Delta-Synchronisation beim ersten Aufruf"""
+    global sync_engine
+    if sync_engine is None:
+        if DeltaSyncEngine is None:
+            raise RuntimeError(f"Delta-Synchronisation nicht verfügbar: {DELTA_SYNC_IMPORT_ERROR}")
+        sync_engine = DeltaSyncEngine(database.SessionLocal, send_changes, EXAPP_SYNC_CHECKPOINT)
+    return sync_engine
+
 def sync_data():
-    """Synchronisiert Daten zwischen API und ExApp"""
+    """Synchronisiert geänderte Geräte, Aufträge und Sensordaten zur ExApp"""
     global last_sync, status
     
     try:
         logger.info("Starte Datensynchronisation...")
         
-        # Hier können verschiedene Synchronisationsaufgaben ausgeführt werden:
-        # 1. Gerätestatus von der API zur ExApp senden
-        # 2. Benutzereinstellungen synchronisieren
-        # 3. Alarme und Benachrichtigungen verarbeiten
-        
-        # Simulierte Synchronisation (In der Produktion durch echte Synchronisation ersetzen)
-        time.sleep(2)
+        # Nur Änderungen seit dem letzten Checkpoint übertragen
+        counts = get_sync_engine().run_once()
         
         # Erfolgreich abgeschlossen
         last_sync = datetime.now()
         status = f"Letzte Synchronisation: {last_sync.strftime('%Y-%m-%d %H:%M:%S')}"
-        logger.info(f"Datensynchronisation abgeschlossen: {status}")
+        changes = ", ".join(f"{entity}: {count}" for entity, count in counts.items())
+        logger.info(f"Datensynchronisation abgeschlossen ({changes}): {status}")
         return True
     except Exception as e:
         error_msg = f"Fehler bei der Datensynchronisation: {str(e)}"
@@ -136,83 +212,249 @@ def setup_required_directories():
     """Erstellt benötigte Verzeichnisse, falls nicht vorhanden"""
     os.makedirs("/app/logs", exist_ok=True)
 
-def main():
-    """Hauptfunktion des Daemons"""
-    global status
-    
-    logger.info("SwissAirDry ExApp Daemon wird gestartet...")
-    setup_required_directories()
-    
-    # Warten auf Verfügbarkeit der Dienste
-    startup_delay = 10
-    logger.info(f"Warte {startup_delay} Sekunden auf Verfügbarkeit der Dienste...")
-    time.sleep(startup_delay)
+def _mark_sync_requested():
+    """Vermerkt ein Ereignis im Event-Loop"""
+    global sync_events
+    sync_events += 1
+    sync_requested.set()
+
+def request_sync():
+    """Fordert eine Synchronisation an (auch aus anderen Threads aufrufbar)"""
+    if loop is not None and not loop.is_closed():
+        loop.call_soon_threadsafe(_mark_sync_requested)
+
+async def check_services():
+    """Prüft Nextcloud, ExApp und die Installation der App gleichzeitig"""
+    global services_ready, status
     
-    # Initialer Check der Verbindungen
-    nc_available = check_nextcloud_status()
-    exapp_available = check_exapp_health()
-    exapp_installed = check_exapp_installed() if nc_available else False
+    results = await asyncio.gather(
+        asyncio.to_thread(check_nextcloud_status),
+        asyncio.to_thread(check_exapp_health),
+        asyncio.to_thread(check_exapp_installed),
+        return_exceptions=True
+    )
+    for result in results:
+        if isinstance(result, Exception):
+            logger.warning(str(result))
+    nc_available, exapp_available, exapp_installed = (result is True for result in results)
+    exapp_installed = exapp_installed and nc_available
     
-    logger.info(f"Nextcloud Status: {'Verfügbar' if nc_available else 'Nicht verfügbar'}")
-    logger.info(f"ExApp Status: {'Verfügbar' if exapp_available else 'Nicht verfügbar'}")
-    logger.info(f"ExApp installiert: {'Ja' if exapp_installed else 'Nein'}")
+    changed = (nc_available, exapp_available, exapp_installed) != (
+        services["nextcloud"], services["exapp"], services["exapp_installed"]
+    )
+    services.update({
+        "nextcloud": nc_available,
+        "exapp": exapp_available,
+        "exapp_installed": exapp_installed,
+        "last_check": datetime.now().isoformat(),
+    })
+    if changed:
+        logger.info(f"Nextcloud Status: {'Verfügbar' if nc_available else 'Nicht verfügbar'}")
+        logger.info(f"ExApp Status: {'Verfügbar' if exapp_available else 'Nicht verfügbar'}")
+        logger.info(f"ExApp installiert: {'Ja' if exapp_installed else 'Nein'}")
     
+    was_ready = services_ready
+    services_ready = nc_available and exapp_installed and exapp_available
     if not nc_available:
         status = "Warte auf Nextcloud..."
     elif not exapp_installed:
         status = "SwissAirDry App ist nicht in Nextcloud installiert."
     elif not exapp_available:
         status = "ExApp-Dienst ist nicht erreichbar."
-    else:
+    elif not SYNC_ENABLED:
+        status = "Bereit, Synchronisation deaktiviert (EXAPP_SYNC_PATH nicht gesetzt)."
+    elif not was_ready:
         status = "Bereit für Synchronisation."
-        # Initiale Synchronisation
-        sync_data()
+        # Erste Synchronisation nach Start oder Wiederherstellung der Verbindung
+        _mark_sync_requested()
+
+async def health_loop():
+    """Prüft die Dienste im Abstand von DAEMON_HEALTH_INTERVAL Sekunden"""
+    while not stop_requested.is_set():
+        try:
+            await check_services()
+        except Exception as e:
+            logger.error(f"Fehler bei der Prüfung der Dienste: {str(e)}")
+        try:
+            await asyncio.wait_for(stop_requested.wait(), timeout=DAEMON_HEALTH_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+
+async def sync_loop():
+    """Synchronisiert nach Ereignissen (entprellt) und spätestens nach SYNC_INTERVAL"""
+    global sync_events, status
     
-    # Hauptschleife des Daemons
-    retry_count = 0
-    while running:
+    while not stop_requested.is_set():
         try:
-            current_time = datetime.now()
-            
-            # Wenn wir noch nicht synchronisieren können, regelmäßig den Status prüfen
-            if not nc_available or not exapp_installed or not exapp_available:
-                if retry_count % 12 == 0:  # Status alle 60 Sekunden prüfen (5s * 12)
-                    nc_available = check_nextcloud_status()
-                    exapp_available = check_exapp_health()
-                    exapp_installed = check_exapp_installed() if nc_available else False
-                    
-                    if not nc_available:
-                        status = "Warte auf Nextcloud..."
-                    elif not exapp_installed:
-                        status = "SwissAirDry App ist nicht in Nextcloud installiert."
-                    elif not exapp_available:
-                        status = "ExApp-Dienst ist nicht erreichbar."
-                    else:
-                        status = "Bereit für Synchronisation."
-                        # Erste Synchronisation nach Wiederherstellung der Verbindung
-                        sync_data()
-                
-                retry_count += 1
-                time.sleep(5)
-                continue
-            
-            # Regelmäßige Synchronisation, wenn alle Komponenten verfügbar sind
-            if last_sync is None or (current_time - last_sync).total_seconds() >= SYNC_INTERVAL:
-                sync_data()
-            
-            # Kurze Wartezeit zur Reduzierung der CPU-Last
-            time.sleep(5)
-            
-        except KeyboardInterrupt:
-            logger.info("Daemon durch Benutzer beendet.")
+            await asyncio.wait_for(sync_requested.wait(), timeout=SYNC_INTERVAL)
+        except asyncio.TimeoutError:
+            pass  # Regelmäßige Synchronisation ohne Ereignis
+        if stop_requested.is_set():
             break
+        
+        # Entprellen: warten, bis SYNC_DEBOUNCE Sekunden kein Ereignis mehr eintrifft,
+        # höchstens aber SYNC_MAX_DELAY Sekunden
+        deadline = loop.time() + SYNC_MAX_DELAY
+        while True:
+            sync_requested.clear()
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                await asyncio.wait_for(sync_requested.wait(), timeout=min(SYNC_DEBOUNCE, remaining))
+            except asyncio.TimeoutError:
+                break
+        
+        if not services_ready:
+            continue
+        
+        events, sync_events = sync_events, 0
+        logger.debug(f"Synchronisation nach {events} Ereignissen")
+        try:
+            await asyncio.to_thread(sync_data)
         except Exception as e:
             logger.error(f"Unerwarteter Fehler im Daemon: {str(e)}")
             logger.error(traceback.format_exc())
             status = f"Fehler: {str(e)}"
-            time.sleep(30)  # Pause nach einem Fehler
+
+def start_mqtt():
+    """Abonniert die Trigger-Topics und gibt den MQTT-Client zurück"""
+    if mqtt is None:
+        logger.warning("paho-mqtt nicht installiert, Synchronisation nur im Intervall")
+        return None
+    
+    def on_connect(client, userdata, flags, rc):
+        if rc == 0:
+            logger.info(f"MQTT verbunden mit {MQTT_HOST}:{MQTT_PORT}")
+            for topic in SYNC_TRIGGER_TOPICS:
+                client.subscribe(topic)
+        else:
+            logger.warning(f"MQTT-Verbindung fehlgeschlagen: Code {rc}")
+    
+    def on_message(client, userdata, message):
+        request_sync()
+    
+    client = mqtt.Client(client_id=f"sard-exapp-daemon-{os.getpid()}"[:23], clean_session=True)
+    if MQTT_USER and MQTT_PASSWORD:
+        client.username_pw_set(MQTT_USER, MQTT_PASSWORD)
+    client.on_connect = on_connect
+    client.on_message = on_message
+    client.reconnect_delay_set(min_delay=3, max_delay=120)
+    client.connect_async(MQTT_HOST, MQTT_PORT, keepalive=60)
+    client.loop_start()
+    return client
+
+def get_status() -> Dict[str, Any]:
+    """Gibt den Status des Daemons zurück"""
+    return {
+        "status": status,
+        "version": VERSION,
+        "last_sync": last_sync.isoformat() if last_sync else None,
+        "ready": services_ready,
+        "sync": "enabled" if SYNC_ENABLED else "disabled",
+        "services": services,
+        "pending_events": sync_events,
+    }
+
+def create_status_server():
+    """Erstellt den HTTP-Server für GET /status"""
+    if FastAPI is None or uvicorn is None:
+        logger.warning("FastAPI/uvicorn nicht installiert, Status-Endpunkt deaktiviert")
+        return None
+    
+    status_app = FastAPI(title="SwissAirDry ExApp Daemon", version=VERSION)
+    
+    @status_app.get("/status")
+    async def daemon_status():
+        """Status des Daemons und der überwachten Dienste"""
+        return get_status()
+    
+    @status_app.post("/sync")
+    async def trigger_sync():
+        """Fordert eine Synchronisation an"""
+        if not SYNC_ENABLED:
+            return {"status": "disabled"}
+        _mark_sync_requested()
+        return {"status": "queued"}
+    
+    server = uvicorn.Server(uvicorn.Config(status_app, host=DAEMON_HOST, port=DAEMON_PORT, log_level="warning"))
+    # Signale behandelt der Daemon selbst
+    server.install_signal_handlers = lambda: None
+    return server
+
+async def serve_status(server) -> None:
+    """
+    Betreibt den Status-Endpunkt.
+
+    uvicorn beendet sich mit sys.exit, wenn der Port belegt ist. Der Daemon
+    synchronisiert dann ohne Status-Endpunkt weiter.
+    """
+    try:
+        await server.serve()
+    except SystemExit:
+        logger.error(
+            f"Status-Endpunkt konnte nicht auf {DAEMON_HOST}:{DAEMON_PORT} gestartet werden, "
+            "Daemon läuft ohne Status-Endpunkt weiter"
+        )
+
+async def run():
+    """Startet Statusserver, MQTT-Trigger, Gesundheitsprüfung und Synchronisation"""
+    global loop, sync_requested, stop_requested
+    
+    loop = asyncio.get_running_loop()
+    sync_requested = asyncio.Event()
+    stop_requested = asyncio.Event()
+    
+    def shutdown():
+        logger.info("Signal erhalten, beende Daemon...")
+        stop_requested.set()
+    
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, shutdown)
+    
+    # Der Status-Endpunkt ist sofort erreichbar
+    server = create_status_server()
+    server_task = asyncio.create_task(serve_status(server)) if server is not None else None
+    
+    # Warten auf Verfügbarkeit der Dienste
+    startup_delay = 10
+    logger.info(f"Warte {startup_delay} Sekunden auf Verfügbarkeit der Dienste...")
+    try:
+        await asyncio.wait_for(stop_requested.wait(), timeout=startup_delay)
+    except asyncio.TimeoutError:
+        pass
+    
+    tasks = [asyncio.create_task(health_loop())]
+    mqtt_client = None
+    if SYNC_ENABLED:
+        tasks.append(asyncio.create_task(sync_loop()))
+        mqtt_client = start_mqtt()
+    else:
+        logger.info("EXAPP_SYNC_PATH nicht gesetzt, Synchronisation zur ExApp deaktiviert")
+    try:
+        await stop_requested.wait()
+    finally:
+        if mqtt_client is not None:
+            mqtt_client.loop_stop()
+            mqtt_client.disconnect()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if server_task is not None:
+            server.should_exit = True
+            await server_task
+
+def main():
+    """Hauptfunktion des Daemons"""
+    logger.info("SwissAirDry ExApp Daemon wird gestartet...")
+    setup_required_directories()
+    
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        logger.info("Daemon durch Benutzer beendet.")
     
     logger.info("SwissAirDry ExApp Daemon beendet.")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,246 @@
+"""
+SwissAirDry BLE Standort-Engine
+-------------------------------
+
+Bestimmt die Position von BLE-Geräten per Trilateration aus den RSSI-Werten
+mehrerer fest installierter Scanner. Die Scanner und die Zonenmittelpunkte
+werden in locations.json hinterlegt:
+
+    {
+      "office": {
+        "name": "Büro",
+        "description": "Hauptbüro",
+        "position": {"x": 2.0, "y": 3.5},
+        "scanners": {
+          "gw-office": {"x": 0.0, "y": 0.0, "tx_power": -59, "path_loss": 2.0}
+        }
+      }
+    }
+
+Koordinaten werden in Metern angegeben. tx_power ist der RSSI-Wert in 1 m
+Abstand, path_loss der Pfadverlust-Exponent der Umgebung.
+
+Alle Geräte eines Scan-Zyklus werden gemeinsam gelöst: Die linearisierten
+Gleichungen werden über NumPy als gewichtete Normalgleichungen pro Gerät
+aufgestellt und mit einem einzigen np.linalg.solve-Aufruf gelöst.
+
+@author Swiss Air Dry Team <info@swissairdry.com>
+@copyright 2023-2025 Swiss Air Dry Team
+"""
+
+import logging
+from typing import Dict, List, Optional, Any, Tuple
+
+# NumPy ist optional, ohne NumPy wird die einfache RSSI-Zonenzuordnung genutzt
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+logger = logging.getLogger("swissairdry_ble")
+
+DEFAULT_TX_POWER = -59.0  # RSSI in 1 m Abstand
+DEFAULT_PATH_LOSS = 2.0  # Freiraum
+MIN_SCANNERS = 3  # Mindestanzahl an Scannern für eine Trilateration
+RIDGE = 1e-6  # Regularisierung für schlecht konditionierte Gleichungssysteme
+
+
+class LocationEngine:
+    """Löst Gerätepositionen für alle Geräte eines Scan-Zyklus gemeinsam"""
+
+    def __init__(self, locations: Dict[str, Dict[str, Any]], zone_hysteresis: float = 1.0):
+        """
+        Initialisiert die Engine aus der Standortkonfiguration.
+
+        Args:
+            locations: Standortdaten aus locations.json
+            zone_hysteresis: Abstand in Metern, um den eine neue Zone näher
+                liegen muss als die aktuelle, bevor das Gerät wechselt
+        """
+        if np is None:
+            raise RuntimeError("NumPy ist für die Standort-Engine erforderlich")
+
+        self.zone_hysteresis = zone_hysteresis
+
+        scanner_ids: List[str] = []
+        scanner_rows: List[Tuple[float, float, float, float]] = []
+        scanner_zone: List[int] = []
+        zone_ids: List[str] = []
+        zone_centers: List[Tuple[float, float]] = []
+
+        for location_id, data in locations.items():
+            scanners = data.get("scanners") or {}
+            position = data.get("position")
+            if position is None and not scanners:
+                continue
+
+            zone_index = len(zone_ids)
+            zone_ids.append(location_id)
+            for scanner_id, scanner in scanners.items():
+                scanner_ids.append(scanner_id)
+                scanner_rows.append((
+                    float(scanner["x"]),
+                    float(scanner["y"]),
+                    float(scanner.get("tx_power", DEFAULT_TX_POWER)),
+                    float(scanner.get("path_loss", DEFAULT_PATH_LOSS)),
+                ))
+                scanner_zone.append(zone_index)
+
+            if position is not None:
+                zone_centers.append((float(position["x"]), float(position["y"])))
+            else:
+                # Ohne Mittelpunkt gilt der Schwerpunkt der eigenen Scanner
+                own = [row for row, zone in zip(scanner_rows, scanner_zone) if zone == zone_index]
+                zone_centers.append((
+                    sum(row[0] for row in own) / len(own),
+                    sum(row[1] for row in own) / len(own),
+                ))
+
+        self.scanner_ids = scanner_ids
+        self.scanner_index = {scanner_id: i for i, scanner_id in enumerate(scanner_ids)}
+        self.zone_ids = zone_ids
+        self.zone_index = {zone_id: i for i, zone_id in enumerate(zone_ids)}
+
+        table = np.array(scanner_rows, dtype=float).reshape(-1, 4)
+        self.scanner_xy = table[:, :2]
+        self.tx_power = table[:, 2]
+        self.path_loss = table[:, 3]
+        self.scanner_zone = np.array(scanner_zone, dtype=int)
+        self.zone_centers = np.array(zone_centers, dtype=float).reshape(-1, 2)
+
+        # Konstante Anteile der linearisierten Gleichungen:
+        # x_i² + y_i² - d_i² = 2 x_i x + 2 y_i y - (x² + y²)
+        self._design = np.column_stack([
+            2.0 * self.scanner_xy,
+            -np.ones(len(scanner_ids)),
+        ])
+        self._scanner_norm = np.einsum("sj,sj->s", self.scanner_xy, self.scanner_xy)
+
+    @property
+    def scanner_count(self) -> int:
+        """Anzahl der konfigurierten Scanner."""
+        return len(self.scanner_ids)
+
+    def rssi_to_distance(self, rssi):
+        """Rechnet RSSI-Werte (Geräte x Scanner) in Entfernungen in Metern um."""
+        return 10.0 ** ((self.tx_power - rssi) / (10.0 * self.path_loss))
+
+    def solve(
+        self,
+        observations: Dict[str, Dict[str, float]],
+        current_locations: Optional[Dict[str, str]] = None,
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        Bestimmt Position und Zone für alle beobachteten Geräte.
+
+        Args:
+            observations: Geräte-ID -> {Scanner-ID: RSSI}
+            current_locations: Aktuelle Zone je Gerät (für die Hysterese)
+
+        Returns:
+            Dict: Geräte-ID -> {"x", "y", "location_id", "scanners", "method"}
+        """
+        if not observations or not self.scanner_ids or not self.zone_ids:
+            return {}
+
+        device_ids = list(observations)
+
+        # Beobachtungen als Index-Triplets sammeln und in einem Schritt in die
+        # Matrix (Geräte x Scanner) schreiben
+        rows: List[int] = []
+        cols: List[int] = []
+        values: List[float] = []
+        for row, device_id in enumerate(device_ids):
+            for scanner_id, rssi in observations[device_id].items():
+                col = self.scanner_index.get(scanner_id)
+                if col is not None:
+                    rows.append(row)
+                    cols.append(col)
+                    values.append(rssi)
+
+        rssi = np.full((len(device_ids), self.scanner_count), np.nan)
+        rssi[rows, cols] = values
+        seen = ~np.isnan(rssi)
+        seen_count = seen.sum(axis=1)
+
+        distance = np.where(seen, self.rssi_to_distance(np.where(seen, rssi, 0.0)), 0.0)
+
+        # Gewichtung: nahe Scanner sind zuverlässiger (Fehler wächst mit d²)
+        weights = np.where(seen, 1.0 / np.maximum(distance, 0.1) ** 2, 0.0)
+        rhs = self._scanner_norm - distance ** 2
+
+        normal = np.einsum("ds,sj,sk->djk", weights, self._design, self._design)
+        normal += RIDGE * np.eye(3)
+        moment = np.einsum("ds,sj,ds->dj", weights, self._design, rhs)
+
+        positions = np.zeros((len(device_ids), 2))
+        method = np.full(len(device_ids), "nearest_scanner", dtype=object)
+
+        solvable = seen_count >= MIN_SCANNERS
+        if solvable.any():
+            solution = np.linalg.solve(normal[solvable], moment[solvable][..., None])[..., 0]
+            positions[solvable] = solution[:, :2]
+            method[solvable] = "trilateration"
+
+        # Zu wenige Scanner: Position des stärksten Scanners übernehmen
+        fallback = ~solvable & (seen_count > 0)
+        strongest = np.argmax(np.where(seen, rssi, -np.inf), axis=1)
+        positions[fallback] = self.scanner_xy[strongest[fallback]]
+
+        zones = self._assign_zones(device_ids, positions, current_locations or {})
+        zones[fallback] = self.scanner_zone[strongest[fallback]]
+
+        result = {}
+        for row in np.flatnonzero(seen_count > 0):
+            result[device_ids[row]] = {
+                "x": float(positions[row, 0]),
+                "y": float(positions[row, 1]),
+                "location_id": self.zone_ids[zones[row]],
+                "scanners": int(seen_count[row]),
+                "method": method[row],
+            }
+        return result
+
+    def _assign_zones(self, device_ids: List[str], positions, current_locations: Dict[str, str]):
+        """Ordnet Positionen der nächsten Zone zu, mit Hysterese zur aktuellen Zone."""
+        offsets = positions[:, None, :] - self.zone_centers[None, :, :]
+        distances = np.sqrt(np.einsum("dzj,dzj->dz", offsets, offsets))
+        nearest = np.argmin(distances, axis=1)
+
+        current = np.array(
+            [self.zone_index.get(current_locations.get(device_id), -1) for device_id in device_ids],
+            dtype=int,
+        )
+        known = current >= 0
+        if known.any():
+            rows = np.flatnonzero(known)
+            current_distance = distances[rows, current[rows]]
+            best_distance = distances[rows, nearest[rows]]
+            keep = best_distance + self.zone_hysteresis >= current_distance
+            nearest[rows[keep]] = current[rows[keep]]
+        return nearest
+
+
+def build_location_engine(
+    locations: Dict[str, Dict[str, Any]], zone_hysteresis: float = 1.0
+) -> Optional[LocationEngine]:
+    """
+    Erstellt eine Standort-Engine, wenn Scanner konfiguriert und NumPy verfügbar ist.
+
+    Args:
+        locations: Standortdaten aus locations.json
+        zone_hysteresis: Zonen-Hysterese in Metern
+
+    Returns:
+        Optional[LocationEngine]: Engine oder None
+    """
+    if not any(data.get("scanners") for data in locations.values()):
+        return None
+    if np is None:
+        logger.warning("NumPy nicht verfügbar, Trilateration deaktiviert")
+        return None
+    try:
+        return LocationEngine(locations, zone_hysteresis=zone_hysteresis)
+    except (KeyError, TypeError, ValueError) as e:
+        logger.error(f"Ungültige Scanner-Konfiguration in den Standortdaten: {e}")
+        return None
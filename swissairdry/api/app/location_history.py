@@ -0,0 +1,310 @@
+"""
+SwissAirDry BLE Standortverlauf
+-------------------------------
+
+Speichert Standortwechsel der BLE-Ortung dauerhaft, damit der aktuelle Stand
+einen Neustart übersteht und sich nachträglich beantworten lässt, wo ein Gerät
+zu einem Zeitpunkt war oder welche Geräte während eines Auftrags an einem
+Standort standen.
+
+Wechsel werden im Event-Loop nur gepuffert und periodisch in einem Thread in
+die Datenbank (Tabelle device_location_events) sowie in ein Append-only-Log
+im JSON-Lines-Format geschrieben.
+
+@author Swiss Air Dry Team <info@swissairdry.com>
+@copyright 2023-2025 Swiss Air Dry Team
+"""
+
+import os
+import json
+import asyncio
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Any, Callable
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session, aliased
+
+from swissairdry.api.app import models
+
+logger = logging.getLogger("swissairdry_ble")
+
+# Standardwerte, über Umgebungsvariablen anpassbar
+DEFAULT_LOG_PATH = os.getenv("BLE_LOCATION_LOG", "location_events.jsonl")
+DEFAULT_FLUSH_INTERVAL = float(os.getenv("BLE_LOCATION_FLUSH_INTERVAL", "5"))  # Sekunden
+
+
+class LocationHistoryStore:
+    """Gepufferter Speicher für Standortwechsel"""
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        log_path: Optional[str] = DEFAULT_LOG_PATH,
+        flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+    ):
+        """
+        Initialisiert den Speicher.
+
+        Args:
+            session_factory: Erzeugt Datenbank-Sessions (z.B. SessionLocal)
+            log_path: Pfad des Append-only-Logs, None deaktiviert das Log
+            flush_interval: Intervall für das Schreiben des Puffers in Sekunden
+        """
+        self.session_factory = session_factory
+        self.log_path = log_path
+        self.flush_interval = flush_interval
+
+        self._buffer: List[Dict[str, Any]] = []
+        # Verhindert parallele Schreibvorgänge aus mehreren Threads
+        self._write_lock = threading.Lock()
+
+    def record(
+        self,
+        device_id: str,
+        location_id: str,
+        previous_location_id: Optional[str] = None,
+        source: Optional[str] = None,
+        x: Optional[float] = None,
+        y: Optional[float] = None,
+        timestamp: Optional[datetime] = None,
+    ) -> None:
+        """
+        Merkt einen Standortwechsel zum Schreiben vor.
+
+        Die Methode schreibt nicht selbst und kann daher direkt aus dem
+        Event-Loop aufgerufen werden.
+        """
+        self._buffer.append({
+            "device_id": device_id,
+            "location_id": location_id,
+            "previous_location_id": previous_location_id,
+            "timestamp": timestamp or datetime.now(),
+            "source": source,
+            "x": x,
+            "y": y,
+        })
+
+    def _write(self, events: List[Dict[str, Any]]) -> None:
+        """Schreibt Ereignisse in die Datenbank und das Log (blockierend)."""
+        with self._write_lock:
+            db = self.session_factory()
+            try:
+                db.bulk_insert_mappings(models.DeviceLocationEvent, events)
+                db.commit()
+            except Exception:
+                db.rollback()
+                raise
+            finally:
+                db.close()
+
+            if self.log_path:
+                with open(self.log_path, "a", encoding="utf-8") as f:
+                    for event in events:
+                        f.write(json.dumps(
+                            {**event, "timestamp": event["timestamp"].isoformat()},
+                            ensure_ascii=False
+                        ) + "\n")
+
+    def flush(self) -> int:
+        """
+        Schreibt alle gepufferten Ereignisse (blockierend).
+
+        Returns:
+            int: Anzahl der geschriebenen Ereignisse
+        """
+        events, self._buffer = self._buffer, []
+        if not events:
+            return 0
+        try:
+            self._write(events)
+        except Exception as e:
+            # Ereignisse für den nächsten Versuch zurücklegen
+            logger.error(f"Fehler beim Speichern des Standortverlaufs: {e}")
+            self._buffer = events + self._buffer
+            return 0
+        return len(events)
+
+    async def flush_async(self) -> int:
+        """Schreibt alle gepufferten Ereignisse in einem Thread."""
+        if not self._buffer:
+            return 0
+        events, self._buffer = self._buffer, []
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(None, self._write, events)
+        except Exception as e:
+            logger.error(f"Fehler beim Speichern des Standortverlaufs: {e}")
+            self._buffer = events + self._buffer
+            return 0
+        return len(events)
+
+    async def run(self) -> None:
+        """Schreibt den Puffer periodisch, bis die Aufgabe abgebrochen wird."""
+        try:
+            while True:
+                await asyncio.sleep(self.flush_interval)
+                await self.flush_async()
+        except asyncio.CancelledError:
+            # Beim Herunterfahren ausstehende Ereignisse noch schreiben
+            self.flush()
+            raise
+
+    def load_current_locations(self) -> Dict[str, str]:
+        """
+        Lädt den zuletzt bekannten Standort aller Geräte.
+
+        Returns:
+            Dict: Geräte-ID -> Standort-ID
+        """
+        db = self.session_factory()
+        try:
+            return {
+                event.device_id: event.location_id
+                for event in latest_events(db)
+            }
+        finally:
+            db.close()
+
+
+# --- Abfragen ---
+
+def latest_events(db: Session,
+                  before: Optional[datetime] = None) -> List[models.DeviceLocationEvent]:
+    """
+    Gibt je Gerät das letzte Standortereignis (optional vor einem Zeitpunkt) zurück.
+
+    Args:
+        db: Datenbank-Session
+        before: Nur Ereignisse bis einschließlich dieses Zeitpunkts
+
+    Returns:
+        List: Letztes Ereignis je Gerät
+    """
+    Event = models.DeviceLocationEvent
+    latest = db.query(Event.device_id, func.max(Event.timestamp).label("timestamp"))
+    if before is not None:
+        latest = latest.filter(Event.timestamp <= before)
+    latest = latest.group_by(Event.device_id).subquery()
+
+    return (
+        db.query(Event)
+        .join(
+            latest,
+            (Event.device_id == latest.c.device_id) & (Event.timestamp == latest.c.timestamp),
+        )
+        .all()
+    )
+
+
+def devices_at_location_at(db: Session, location_id: str, at: datetime) -> List[str]:
+    """
+    Gibt die Geräte zurück, die zum Zeitpunkt at an einem Standort standen.
+
+    Statt das letzte Ereignis aller Geräte zu gruppieren, werden nur die
+    Ereignisse des Standorts gelesen (Index location_id, timestamp) und je
+    Ereignis über den Index device_id, timestamp geprüft, ob das Gerät bis at
+    noch einmal gewechselt hat.
+
+    Args:
+        db: Datenbank-Session
+        location_id: Standort-ID
+        at: Zeitpunkt
+
+    Returns:
+        List[str]: Geräte-IDs
+    """
+    Event = models.DeviceLocationEvent
+    later = aliased(Event)
+    moved_on = (
+        db.query(later.id)
+        .filter(
+            later.device_id == Event.device_id,
+            later.timestamp > Event.timestamp,
+            later.timestamp <= at,
+        )
+        .exists()
+    )
+    rows = (
+        db.query(Event.device_id)
+        .filter(Event.location_id == location_id, Event.timestamp <= at, ~moved_on)
+        .distinct()
+        .all()
+    )
+    return [device_id for (device_id,) in rows]
+
+
+def get_location_at(db: Session, device_id: str,
+                    at: datetime) -> Optional[models.DeviceLocationEvent]:
+    """
+    Gibt das Standortereignis zurück, das zum Zeitpunkt at für ein Gerät galt.
+
+    Args:
+        db: Datenbank-Session
+        device_id: Geräte-ID
+        at: Zeitpunkt
+
+    Returns:
+        Optional[DeviceLocationEvent]: Letztes Ereignis vor at oder None
+    """
+    Event = models.DeviceLocationEvent
+    return (
+        db.query(Event)
+        .filter(Event.device_id == device_id, Event.timestamp <= at)
+        .order_by(Event.timestamp.desc())
+        .first()
+    )
+
+
+def get_location_history(
+    db: Session,
+    device_id: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    limit: int = 1000,
+) -> List[models.DeviceLocationEvent]:
+    """Gibt die Standortwechsel eines Geräts im Zeitraum zurück."""
+    Event = models.DeviceLocationEvent
+    query = db.query(Event).filter(Event.device_id == device_id)
+    if start is not None:
+        query = query.filter(Event.timestamp >= start)
+    if end is not None:
+        query = query.filter(Event.timestamp <= end)
+    return query.order_by(Event.timestamp.asc()).limit(limit).all()
+
+
+def get_devices_at_location(
+    db: Session, location_id: str, start: datetime, end: Optional[datetime] = None
+) -> List[str]:
+    """
+    Gibt alle Geräte zurück, die im Zeitraum an einem Standort waren.
+
+    Ein Gerät zählt, wenn es zu Beginn des Zeitraums dort stand oder während
+    des Zeitraums an den Standort gewechselt hat.
+
+    Args:
+        db: Datenbank-Session
+        location_id: Standort-ID
+        start: Beginn des Zeitraums
+        end: Ende des Zeitraums (Standard: jetzt)
+
+    Returns:
+        List[str]: Sortierte Geräte-IDs
+    """
+    Event = models.DeviceLocationEvent
+    end = end or datetime.now()
+
+    arrived = (
+        db.query(Event.device_id)
+        .filter(
+            Event.location_id == location_id,
+            Event.timestamp >= start,
+            Event.timestamp <= end,
+        )
+        .distinct()
+        .all()
+    )
+    devices = {device_id for (device_id,) in arrived}
+    devices.update(devices_at_location_at(db, location_id, start))
+    return sorted(devices)
@@ -9,7 +9,7 @@ import datetime
 from typing import List, Optional, Dict, Any
 
 import sqlalchemy
-from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, ForeignKey, JSON
+from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, ForeignKey, JSON, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 
@@ -256,4 +256,88 @@ class EnergyCost(Base):
             "is_default": self.is_default,
             "created_at": self.created_at.isoformat() if self.created_at else None,
             "updated_at": self.updated_at.isoformat() if self.updated_at else None
-        }
\ No newline at end of file
+        }
+
+
+class Alert(Base):
+    """
+    Modell für Alarme aus der serverseitigen Regelauswertung.
+    """
+    __tablename__ = "alerts"
+    __table_args__ = (
+        # Aktive Alarme eines Geräts und Typs (Aufheben nach Regelwechsel)
+        Index("ix_alerts_device_type_active", "device_id", "alert_type", "is_active"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    device_id = Column(String, nullable=False, index=True)  # Geräte-ID (nicht der Primärschlüssel)
+    alert_type = Column(String, nullable=False)
+    message = Column(String)
+    value = Column(Float, nullable=True)
+    threshold = Column(Float, nullable=True)
+    is_active = Column(Boolean, default=True, index=True)
+    acknowledged = Column(Boolean, default=False)
+    acknowledged_by = Column(Integer, nullable=True)
+    created_at = Column(DateTime, default=func.now())
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+    resolved_at = Column(DateTime, nullable=True)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Konvertiert das Modell in ein Dictionary.
+        """
+        return {
+            "id": self.id,
+            "device_id": self.device_id,
+            "alert_type": self.alert_type,
+            "message": self.message,
+            "value": self.value,
+            "threshold": self.threshold,
+            "is_active": self.is_active,
+            "acknowledged": self.acknowledged,
+            "acknowledged_by": self.acknowledged_by,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "updated_at": self.updated_at.isoformat() if self.updated_at else None,
+            "resolved_at": self.resolved_at.isoformat() if self.resolved_at else None
+        }
+
+
+class DeviceLocationEvent(Base):
+    """
+    Modell für Standortwechsel von Geräten aus der BLE-Ortung.
+
+    Jeder Eintrag beschreibt den Wechsel eines Geräts an einen Standort. Der
+    Standort eines Geräts zu einem Zeitpunkt ist damit der des letzten
+    Eintrags davor.
+    """
+    __tablename__ = "device_location_events"
+    __table_args__ = (
+        # "Wo war Gerät X zum Zeitpunkt T" und Verläufe je Gerät
+        Index("ix_device_location_events_device_time", "device_id", "timestamp"),
+        # "Welche Geräte waren im Zeitraum an Standort Y"
+        Index("ix_device_location_events_location_time", "location_id", "timestamp"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    device_id = Column(String, nullable=False)  # Geräte-ID aus dem BLE-Namen
+    location_id = Column(String, nullable=False)
+    previous_location_id = Column(String, nullable=True)
+    timestamp = Column(DateTime, nullable=False, default=func.now())
+    source = Column(String, nullable=True)  # rssi, trilateration oder manual
+    x = Column(Float, nullable=True)  # Position bei Trilateration (Meter)
+    y = Column(Float, nullable=True)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Konvertiert das Modell in ein Dictionary.
+        """
+        return {
+            "id": self.id,
+            "device_id": self.device_id,
+            "location_id": self.location_id,
+            "previous_location_id": self.previous_location_id,
+            "timestamp": self.timestamp.isoformat() if self.timestamp else None,
+            "source": self.source,
+            "x": self.x,
+            "y": self.y
+        }
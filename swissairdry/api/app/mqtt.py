@@ -11,7 +11,7 @@ import json
 import logging
 import asyncio
 import time
-from typing import Any, Dict, Optional, Union
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
 
 import paho.mqtt.client as mqtt
 
@@ -94,6 +94,10 @@ class MQTTClient:
         self.is_connected_flag = False
         self.needs_reconnect = False  # Flag für Thread-sichere Wiederverbindung
         
+        # Zusätzliche Nachrichten-Callbacks: (Topic-Filter, Callback)
+        self._message_callbacks: List[Tuple[str, Callable]] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        
         # Verbindungsstabilität optimieren
         # Benutze längere Verzögerungen, um aggressives Wiederverbinden zu vermeiden,
         # was zu weiteren Problemen führen kann (Broker-Überlastung, Bannung, etc.)
@@ -120,6 +124,8 @@ class MQTTClient:
             Exception: Wenn die Verbindung fehlschlägt
         """
         loop = asyncio.get_event_loop()
+        # Event-Loop merken, um Nachrichten-Callbacks aus dem MQTT-Thread einzuplanen
+        self._loop = loop
         
         def _connect():
             try:
@@ -292,6 +298,34 @@ class MQTTClient:
         # Fehler werden abgefangen und geloggt, aber nicht weitergegeben
         await loop.run_in_executor(None, _unsubscribe)
     
+    def add_message_callback(self, topic_filter: str, callback: Callable) -> None:
+        """
+        Registriert einen Callback für Nachrichten auf einem Topic-Filter.
+        
+        Der Callback wird mit (topic, payload) im Event-Loop der API aufgerufen,
+        nicht im MQTT-Netzwerkthread. Coroutine-Funktionen werden als Task
+        ausgeführt. Das Abonnement wird nach jeder Wiederverbindung erneuert.
+        
+        Args:
+            topic_filter: MQTT-Topic-Filter, Wildcards + und # sind erlaubt
+            callback: Funktion oder Coroutine-Funktion mit (topic, payload)
+        """
+        self._message_callbacks.append((topic_filter, callback))
+        if self.is_connected_flag:
+            self.client.subscribe(topic_filter)
+    
+    def _dispatch_callbacks(self, topic: str, payload: Any) -> None:
+        """Plant passende Nachrichten-Callbacks im Event-Loop ein."""
+        if self._loop is None or self._loop.is_closed():
+            return
+        for topic_filter, callback in self._message_callbacks:
+            if not mqtt.topic_matches_sub(topic_filter, topic):
+                continue
+            if asyncio.iscoroutinefunction(callback):
+                asyncio.run_coroutine_threadsafe(callback(topic, payload), self._loop)
+            else:
+                self._loop.call_soon_threadsafe(callback, topic, payload)
+    
     def is_connected(self) -> bool:
         """Gibt zurück, ob der Client mit dem MQTT-Broker verbunden ist."""
         return self.is_connected_flag
@@ -328,6 +362,10 @@ class MQTTClient:
             
             # Standardthemen abonnieren
             client.subscribe("swissairdry/+/status")
+            
+            # Topics der registrierten Callbacks erneut abonnieren
+            for topic_filter, _ in self._message_callbacks:
+                client.subscribe(topic_filter)
         else:
             self.is_connected_flag = False
             logger.error(f"MQTT-Verbindung fehlgeschlagen mit Code {rc}")
@@ -435,8 +473,11 @@ class MQTTClient:
                     logger.info(f"Gerät {device_id} ist online")
                 elif payload_json == "offline":
                     logger.info(f"Gerät {device_id} ist offline")
+            
+            self._dispatch_callbacks(topic, payload_json)
         except json.JSONDecodeError:
             # Wenn die Nutzlast kein JSON ist, als String behandeln
             logger.debug(f"MQTT-Nachricht empfangen: {topic} = {payload}")
+            self._dispatch_callbacks(topic, payload)
         except Exception as e:
             logger.error(f"Fehler bei der Verarbeitung der MQTT-Nachricht: {e}")
\ No newline at end of file
@@ -0,0 +1,176 @@
+"""
+SwissAirDry Offline-Erkennung
+-----------------------------
+
+Erkennt Geräte, die sich nicht innerhalb ihres erwarteten Meldeintervalls
+melden. Jede Messung verschiebt die Frist des Geräts in einem Hashed Timing
+Wheel: Das Eintragen und Verschieben kostet O(1), unabhängig von der Anzahl
+der Geräte. Pro Tick werden nur die Einträge des aktuellen Slots geprüft,
+ein periodischer Scan über alle Geräte entfällt.
+
+@author Swiss Air Dry Team <info@swissairdry.com>
+@copyright 2023-2025 Swiss Air Dry Team
+"""
+
+import os
+import math
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+DEVICE_OFFLINE_TIMEOUT = float(os.getenv("DEVICE_OFFLINE_TIMEOUT") or "900")  # Sekunden
+OFFLINE_MISSED_REPORTS = int(os.getenv("OFFLINE_MISSED_REPORTS", "3"))
+OFFLINE_TICK = float(os.getenv("OFFLINE_TICK", "5"))  # Auflösung in Sekunden
+
+
+class TimerWheel:
+    """
+    Hashed Timing Wheel für Fristen je Schlüssel.
+
+    Eine Frist landet im Slot (frist // tick) % slots. Fristen, die weiter als
+    eine Umdrehung in der Zukunft liegen, bleiben beim Durchlauf des Slots
+    liegen, bis ihre Runde erreicht ist.
+    """
+
+    def __init__(self, tick: float = 1.0, slots: int = 512, now: Optional[float] = None):
+        """
+        Initialisiert das Rad.
+
+        Args:
+            tick: Dauer eines Slots in Sekunden
+            slots: Anzahl der Slots
+            now: Startzeitpunkt in Epoch-Sekunden (Standard: jetzt)
+        """
+        self.tick = tick
+        self.slots: List[Dict[str, float]] = [{} for _ in range(slots)]
+        self._slot_of: Dict[str, int] = {}
+        self._current = int((time.time() if now is None else now) // tick)
+
+    def __len__(self) -> int:
+        return len(self._slot_of)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._slot_of
+
+    def schedule(self, key: str, deadline: float) -> None:
+        """Setzt oder verschiebt die Frist eines Schlüssels."""
+        # Bereits abgelaufene Fristen im aktuellen Slot eintragen, damit sie
+        # beim nächsten Vorrücken und nicht erst nach einer Umdrehung fällig werden
+        slot = max(int(deadline // self.tick), self._current) % len(self.slots)
+        old_slot = self._slot_of.get(key)
+        if old_slot is not None and old_slot != slot:
+            del self.slots[old_slot][key]
+        self.slots[slot][key] = deadline
+        self._slot_of[key] = slot
+
+    def cancel(self, key: str) -> None:
+        """Entfernt die Frist eines Schlüssels."""
+        slot = self._slot_of.pop(key, None)
+        if slot is not None:
+            del self.slots[slot][key]
+
+    def advance(self, now: Optional[float] = None) -> List[Tuple[str, float]]:
+        """
+        Rückt das Rad bis zum aktuellen Zeitpunkt vor.
+
+        Args:
+            now: Aktueller Zeitpunkt in Epoch-Sekunden (Standard: jetzt)
+
+        Returns:
+            List[Tuple[str, float]]: Abgelaufene Schlüssel mit ihrer Frist
+        """
+        now = time.time() if now is None else now
+        target = int(now // self.tick)
+        # Nach langer Pause reicht eine Umdrehung, um jeden Slot einmal zu prüfen
+        steps = min(target - self._current, len(self.slots) - 1)
+        expired = []
+        for tick in range(target - steps, target + 1):
+            bucket = self.slots[tick % len(self.slots)]
+            due = [(key, deadline) for key, deadline in bucket.items() if deadline <= now]
+            for key, deadline in due:
+                del bucket[key]
+                del self._slot_of[key]
+            expired.extend(due)
+        self._current = target
+        return expired
+
+
+class OfflineDetector:
+    """Verfolgt die Meldefristen aller Geräte"""
+
+    def __init__(
+        self,
+        timeout: float = DEVICE_OFFLINE_TIMEOUT,
+        missed_reports: int = OFFLINE_MISSED_REPORTS,
+        tick: float = OFFLINE_TICK,
+        now: Optional[float] = None,
+    ):
+        """
+        Initialisiert die Offline-Erkennung.
+
+        Args:
+            timeout: Standard-Frist in Sekunden für Geräte ohne bekanntes Meldeintervall
+            missed_reports: Anzahl verpasster Meldungen, nach der ein Gerät mit
+                bekanntem Meldeintervall als offline gilt
+            tick: Auflösung des Timing Wheels in Sekunden
+            now: Startzeitpunkt (Standard: jetzt)
+        """
+        self.timeout = timeout
+        self.missed_reports = missed_reports
+        # Das Rad deckt die Standard-Frist mit einer Umdrehung ab
+        self._wheel = TimerWheel(tick=tick, slots=max(16, int(timeout // tick) + 1), now=now)
+        self._last_seen: Dict[str, float] = {}
+
+    def __len__(self) -> int:
+        return len(self._wheel)
+
+    def heartbeat(self, device_id: str, timestamp: Optional[float] = None,
+                  report_interval: Optional[float] = None) -> None:
+        """
+        Vermerkt eine Meldung eines Geräts und verschiebt seine Frist.
+
+        Args:
+            device_id: Geräte-ID
+            timestamp: Zeitpunkt der Meldung (Standard: jetzt)
+            report_interval: Erwartetes Meldeintervall des Geräts in Sekunden
+        """
+        now = time.time() if timestamp is None else timestamp
+        timeout = self.timeout_for(report_interval)
+        self._last_seen[device_id] = now
+        self._wheel.schedule(device_id, now + timeout)
+
+    def timeout_for(self, report_interval: Any) -> float:
+        """
+        Berechnet die Frist aus dem Meldeintervall eines Geräts.
+
+        Das Intervall stammt aus der frei bearbeitbaren Gerätekonfiguration und
+        kann z.B. als Zeichenkette vorliegen. Werte, die sich nicht als positive
+        endliche Zahl lesen lassen, ergeben die Standard-Frist.
+        """
+        if report_interval is None:
+            return self.timeout
+        try:
+            interval = float(report_interval)
+        except (TypeError, ValueError):
+            return self.timeout
+        if not math.isfinite(interval) or interval <= 0:
+            return self.timeout
+        return interval * self.missed_reports
+
+    def forget(self, device_id: str) -> None:
+        """Beendet die Überwachung eines Geräts."""
+        self._wheel.cancel(device_id)
+        self._last_seen.pop(device_id, None)
+
+    def expired(self, now: Optional[float] = None) -> List[Tuple[str, float]]:
+        """
+        Gibt alle Geräte zurück, deren Frist abgelaufen ist.
+
+        Abgelaufene Geräte werden nicht weiter überwacht, bis sie sich wieder melden.
+
+        Returns:
+            List[Tuple[str, float]]: (Geräte-ID, Zeitpunkt der letzten Meldung)
+        """
+        return [
+            (device_id, self._last_seen.pop(device_id, deadline))
+            for device_id, deadline in self._wheel.advance(now)
+        ]
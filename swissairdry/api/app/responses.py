@@ -0,0 +1,88 @@
+"""
+SwissAirDry API - Schnelle JSON-Antworten
+
+Enthält einen optimierten Antwortpfad für Listen-Endpunkte mit vielen Einträgen.
+Statt ORM-Objekte über Pydantic-Modelle zu validieren, werden nur die benötigten
+Spalten als Tupel abgefragt und direkt mit orjson serialisiert.
+
+@author Swiss Air Dry Team <info@swissairdry.com>
+@copyright 2023-2025 Swiss Air Dry Team
+"""
+
+import json
+from datetime import date, datetime
+from typing import Any, Iterable, Sequence, Tuple
+
+from fastapi.responses import Response
+
+# orjson ist optional, ohne orjson wird auf das Standard-json-Modul zurückgegriffen
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _json_default(value: Any) -> Any:
+    """Serialisiert Typen, die das Standard-json-Modul nicht kennt."""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Typ {type(value).__name__} ist nicht JSON-serialisierbar")
+
+
+def dumps(content: Any) -> bytes:
+    """
+    Serialisiert Daten mit dem schnellsten verfügbaren JSON-Encoder.
+
+    Args:
+        content: Zu serialisierende Daten
+
+    Returns:
+        bytes: UTF-8-kodiertes JSON
+    """
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(
+        content, default=_json_default, ensure_ascii=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def rows_to_records(columns: Sequence[str], rows: Iterable[Tuple[Any, ...]]) -> list:
+    """
+    Wandelt Spalten-Tupel aus einer Abfrage in eine Liste von Dictionaries um.
+
+    Args:
+        columns: Spaltennamen in der Reihenfolge der Tupel
+        rows: Ergebniszeilen als Tupel
+
+    Returns:
+        list: Liste von Dictionaries mit Spaltenname als Schlüssel
+    """
+    return [dict(zip(columns, row)) for row in rows]
+
+
+class FastJSONResponse(Response):
+    """
+    JSON-Antwort, die mit orjson serialisiert wird.
+
+    Wird eine Response direkt aus einer Route zurückgegeben, überspringt FastAPI
+    die Validierung über das response_model. Das OpenAPI-Schema bleibt dabei
+    unverändert, da es aus dem response_model der Route erzeugt wird.
+    """
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def rows_response(columns: Sequence[str], rows: Iterable[Tuple[Any, ...]]) -> FastJSONResponse:
+    """
+    Erstellt eine JSON-Antwort direkt aus Spalten-Tupeln.
+
+    Args:
+        columns: Spaltennamen in der Reihenfolge der Tupel
+        rows: Ergebniszeilen als Tupel
+
+    Returns:
+        FastJSONResponse: Serialisierte Liste von Objekten
+    """
+    return FastJSONResponse(content=rows_to_records(columns, rows))
@@ -57,12 +57,8 @@ async def switch_to_backup(user: Dict = Depends(get_current_user)):
     if user.get("role") != "admin":
         raise HTTPException(status_code=403, detail="Nur Administratoren können diese Aktion ausführen")
     
-    # Setze globale Variablen auf den Backup-Server
-    config._active_api_host = config.BACKUP_API_HOST
-    config._active_api_port = config.BACKUP_API_PORT
-    config._active_api_scheme = config.BACKUP_API_SCHEME
-    config._active_api_prefix = config.BACKUP_API_PREFIX
-    config._is_using_backup = True
+    # Backup-Server festlegen (kein automatischer Rückwechsel, solange er erreichbar ist)
+    config.switch_to_backup_server()
     
     return {"message": "Auf Backup-Server umgeschaltet", "active_server": "backup"}
 
@@ -87,11 +83,7 @@ async def switch_to_primary(user: Dict = Depends(get_current_user)):
     ):
         raise HTTPException(status_code=503, detail="Primärer Server ist nicht erreichbar")
     
-    # Setze globale Variablen auf den primären Server
-    config._active_api_host = config.PRIMARY_API_HOST
-    config._active_api_port = config.PRIMARY_API_PORT
-    config._active_api_scheme = config.PRIMARY_API_SCHEME
-    config._active_api_prefix = config.PRIMARY_API_PREFIX
-    config._is_using_backup = False
+    # Primären Server festlegen
+    config.switch_to_primary_server()
     
     return {"message": "Auf primären Server umgeschaltet", "active_server": "primary"}
\ No newline at end of file
@@ -12,14 +12,18 @@ für die Projektmanagement- und Auftragsabwicklung.
 
 import os
 import json
+import time
+import asyncio
 import logging
 from typing import Dict, List, Optional, Any, Union
 from datetime import datetime
 
-import requests
+import httpx
 from fastapi import APIRouter, Depends, HTTPException, Body, Query
 from pydantic import BaseModel, ConfigDict
 
+from swissairdry.api.app.circuit_breaker import CircuitOpenError, breaker_for_url
+
 # Router erstellen
 router = APIRouter(
     prefix="/api/exapp",
@@ -33,6 +37,36 @@ logger = logging.getLogger("swissairdry_api")
 # Umgebungsvariablen
 EXAPP_URL = os.environ.get("EXAPP_URL", "http://localhost:8080")
 EXAPP_DAEMON_URL = os.environ.get("EXAPP_DAEMON_URL", "http://localhost:8081")
+EXAPP_STATUS_TIMEOUT = float(os.environ.get("EXAPP_STATUS_TIMEOUT", "5"))
+# Gültigkeit des zwischengespeicherten Status in Sekunden
+EXAPP_STATUS_TTL = float(os.environ.get("EXAPP_STATUS_TTL", "15"))
+# Bis zu diesem Alter wird ein veralteter Status sofort geliefert und im Hintergrund erneuert
+EXAPP_STATUS_MAX_STALE = float(os.environ.get("EXAPP_STATUS_MAX_STALE", "120"))
+
+# Gemeinsamer HTTP-Client für die Statusprüfungen (wird bei Bedarf erstellt)
+_http_client: Optional[httpx.AsyncClient] = None
+
+# Zwischengespeicherter Status und laufende Aktualisierung
+_status_cache: Dict[str, Any] = {"status": None, "checked_at": 0.0}
+_refresh_task: Optional[asyncio.Task] = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Gibt den gemeinsamen HTTP-Client zurück und erstellt ihn bei Bedarf."""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(timeout=httpx.Timeout(EXAPP_STATUS_TIMEOUT))
+    return _http_client
+
+
+async def close_http_client():
+    """Schließt den gemeinsamen HTTP-Client (beim Herunterfahren)."""
+    global _http_client
+    if _refresh_task is not None and not _refresh_task.done():
+        _refresh_task.cancel()
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
 
 
 # Datenmodelle
@@ -45,12 +79,22 @@ class ExAppStatusResponse(BaseModel):
     exapp_url: str
     daemon_url: str
     last_sync: Optional[str] = None
+    sync: Optional[str] = None
     version: Optional[str] = None
     message: Optional[str] = None
 
 
 # Integration-Check-Funktionen
-def check_exapp_api() -> Dict[str, Any]:
+async def fetch_status(url: str) -> httpx.Response:
+    """Ruft einen Status-Endpunkt über den Circuit Breaker der Gegenstelle ab."""
+    return await breaker_for_url(url).call_async(
+        get_http_client().get,
+        url,
+        is_failure=lambda response: response.status_code >= 500,
+    )
+
+
+async def check_exapp_api() -> Dict[str, Any]:
     """
     Überprüft die Verbindung zur ExApp API
     
@@ -58,7 +102,7 @@ def check_exapp_api() -> Dict[str, Any]:
         Dict: Status-Informationen
     """
     try:
-        response = requests.get(f"{EXAPP_URL}/api/status", timeout=5)
+        response = await fetch_status(f"{EXAPP_URL}/api/status")
         if response.status_code == 200:
             return {
                 "connected": True,
@@ -71,6 +115,12 @@ def check_exapp_api() -> Dict[str, Any]:
                 "status": "error",
                 "message": f"ExApp API antwortet mit Status {response.status_code}"
             }
+    except CircuitOpenError as e:
+        return {
+            "connected": False,
+            "status": "error",
+            "message": str(e)
+        }
     except Exception as e:
         logger.warning(f"Fehler bei Verbindung zur ExApp API: {str(e)}")
         return {
@@ -80,7 +130,7 @@ def check_exapp_api() -> Dict[str, Any]:
         }
 
 
-def check_exapp_daemon() -> Dict[str, Any]:
+async def check_exapp_daemon() -> Dict[str, Any]:
     """
     Überprüft die Verbindung zum ExApp Daemon
     
@@ -88,13 +138,17 @@ def check_exapp_daemon() -> Dict[str, Any]:
         Dict: Status-Informationen
     """
     try:
-        response = requests.get(f"{EXAPP_DAEMON_URL}/status", timeout=5)
+        response = await fetch_status(f"{EXAPP_DAEMON_URL}/status")
         if response.status_code == 200:
             data = response.json()
+            message = "ExApp Daemon ist erreichbar"
+            if data.get("sync") == "disabled":
+                message += " (Synchronisation deaktiviert)"
             return {
                 "connected": True,
                 "status": "ok",
-                "message": "ExApp Daemon ist erreichbar",
+                "message": message,
+                "sync": data.get("sync"),
                 "last_sync": data.get("last_sync"),
                 "version": data.get("version")
             }
@@ -104,6 +158,12 @@ def check_exapp_daemon() -> Dict[str, Any]:
                 "status": "error",
                 "message": f"ExApp Daemon antwortet mit Status {response.status_code}"
             }
+    except CircuitOpenError as e:
+        return {
+            "connected": False,
+            "status": "error",
+            "message": str(e)
+        }
     except Exception as e:
         logger.warning(f"Fehler bei Verbindung zum ExApp Daemon: {str(e)}")
         return {
@@ -113,20 +173,14 @@ def check_exapp_daemon() -> Dict[str, Any]:
         }
 
 
-# API-Endpunkte
-@router.get("/status", response_model=ExAppStatusResponse)
-async def get_exapp_status():
+async def refresh_exapp_status() -> "ExAppStatusResponse":
     """
-    Prüft den Status der ExApp-Integration
+    Prüft ExApp API und ExApp Daemon gleichzeitig und speichert das Ergebnis.
     
     Returns:
         ExAppStatusResponse: Status-Informationen zur ExApp-Integration
     """
-    # ExApp API prüfen
-    exapp_status = check_exapp_api()
-    
-    # ExApp Daemon prüfen
-    daemon_status = check_exapp_daemon()
+    exapp_status, daemon_status = await asyncio.gather(check_exapp_api(), check_exapp_daemon())
     
     # Gesamtstatus ermitteln
     if exapp_status["connected"] and daemon_status["connected"]:
@@ -136,13 +190,51 @@ async def get_exapp_status():
     else:
         overall_status = "partial"
     
-    # Detaillierten Status zurückgeben
-    return ExAppStatusResponse(
+    status = ExAppStatusResponse(
         status=overall_status,
         connected=exapp_status["connected"] or daemon_status["connected"],
         exapp_url=EXAPP_URL,
         daemon_url=EXAPP_DAEMON_URL,
         last_sync=daemon_status.get("last_sync"),
+        sync=daemon_status.get("sync"),
         version=daemon_status.get("version"),
         message=f"ExApp: {exapp_status['message']}; Daemon: {daemon_status['message']}"
-    )
\ No newline at end of file
+    )
+    _status_cache["status"] = status
+    _status_cache["checked_at"] = time.monotonic()
+    return status
+
+
+def start_status_refresh() -> asyncio.Task:
+    """Startet eine Aktualisierung, sofern nicht bereits eine läuft."""
+    global _refresh_task
+    if _refresh_task is None or _refresh_task.done():
+        _refresh_task = asyncio.create_task(refresh_exapp_status())
+    return _refresh_task
+
+
+# API-Endpunkte
+@router.get("/status", response_model=ExAppStatusResponse)
+async def get_exapp_status():
+    """
+    Prüft den Status der ExApp-Integration
+    
+    Der Status wird EXAPP_STATUS_TTL Sekunden zwischengespeichert. Ein älterer
+    Status wird bis EXAPP_STATUS_MAX_STALE Sekunden sofort geliefert und im
+    Hintergrund erneuert, gleichzeitige Anfragen teilen sich eine Prüfung.
+    
+    Returns:
+        ExAppStatusResponse: Status-Informationen zur ExApp-Integration
+    """
+    cached = _status_cache["status"]
+    age = time.monotonic() - _status_cache["checked_at"]
+    
+    if cached is not None and age < EXAPP_STATUS_TTL:
+        return cached
+    
+    refresh = start_status_refresh()
+    if cached is not None and age < EXAPP_STATUS_MAX_STALE:
+        return cached
+    
+    # Kein verwendbarer Status: auf die (gemeinsame) Prüfung warten
+    return await asyncio.shield(refresh)
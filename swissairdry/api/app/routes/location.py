@@ -5,11 +5,16 @@ SwissAirDry API - Standortverwaltung und BLE-Scanning
 Diese Datei enthält API-Routen für die Verwaltung von Standorten und BLE-basierte Geräteortung.
 """
 
+from datetime import datetime
 from typing import Dict, List, Optional, Any
-from fastapi import APIRouter, HTTPException, Depends, status
+from fastapi import APIRouter, HTTPException, Depends, Query, status
 from pydantic import BaseModel
+from sqlalchemy.orm import Session
 
 import ble_scanner
+from swissairdry.api.app import database
+from swissairdry.api.app import location_history
+from swissairdry import crud
 
 # API-Router erstellen
 router = APIRouter(
@@ -39,6 +44,21 @@ class DeviceLocationResponse(BaseModel):
     rssi: Optional[int] = None
     last_seen: Optional[str] = None
 
+class LocationEventResponse(BaseModel):
+    device_id: str
+    location_id: str
+    previous_location_id: Optional[str] = None
+    timestamp: Optional[str] = None
+    source: Optional[str] = None
+    x: Optional[float] = None
+    y: Optional[float] = None
+
+class LocationDevicesResponse(BaseModel):
+    location_id: str
+    start: str
+    end: str
+    devices: List[str]
+
 # Dependency für BLE-Manager
 def get_ble_manager():
     """Erstellt und gibt eine Instanz des BLE-Managers zurück"""
@@ -184,6 +204,13 @@ async def get_discovered_devices(
     """Gibt alle durch BLE-Scan entdeckten Geräte zurück"""
     return manager.get_discovered_devices()
 
+@router.get("/devices/positions", response_model=Dict[str, Any])
+async def get_device_positions(
+    manager: ble_scanner.BLEManager = Depends(get_ble_manager)
+):
+    """Gibt die per Trilateration berechneten Gerätepositionen zurück"""
+    return manager.get_device_positions()
+
 @router.get("/device/{device_id}", response_model=DeviceLocationResponse)
 async def get_device_location(
     device_id: str,
@@ -234,7 +261,7 @@ async def set_device_location(
         )
     
     # Standort manuell setzen
-    ble_scanner.set_device_location(device_id, location_id)
+    ble_scanner.set_device_location(device_id, location_id, source="manual")
     
     location_name = locations[location_id].get("name", "")
     
@@ -242,4 +269,70 @@ async def set_device_location(
         device_id=device_id,
         location_id=location_id,
         location_name=location_name
-    )
\ No newline at end of file
+    )
+
+@router.get("/device/{device_id}/at", response_model=LocationEventResponse)
+async def get_device_location_at(
+    device_id: str,
+    timestamp: datetime,
+    db: Session = Depends(database.get_read_db)
+):
+    """Gibt den Standort eines Geräts zu einem bestimmten Zeitpunkt zurück"""
+    event = location_history.get_location_at(db, device_id, timestamp)
+    if event is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Kein Standort für Gerät {device_id} zum Zeitpunkt {timestamp.isoformat()} bekannt"
+        )
+    return LocationEventResponse(**event.to_dict())
+
+@router.get("/device/{device_id}/history", response_model=List[LocationEventResponse])
+async def get_device_location_history(
+    device_id: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    limit: int = Query(1000, le=10000),
+    db: Session = Depends(database.get_read_db)
+):
+    """Gibt die Standortwechsel eines Geräts im Zeitraum zurück"""
+    events = location_history.get_location_history(db, device_id, start, end, limit)
+    return [LocationEventResponse(**event.to_dict()) for event in events]
+
+@router.get("/{location_id}/devices", response_model=LocationDevicesResponse)
+async def get_devices_at_location(
+    location_id: str,
+    job_id: Optional[int] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    db: Session = Depends(database.get_read_db)
+):
+    """
+    Gibt alle Geräte zurück, die im Zeitraum an einem Standort waren.
+    
+    Der Zeitraum wird entweder über start/end oder über die Laufzeit eines
+    Auftrags (job_id) angegeben.
+    """
+    if job_id is not None:
+        job = crud.get_job(db, job_id)
+        if job is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Auftrag mit ID {job_id} nicht gefunden"
+            )
+        start = start or job.start_date
+        end = end or job.end_date
+    
+    if start is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Es muss ein Startzeitpunkt oder ein Auftrag mit Startdatum angegeben werden"
+        )
+    
+    end = end or datetime.now()
+    devices = location_history.get_devices_at_location(db, location_id, start, end)
+    return LocationDevicesResponse(
+        location_id=location_id,
+        start=start.isoformat(),
+        end=end.isoformat(),
+        devices=devices
+    )
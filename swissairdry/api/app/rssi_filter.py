@@ -0,0 +1,209 @@
+"""
+SwissAirDry BLE RSSI-Filter
+---------------------------
+
+Glättet die verrauschten RSSI-Werte der BLE-Geräte, bevor daraus Standorte
+abgeleitet werden. Einzelne Ausreißer führen sonst dazu, dass Geräte zwischen
+Büro, Werkstatt und Lager hin- und herspringen.
+
+Der Zustand aller Geräte liegt in kompakten array-Strukturen (ein Slot pro
+Gerät) statt in einem Dictionary pro Gerät. Freigegebene Slots werden wieder
+verwendet.
+
+Unterstützte Filter:
+    ema     Exponentiell gleitender Mittelwert
+    kalman  Eindimensionaler Kalman-Filter (Random-Walk-Modell)
+    median  Gleitender Median über die letzten N Messungen
+    none    Keine Glättung, letzter Rohwert
+
+@author Swiss Air Dry Team <info@swissairdry.com>
+@copyright 2023-2025 Swiss Air Dry Team
+"""
+
+from array import array
+from typing import Dict, List, Optional
+
+FILTER_MODES = ("ema", "kalman", "median", "none")
+
+
+class RSSIFilterBank:
+    """Filterbank mit einem Filterzustand pro Gerät"""
+
+    def __init__(
+        self,
+        mode: str = "ema",
+        alpha: float = 0.3,
+        window: int = 5,
+        process_noise: float = 0.5,
+        measurement_noise: float = 16.0,
+        capacity: int = 64,
+    ):
+        """
+        Initialisiert die Filterbank.
+
+        Args:
+            mode: Filtertyp (ema, kalman, median oder none)
+            alpha: Glättungsfaktor des EMA-Filters (0 < alpha <= 1)
+            window: Fenstergröße des Median-Filters
+            process_noise: Prozessrauschen des Kalman-Filters (dBm² pro Messung)
+            measurement_noise: Messrauschen des Kalman-Filters (dBm²)
+            capacity: Anfängliche Anzahl an Slots
+        """
+        if mode not in FILTER_MODES:
+            raise ValueError(f"Unbekannter RSSI-Filter: {mode}")
+
+        self.mode = mode
+        self.alpha = alpha
+        self.window = max(1, window)
+        self.process_noise = process_noise
+        self.measurement_noise = measurement_noise
+
+        self._slots: Dict[str, int] = {}
+        self._free: List[int] = []
+        self._capacity = 0
+
+        # Zustand je Slot
+        self._value = array("d")      # Geglätteter Wert
+        self._variance = array("d")   # Schätzfehler (nur Kalman)
+        self._count = array("l")      # Anzahl Messungen
+        self._samples = array("d")    # Ringpuffer (nur Median), window Werte pro Slot
+
+        self._grow(max(1, capacity))
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def __contains__(self, device_id: str) -> bool:
+        return device_id in self._slots
+
+    def _grow(self, capacity: int) -> None:
+        """Vergrößert die Zustands-Arrays auf die angegebene Slot-Anzahl."""
+        extra = capacity - self._capacity
+        self._value.extend([0.0] * extra)
+        self._variance.extend([0.0] * extra)
+        self._count.extend([0] * extra)
+        if self.mode == "median":
+            self._samples.extend([0.0] * (extra * self.window))
+        self._free.extend(range(capacity - 1, self._capacity - 1, -1))
+        self._capacity = capacity
+
+    def _slot(self, device_id: str) -> int:
+        """Gibt den Slot eines Geräts zurück und legt ihn bei Bedarf an."""
+        slot = self._slots.get(device_id)
+        if slot is None:
+            if not self._free:
+                self._grow(self._capacity * 2)
+            slot = self._free.pop()
+            self._count[slot] = 0
+            self._slots[device_id] = slot
+        return slot
+
+    def update(self, device_id: str, rssi: float) -> float:
+        """
+        Verarbeitet eine neue Messung und gibt den geglätteten Wert zurück.
+
+        Args:
+            device_id: ID des Geräts
+            rssi: Gemessener RSSI-Wert in dBm
+
+        Returns:
+            float: Geglätteter RSSI-Wert
+        """
+        slot = self._slot(device_id)
+        count = self._count[slot]
+        self._count[slot] = count + 1
+
+        if count == 0:
+            # Erste Messung initialisiert den Filter
+            self._value[slot] = rssi
+            self._variance[slot] = self.measurement_noise
+            if self.mode == "median":
+                self._samples[slot * self.window] = rssi
+            return rssi
+
+        if self.mode == "ema":
+            value = self._value[slot] + self.alpha * (rssi - self._value[slot])
+        elif self.mode == "kalman":
+            # Vorhersage: Wert bleibt gleich, Unsicherheit wächst
+            variance = self._variance[slot] + self.process_noise
+            gain = variance / (variance + self.measurement_noise)
+            value = self._value[slot] + gain * (rssi - self._value[slot])
+            self._variance[slot] = (1.0 - gain) * variance
+        elif self.mode == "median":
+            offset = slot * self.window
+            self._samples[offset + count % self.window] = rssi
+            filled = min(count + 1, self.window)
+            ordered = sorted(self._samples[offset:offset + filled])
+            middle = filled // 2
+            if filled % 2:
+                value = ordered[middle]
+            else:
+                value = (ordered[middle - 1] + ordered[middle]) / 2.0
+        else:
+            value = rssi
+
+        self._value[slot] = value
+        return value
+
+    def value(self, device_id: str) -> Optional[float]:
+        """Gibt den geglätteten Wert eines Geräts zurück."""
+        slot = self._slots.get(device_id)
+        if slot is None:
+            return None
+        return self._value[slot]
+
+    def count(self, device_id: str) -> int:
+        """Gibt die Anzahl der verarbeiteten Messungen eines Geräts zurück."""
+        slot = self._slots.get(device_id)
+        if slot is None:
+            return 0
+        return self._count[slot]
+
+    def remove(self, device_id: str) -> None:
+        """Entfernt den Filterzustand eines Geräts und gibt den Slot frei."""
+        slot = self._slots.pop(device_id, None)
+        if slot is not None:
+            self._free.append(slot)
+
+
+class HysteresisClassifier:
+    """
+    Ordnet RSSI-Werte Zonen zu und wechselt die Zone erst, wenn der Wert das
+    Band der aktuellen Zone um mehr als den Hysterese-Abstand verlässt.
+    """
+
+    def __init__(self, bands: List[tuple], margin: float = 4.0):
+        """
+        Initialisiert den Klassifikator.
+
+        Args:
+            bands: Liste von (zone, untere Grenze, obere Grenze) in dBm, absteigend
+                nach Signalstärke sortiert. Die untere Grenze ist exklusiv, die
+                obere Grenze None steht für "unbegrenzt".
+            margin: Hysterese-Abstand in dB
+        """
+        self.bands = bands
+        self.margin = margin
+        self._band_by_zone = {zone: (lower, upper) for zone, lower, upper in bands}
+
+    def classify(self, rssi: float, current: Optional[str] = None) -> Optional[str]:
+        """
+        Bestimmt die Zone für einen RSSI-Wert.
+
+        Args:
+            rssi: Geglätteter RSSI-Wert
+            current: Aktuelle Zone des Geräts
+
+        Returns:
+            Optional[str]: Zone oder None, wenn der Wert unter allen Bändern liegt
+        """
+        band = self._band_by_zone.get(current)
+        if band is not None:
+            lower, upper = band
+            if rssi > lower - self.margin and (upper is None or rssi <= upper + self.margin):
+                return current
+
+        for zone, lower, upper in self.bands:
+            if rssi > lower and (upper is None or rssi <= upper):
+                return zone
+        return None
@@ -22,9 +22,11 @@ from fastapi.templating import Jinja2Templates
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.orm import Session
 
-from swissairdry.database import engine, get_db, Base
+from swissairdry.database import engine, get_db, get_read_db, get_pool_status, Base
 from swissairdry import schemas, crud
 from swissairdry.mqtt import MQTTClient
+from swissairdry.api.app.responses import rows_response
+from swissairdry.api.compression import add_compression
 
 # Logging einrichten
 logging.basicConfig(
@@ -56,6 +58,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Gzip/Brotli-Komprimierung für größere JSON-Antworten
+add_compression(app)
+
 # Templates und statische Dateien einrichten
 templates_dir = os.path.join(os.path.dirname(__file__), "templates")
 static_dir = os.path.join(os.path.dirname(__file__), "static")
@@ -168,6 +173,7 @@ async def health_check():
         "version": "1.0.0",
         "uptime": (datetime.now() - server_start_time).total_seconds(),
         "stats": api_stats,
+        "database_pool": get_pool_status(),
     }
 
 
@@ -198,11 +204,12 @@ async def admin_placeholder():
 async def get_devices(
     skip: int = 0, 
     limit: int = 100, 
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Gibt eine Liste aller Geräte zurück."""
-    devices = crud.get_devices(db, skip=skip, limit=limit)
-    return devices
+    # Schneller Pfad: Spalten-Tupel direkt serialisieren statt ORM-Objekte zu validieren
+    columns, rows = crud.get_device_rows(db, skip=skip, limit=limit)
+    return rows_response(columns, rows)
 
 
 @app.post("/api/devices", response_model=schemas.Device)
@@ -221,7 +228,7 @@ async def create_device(
 
 
 @app.get("/api/devices/{device_id}", response_model=schemas.Device)
-async def get_device(device_id: str, db: Session = Depends(get_db)):
+async def get_device(device_id: str, db: Session = Depends(get_read_db)):
     """Gibt ein Gerät anhand seiner ID zurück."""
     db_device = crud.get_device_by_device_id(db, device_id=device_id)
     if db_device is None:
@@ -316,19 +323,20 @@ async def create_sensor_data(
 async def get_sensor_data(
     device_id: str, 
     limit: int = 100, 
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Gibt die Sensordaten eines Geräts zurück."""
     db_device = crud.get_device_by_device_id(db, device_id=device_id)
     if db_device is None:
         raise HTTPException(status_code=404, detail="Gerät nicht gefunden")
     
-    sensor_data = crud.get_sensor_data_by_device(
+    # Schneller Pfad: Spalten-Tupel direkt serialisieren statt ORM-Objekte zu validieren
+    columns, rows = crud.get_sensor_data_rows_by_device(
         db=db, 
         device_id=db_device.id, 
         limit=limit
     )
-    return sensor_data
+    return rows_response(columns, rows)
 
 
 @app.post("/api/device/{device_id}/command", response_model=schemas.Message)
@@ -385,7 +393,7 @@ async def send_device_command(
 async def get_customers(
     skip: int = 0, 
     limit: int = 100, 
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Gibt eine Liste aller Kunden zurück."""
     customers = crud.get_customers(db, skip=skip, limit=limit)
@@ -402,7 +410,7 @@ async def create_customer(
 
 
 @app.get("/api/customers/{customer_id}", response_model=schemas.Customer)
-async def get_customer(customer_id: int, db: Session = Depends(get_db)):
+async def get_customer(customer_id: int, db: Session = Depends(get_read_db)):
     """Gibt einen Kunden anhand seiner ID zurück."""
     db_customer = crud.get_customer(db, customer_id=customer_id)
     if db_customer is None:
@@ -436,7 +444,7 @@ async def delete_customer(customer_id: int, db: Session = Depends(get_db)):
 @app.get("/api/customers/{customer_id}/devices", response_model=List[schemas.Device])
 async def get_customer_devices(
     customer_id: int, 
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Gibt alle Geräte eines Kunden zurück."""
     db_customer = crud.get_customer(db, customer_id=customer_id)
@@ -451,7 +459,7 @@ async def get_customer_devices(
 async def get_jobs(
     skip: int = 0, 
     limit: int = 100, 
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Gibt eine Liste aller Aufträge zurück."""
     jobs = crud.get_jobs(db, skip=skip, limit=limit)
@@ -474,7 +482,7 @@ async def create_job(
 
 
 @app.get("/api/jobs/{job_id}", response_model=schemas.Job)
-async def get_job(job_id: int, db: Session = Depends(get_db)):
+async def get_job(job_id: int, db: Session = Depends(get_read_db)):
     """Gibt einen Auftrag anhand seiner ID zurück."""
     db_job = crud.get_job(db, job_id=job_id)
     if db_job is None:
@@ -511,7 +519,7 @@ async def delete_job(job_id: int, db: Session = Depends(get_db)):
 async def get_reports(
     skip: int = 0, 
     limit: int = 100, 
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Gibt eine Liste aller Berichte zurück."""
     reports = crud.get_reports(db, skip=skip, limit=limit)
@@ -534,7 +542,7 @@ async def create_report(
 
 
 @app.get("/api/reports/{report_id}", response_model=schemas.Report)
-async def get_report(report_id: int, db: Session = Depends(get_db)):
+async def get_report(report_id: int, db: Session = Depends(get_read_db)):
     """Gibt einen Bericht anhand seiner ID zurück."""
     db_report = crud.get_report(db, report_id=report_id)
     if db_report is None:
@@ -546,7 +554,7 @@ async def get_report(report_id: int, db: Session = Depends(get_db)):
 
 @app.get("/api/energy_costs", response_model=List[schemas.EnergyCost])
 async def get_energy_costs(
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Gibt eine Liste aller Energiekosten-Einträge zurück."""
     energy_costs = crud.get_energy_costs(db)
@@ -563,7 +571,7 @@ async def create_energy_cost(
 
 
 @app.get("/api/energy_costs/current", response_model=schemas.EnergyCost)
-async def get_current_energy_cost(db: Session = Depends(get_db)):
+async def get_current_energy_cost(db: Session = Depends(get_read_db)):
     """Gibt den aktuellen Energiekosten-Eintrag zurück."""
     current_energy_cost = crud.get_current_energy_cost(db)
     if current_energy_cost is None:
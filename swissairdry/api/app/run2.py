@@ -28,13 +28,21 @@ from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from swissairdry.api.app import database
 from swissairdry.api.app import models
 from swissairdry import schemas
 from swissairdry import crud
+from swissairdry.api.app import crud_async
 from swissairdry.api.app import mqtt
 from swissairdry.api.app import utils
+from swissairdry.api.app import alerts
+from swissairdry.api.app import config
+from swissairdry.api.app import circuit_breaker
+from swissairdry.api.app.offline_detector import OfflineDetector, OFFLINE_TICK
+from swissairdry.api.app.responses import rows_response
+from swissairdry.api.compression import add_compression
 
 # API-Routen importieren
 from swissairdry.api.app.routes import location
@@ -65,6 +73,14 @@ except ImportError:
 # MQTT-Client initialisieren
 mqtt_client = None
 
+# Serverseitige Alarmregeln
+alert_engine = alerts.build_alert_engine()
+
+# Offline-Erkennung: Frist aus DEVICE_OFFLINE_TIMEOUT, sonst aus der Stille-Regel
+offline_detector = OfflineDetector(
+    timeout=float(os.getenv("DEVICE_OFFLINE_TIMEOUT") or alert_engine.silence_timeout or 900)
+)
+
 # Status-Variablen
 server_start_time = datetime.now()
 api_stats = {
@@ -80,10 +96,16 @@ async def check_primary_server_availability():
     verfügbar ist, und bei Bedarf automatisch umschaltet.
     """
     while True:
-        # Hier Code zur Überprüfung des primären Servers implementieren
-        # Bei Ausfall zum Backup-Server wechseln
-        await asyncio.sleep(60)  # Alle 60 Sekunden prüfen
-        
+        try:
+            # Die Prüfung blockiert bis zum HTTP-Timeout und läuft daher in einem Thread,
+            # config.get_full_url() liest nur den zwischengespeicherten Status
+            delay = await asyncio.to_thread(config.probe_api_servers)
+        except Exception as e:
+            logger.error(f"Fehler bei der Prüfung der API-Server: {e}")
+            delay = config.HEALTH_CHECK_INTERVAL
+        await asyncio.sleep(max(delay, 1.0))
+
+
 async def check_mqtt_connection():
     """
     Hintergrundaufgabe, die regelmäßig den MQTT-Verbindungsstatus überprüft
@@ -105,6 +127,107 @@ async def check_mqtt_connection():
             await asyncio.sleep(10)  # Bei Fehler 10 Sekunden warten
 
 
+async def publish_alert_events(events: List[alerts.AlertEvent]):
+    """
+    Veröffentlicht Alarmwechsel für die Deck-Integration.
+
+    Nur ausgelöste Alarme gehen an swissairdry/<device_id>/alarm, aufgehobene
+    an swissairdry/<device_id>/alarm/resolved (siehe AlertEvent.mqtt_topic).
+    """
+    if not events or not mqtt_client or not mqtt_client.is_connected():
+        return
+    for event in events:
+        try:
+            await mqtt_client.publish(event.mqtt_topic, event.to_mqtt_payload())
+        except Exception as e:
+            logger.error(f"Fehler beim Veröffentlichen des Alarms {event.alert_type}: {e}")
+
+
+async def store_alert_events(events: List[alerts.AlertEvent]):
+    """Speichert Alarmwechsel in einer eigenen Session und veröffentlicht sie."""
+    if not events:
+        return
+    if database.AsyncSessionLocal is not None:
+        async with database.AsyncSessionLocal() as db:
+            await crud_async.apply_alert_events(db, events)
+            await db.commit()
+    await publish_alert_events(events)
+
+
+async def publish_device_status(device_id: str, status: str):
+    """Veröffentlicht den Gerätestatus unter swissairdry/<device_id>/status."""
+    if not mqtt_client or not mqtt_client.is_connected():
+        return
+    try:
+        await mqtt_client.publish(f"swissairdry/{device_id}/status", status)
+    except Exception as e:
+        logger.error(f"Fehler beim Veröffentlichen des Status von {device_id}: {e}")
+
+
+async def restore_alert_engine():
+    """Übernimmt die aktiven Alarme aus der Datenbank in die Alarm-Engine."""
+    if database.AsyncSessionLocal is None:
+        return
+    async with database.AsyncSessionLocal() as db:
+        restored = alert_engine.restore(await crud_async.get_active_alert_keys(db))
+    logger.info(f"Alarm-Engine: {restored} aktive Alarme übernommen")
+
+
+def report_interval_of(configuration: Any) -> Any:
+    """Liest das Meldeintervall aus der (frei bearbeitbaren) Gerätekonfiguration."""
+    if isinstance(configuration, dict):
+        return configuration.get("report_interval")
+    return None
+
+
+async def seed_offline_detector():
+    """Übernimmt alle als online geführten Geräte mit ihrer letzten Meldung in die Offline-Erkennung."""
+    if database.AsyncSessionLocal is None:
+        return
+    async with database.AsyncSessionLocal() as db:
+        for device_id, last_seen, configuration in await crud_async.get_online_devices(db):
+            offline_detector.heartbeat(
+                device_id,
+                last_seen.timestamp() if last_seen else None,
+                report_interval_of(configuration),
+            )
+    logger.info(f"Offline-Erkennung überwacht {len(offline_detector)} Geräte")
+
+
+async def check_offline_devices():
+    """
+    Hintergrundaufgabe, die Geräte nach Ablauf ihrer Meldefrist als offline
+    markiert, den Status veröffentlicht und Stille-Alarme auslöst.
+    """
+    while True:
+        try:
+            await asyncio.sleep(OFFLINE_TICK)
+            expired = offline_detector.expired()
+            if not expired:
+                continue
+            
+            now = time.time()
+            events = []
+            for device_id, last_seen in expired:
+                events.extend(alert_engine.device_offline(device_id, last_seen, now))
+            
+            # Status aller abgelaufenen Geräte in einem Statement setzen
+            if database.AsyncSessionLocal is not None:
+                async with database.AsyncSessionLocal() as db:
+                    await crud_async.mark_devices_offline(db, [device_id for device_id, _ in expired])
+                    await crud_async.apply_alert_events(db, events)
+                    await db.commit()
+            
+            for device_id, _ in expired:
+                logger.info(f"Gerät {device_id} ist offline")
+                await publish_device_status(device_id, "offline")
+            await publish_alert_events(events)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Fehler bei der Offline-Erkennung: {e}")
+
+
 @contextlib.asynccontextmanager
 async def lifespan(app: FastAPI) -> AsyncIterator[None]:
     """
@@ -116,10 +239,14 @@ async def lifespan(app: FastAPI) -> AsyncIterator[None]:
     """
     global mqtt_client
     background_tasks = []
+    history_store = None
     
     # --- Startup-Logik ---
     logger.info("API-Server wird gestartet...")
     
+    # Ohne Async-Treiber sofort abbrechen statt jede Anfrage mit 500 zu beantworten
+    database.require_async_database()
+    
     # MQTT-Client initialisieren
     mqtt_host = os.getenv("MQTT_HOST", "127.0.0.1") # Nutze lokale IP statt Hostname
     mqtt_port = int(os.getenv("MQTT_PORT", "1883"))
@@ -140,6 +267,22 @@ async def lifespan(app: FastAPI) -> AsyncIterator[None]:
             
             # BLE-Scanner initialisieren
             ble_manager = get_ble_manager()
+            
+            # Standortverlauf: letzten bekannten Stand wiederherstellen und
+            # Standortwechsel gebündelt in die Datenbank schreiben
+            try:
+                from swissairdry.api.app.location_history import LocationHistoryStore
+                history_store = LocationHistoryStore(database.SessionLocal)
+                ble_scanner.device_locations.update(history_store.load_current_locations())
+                ble_scanner.set_history_store(history_store)
+                background_tasks.append(asyncio.create_task(history_store.run()))
+                logger.info(f"{len(ble_scanner.device_locations)} Gerätestandorte wiederhergestellt")
+            except Exception as e:
+                logger.error(f"Fehler beim Laden des Standortverlaufs: {e}")
+            
+            # Beobachtungen der Scanner-Agenten auf den Gateways empfangen
+            ble_manager.attach_agents(mqtt_client)
+            
             if hasattr(ble_manager, 'start_background_scan'):
                 # BLE-Scanner im Hintergrund starten
                 logger.info("BLE-Scanner wird gestartet...")
@@ -154,6 +297,15 @@ async def lifespan(app: FastAPI) -> AsyncIterator[None]:
     # Hintergrundaufgaben starten
     background_tasks.append(asyncio.create_task(check_primary_server_availability()))
     background_tasks.append(asyncio.create_task(check_mqtt_connection()))
+    try:
+        await restore_alert_engine()
+    except Exception as e:
+        logger.error(f"Fehler beim Übernehmen der aktiven Alarme: {e}")
+    try:
+        await seed_offline_detector()
+    except Exception as e:
+        logger.error(f"Fehler beim Initialisieren der Offline-Erkennung: {e}")
+    background_tasks.append(asyncio.create_task(check_offline_devices()))
     
     logger.info("API-Server erfolgreich gestartet")
     
@@ -182,6 +334,13 @@ async def lifespan(app: FastAPI) -> AsyncIterator[None]:
         except Exception as e:
             logger.error(f"Fehler beim Stoppen des BLE-Scanners: {e}")
     
+    # Ausstehende Standortwechsel schreiben
+    if history_store is not None:
+        history_store.flush()
+    
+    # HTTP-Client der ExApp-Statusprüfung schließen
+    await exapp.close_http_client()
+    
     # MQTT-Verbindung trennen
     if mqtt_client:
         await mqtt_client.disconnect()
@@ -223,6 +382,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Gzip/Brotli-Komprimierung für größere JSON-Antworten
+add_compression(app)
+
 # Templates und statische Dateien einrichten
 templates_dir = os.path.join(os.path.dirname(__file__), "templates")
 static_dir = os.path.join(os.path.dirname(__file__), "static")
@@ -236,11 +398,12 @@ app.mount("/static", StaticFiles(directory=static_dir), name="static")
 async def get_devices(
     skip: int = 0, 
     limit: int = 100, 
-    db: Session = Depends(database.get_db)
+    db: AsyncSession = Depends(database.get_async_read_db)
 ):
     """Gibt eine Liste aller Geräte zurück."""
-    devices = crud.get_devices(db, skip=skip, limit=limit)
-    return devices
+    # Schneller Pfad: Spalten-Tupel direkt serialisieren statt ORM-Objekte zu validieren
+    columns, rows = await crud_async.get_device_rows(db, skip=skip, limit=limit)
+    return rows_response(columns, rows)
 
 
 @app.post("/api/devices", response_model=schemas.Device)
@@ -259,9 +422,9 @@ async def create_device(
 
 
 @app.get("/api/devices/{device_id}", response_model=schemas.Device)
-async def get_device(device_id: str, db: Session = Depends(database.get_db)):
+async def get_device(device_id: str, db: AsyncSession = Depends(database.get_async_read_db)):
     """Gibt ein Gerät anhand seiner ID zurück."""
-    db_device = crud.get_device_by_device_id(db, device_id=device_id)
+    db_device = await crud_async.get_device_by_device_id(db, device_id=device_id)
     if db_device is None:
         raise HTTPException(status_code=404, detail="Gerät nicht gefunden")
     return db_device
@@ -287,38 +450,94 @@ async def delete_device(device_id: str, db: Session = Depends(database.get_db)):
     if db_device is None:
         raise HTTPException(status_code=404, detail="Gerät nicht gefunden")
     crud.delete_device(db=db, device_id=device_id)
+    offline_detector.forget(device_id)
+    alert_engine.forget(device_id)
     return {"status": "success", "message": f"Gerät {device_id} wurde gelöscht"}
 
 
-@app.post("/api/devices/{device_id}/data", response_model=schemas.SensorData)
-async def create_sensor_data(
-    device_id: str, 
-    data: schemas.SensorDataCreate, 
-    db: Session = Depends(database.get_db)
-):
-    """Speichert neue Sensordaten für ein Gerät."""
-    db_device = crud.get_device_by_device_id(db, device_id=device_id)
+async def ingest_sensor_data(db: AsyncSession, device_id: str, data: schemas.SensorDataCreate):
+    """
+    Speichert eine Messung, aktualisiert den Gerätestatus und wertet die Alarmregeln aus.
+
+    Messung, Gerätestatus und Alarme landen in einem Commit; danach werden
+    Meldefrist, Status, Alarme und Messwerte veröffentlicht.
+
+    Returns:
+        Tuple: (Gerät, gespeicherte Sensordaten)
+    """
+    db_device = await crud_async.get_device_by_device_id(db, device_id=device_id)
     if db_device is None:
-        # Kein Fehler zurückgeben, stattdessen nur speichern
-        logger.warning(f"Sensordaten für unbekanntes Gerät {device_id} empfangen")
-        # Gerät automatisch erstellen
-        device = schemas.DeviceCreate(
+        # Automatisch Gerät erstellen, wenn es nicht existiert
+        device_create = schemas.DeviceCreate(
             device_id=device_id,
-            name=f"Auto: {device_id}",
-            type="unknown",
-            status="online"
+            name=f"Automatisch erstellt: {device_id}",
+            type="standard"
         )
-        db_device = crud.create_device(db=db, device=device)
-        logger.info(f"Gerät {device_id} automatisch erstellt")
+        db_device = await crud_async.create_device(db=db, device=device_create)
+    
+    # Sensordaten speichern und Gerätestatus im selben Commit aktualisieren
+    sensor_data = await crud_async.create_sensor_data(
+        db=db, 
+        sensor_data=data, 
+        device_id=db_device.id,
+        commit=False
+    )
+    was_offline = db_device.status == "offline"
+    db_device.status = "online"
+    db_device.last_seen = datetime.now()
+    
+    # Alarmregeln inkrementell auswerten und Alarme im selben Commit speichern
+    timestamp = sensor_data.timestamp.timestamp()
+    alert_events = alert_engine.evaluate(device_id, data.dict(), timestamp)
+    await crud_async.apply_alert_events(db, alert_events)
+    await db.commit()
+    
+    # Meldefrist des Geräts ab Eingang beim Server verschieben (O(1) im Timing Wheel);
+    # der Zeitstempel der Messung gilt nur für die Alarmauswertung
+    offline_detector.heartbeat(
+        device_id, report_interval=report_interval_of(db_device.configuration)
+    )
+    if was_offline:
+        await publish_device_status(device_id, "online")
+    await publish_alert_events(alert_events)
+    
+    # MQTT-Nachricht veröffentlichen
+    if mqtt_client and mqtt_client.is_connected():
+        topic = f"swissairdry/{device_id}/data"
+        payload = {
+            "device_id": device_id,
+            "timestamp": sensor_data.timestamp.isoformat(),
+            "temperature": sensor_data.temperature,
+            "humidity": sensor_data.humidity,
+            "power": sensor_data.power,
+            "energy": sensor_data.energy,
+            "relay_state": sensor_data.relay_state,
+            "runtime": sensor_data.runtime
+        }
+        try:
+            await mqtt_client.publish(topic, payload)
+        except Exception as e:
+            logger.error(f"Fehler beim Veröffentlichen der MQTT-Nachricht: {e}")
     
-    return crud.create_sensor_data(db=db, device_id=device_id, data=data)
+    return db_device, sensor_data
+
+
+@app.post("/api/devices/{device_id}/data", response_model=schemas.SensorData)
+async def create_device_sensor_data(
+    device_id: str, 
+    data: schemas.SensorDataCreate, 
+    db: AsyncSession = Depends(database.get_async_db)
+):
+    """Speichert neue Sensordaten für ein Gerät und gibt den gespeicherten Datensatz zurück."""
+    _, sensor_data = await ingest_sensor_data(db, device_id, data)
+    return sensor_data
 
 
 @app.get("/api/devices/{device_id}/data", response_model=List[schemas.SensorData])
 async def get_sensor_data(
     device_id: str, 
     limit: int = 100, 
-    db: Session = Depends(database.get_db)
+    db: Session = Depends(database.get_read_db)
 ):
     """Gibt die Sensordaten eines Geräts zurück."""
     db_device = crud.get_device_by_device_id(db, device_id=device_id)
@@ -438,6 +657,8 @@ async def health_check():
         "version": "1.0.0",
         "uptime": (datetime.now() - server_start_time).total_seconds(),
         "stats": api_stats,
+        "database_pool": database.get_pool_status(),
+        "circuit_breakers": circuit_breaker.breaker_states(),
     }
 
 
@@ -548,11 +769,12 @@ async def api_documentation():
 async def get_devices(
     skip: int = 0, 
     limit: int = 100, 
-    db: Session = Depends(database.get_db)
+    db: AsyncSession = Depends(database.get_async_read_db)
 ):
     """Gibt eine Liste aller Geräte zurück."""
-    devices = crud.get_devices(db, skip=skip, limit=limit)
-    return devices
+    # Schneller Pfad: Spalten-Tupel direkt serialisieren statt ORM-Objekte zu validieren
+    columns, rows = await crud_async.get_device_rows(db, skip=skip, limit=limit)
+    return rows_response(columns, rows)
 
 
 @app.post("/api/devices", response_model=schemas.Device)
@@ -571,9 +793,9 @@ async def create_device(
 
 
 @app.get("/api/devices/{device_id}", response_model=schemas.Device)
-async def get_device(device_id: str, db: Session = Depends(database.get_db)):
+async def get_device(device_id: str, db: AsyncSession = Depends(database.get_async_read_db)):
     """Gibt ein Gerät anhand seiner ID zurück."""
-    db_device = crud.get_device_by_device_id(db, device_id=device_id)
+    db_device = await crud_async.get_device_by_device_id(db, device_id=device_id)
     if db_device is None:
         raise HTTPException(status_code=404, detail="Gerät nicht gefunden")
     return db_device
@@ -599,6 +821,8 @@ async def delete_device(device_id: str, db: Session = Depends(database.get_db)):
     if db_device is None:
         raise HTTPException(status_code=404, detail="Gerät nicht gefunden")
     crud.delete_device(db=db, device_id=device_id)
+    offline_detector.forget(device_id)
+    alert_engine.forget(device_id)
     return {"message": f"Gerät {device_id} gelöscht"}
 
 
@@ -606,50 +830,10 @@ async def delete_device(device_id: str, db: Session = Depends(database.get_db)):
 async def create_sensor_data(
     device_id: str, 
     data: schemas.SensorDataCreate, 
-    db: Session = Depends(database.get_db)
+    db: AsyncSession = Depends(database.get_async_db)
 ):
     """Speichert neue Sensordaten für ein Gerät."""
-    db_device = crud.get_device_by_device_id(db, device_id=device_id)
-    if db_device is None:
-        # Automatisch Gerät erstellen, wenn es nicht existiert
-        device_create = schemas.DeviceCreate(
-            device_id=device_id,
-            name=f"Automatisch erstellt: {device_id}",
-            type="standard"
-        )
-        db_device = crud.create_device(db=db, device=device_create)
-    
-    # Sensordaten speichern
-    sensor_data = crud.create_sensor_data(
-        db=db, 
-        sensor_data=data, 
-        device_id=db_device.id
-    )
-    
-    # MQTT-Nachricht veröffentlichen
-    if mqtt_client and mqtt_client.is_connected():
-        topic = f"swissairdry/{device_id}/data"
-        payload = {
-            "device_id": device_id,
-            "timestamp": sensor_data.timestamp.isoformat(),
-            "temperature": sensor_data.temperature,
-            "humidity": sensor_data.humidity,
-            "power": sensor_data.power,
-            "energy": sensor_data.energy,
-            "relay_state": sensor_data.relay_state,
-            "runtime": sensor_data.runtime
-        }
-        try:
-            await mqtt_client.publish(topic, payload)
-        except Exception as e:
-            logger.error(f"Fehler beim Veröffentlichen der MQTT-Nachricht: {e}")
-    
-    # Gerätstatus aktualisieren
-    update_data = {
-        "status": "online",
-        "last_seen": datetime.now()
-    }
-    crud.update_device(db=db, device_id=device_id, device=schemas.DeviceUpdate(**update_data))
+    db_device, _ = await ingest_sensor_data(db, device_id, data)
     
     # Antwort mit möglichen Steuerbefehlen
     response = {"status": "ok"}
@@ -666,19 +850,44 @@ async def create_sensor_data(
 async def get_sensor_data(
     device_id: str, 
     limit: int = 100, 
-    db: Session = Depends(database.get_db)
+    db: AsyncSession = Depends(database.get_async_read_db)
 ):
     """Gibt die Sensordaten eines Geräts zurück."""
-    db_device = crud.get_device_by_device_id(db, device_id=device_id)
+    db_device = await crud_async.get_device_by_device_id(db, device_id=device_id)
     if db_device is None:
         raise HTTPException(status_code=404, detail="Gerät nicht gefunden")
     
-    sensor_data = crud.get_sensor_data_by_device(
+    # Schneller Pfad: Spalten-Tupel direkt serialisieren statt ORM-Objekte zu validieren
+    columns, rows = await crud_async.get_sensor_data_rows_by_device(
         db=db, 
         device_id=db_device.id, 
         limit=limit
     )
-    return sensor_data
+    return rows_response(columns, rows)
+
+
+@app.get("/api/alerts", response_model=List[schemas.Alert])
+async def get_alerts(
+    device_id: Optional[str] = None,
+    active_only: bool = True,
+    limit: int = 100,
+    db: AsyncSession = Depends(database.get_async_read_db)
+):
+    """Gibt Alarme zurück, standardmäßig nur aktive."""
+    return await crud_async.get_alerts(db, device_id=device_id, active_only=active_only, limit=limit)
+
+
+@app.post("/api/alerts/{alert_id}/acknowledge", response_model=schemas.Alert)
+async def acknowledge_alert(
+    alert_id: int,
+    user_id: Optional[int] = None,
+    db: AsyncSession = Depends(database.get_async_db)
+):
+    """Bestätigt einen Alarm."""
+    db_alert = await crud_async.acknowledge_alert(db, alert_id, user_id)
+    if db_alert is None:
+        raise HTTPException(status_code=404, detail="Alarm nicht gefunden")
+    return db_alert
 
 
 @app.post("/api/device/{device_id}/command", response_model=schemas.Message)
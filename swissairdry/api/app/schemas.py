@@ -248,7 +248,7 @@ class User(UserBase):
 
 class AlertBase(BaseModel):
     """Basis-Schema für Warnungen"""
-    device_id: int
+    device_id: str
     alert_type: str
     message: str
     value: Optional[float] = None
@@ -268,6 +268,7 @@ class Alert(AlertBase):
     acknowledged_by: Optional[int] = None
     created_at: datetime
     updated_at: Optional[datetime] = None
+    resolved_at: Optional[datetime] = None
 
     model_config = {"from_attributes": True}
 
@@ -15,6 +15,8 @@ import logging
 import requests
 from typing import Dict, Any, Optional, Tuple, List, Union
 
+from swissairdry.api.app.circuit_breaker import CircuitOpenError, http_request
+
 # Logger konfigurieren
 logger = logging.getLogger("swissairdry_api")
 
@@ -136,10 +138,10 @@ def check_api_availability(url: str, timeout: int = 5) -> bool:
         bool: True, wenn die API verfügbar ist, sonst False
     """
     try:
-        response = requests.get(url, timeout=timeout)
+        response = http_request("GET", url, retries=0, timeout=timeout)
         response.raise_for_status()
         return True
-    except requests.RequestException as e:
+    except (requests.RequestException, CircuitOpenError) as e:
         logger.warning(f"API unter {url} nicht verfügbar: {str(e)}")
         return False
 
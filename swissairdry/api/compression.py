@@ -0,0 +1,299 @@
+"""
+SwissAirDry API - Antwortkomprimierung
+
+ASGI-Middleware zur Gzip/Brotli-Komprimierung von API-Antworten. Sensorverläufe,
+Exporte und Dashboard-Daten bestehen größtenteils aus JSON und lassen sich gut
+komprimieren, was auf LTE-Verbindungen an Kundenstandorten viel Bandbreite spart.
+
+Gestreamte Antworten (z.B. StreamingResponse-Exporte) werden Chunk für Chunk
+komprimiert und sofort weitergereicht, ohne die Antwort im Speicher zu puffern.
+
+@author Swiss Air Dry Team <info@swissairdry.com>
+@copyright 2023-2025 Swiss Air Dry Team
+"""
+
+import os
+import zlib
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+# Brotli ist optional, ohne das Paket wird nur Gzip angeboten
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Standardwerte, über Umgebungsvariablen anpassbar
+DEFAULT_MINIMUM_SIZE = 1024  # Bytes, kleinere Antworten werden nicht komprimiert
+DEFAULT_GZIP_LEVEL = 6
+DEFAULT_BROTLI_QUALITY = 4  # Guter Kompromiss zwischen CPU-Last und Kompressionsrate
+DEFAULT_CONTENT_TYPES = (
+    "application/json",
+    "application/javascript",
+    "application/xml",
+    "image/svg+xml",
+    "text/html",
+    "text/plain",
+    "text/css",
+    "text/csv",
+    "text/javascript",
+    "text/xml",
+)
+
+# Statuscodes ohne Antwortkörper
+_NO_BODY_STATUS = {204, 304}
+
+
+class _GzipCompressor:
+    """Inkrementeller Gzip-Kompressor"""
+
+    def __init__(self, level: int):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        # Sync-Flush, damit jeder Chunk sofort beim Client ankommt
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data: bytes = b"") -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_FINISH)
+
+
+class _BrotliCompressor:
+    """Inkrementeller Brotli-Kompressor"""
+
+    def __init__(self, quality: int):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data) + self._compressor.flush()
+
+    def finish(self, data: bytes = b"") -> bytes:
+        return self._compressor.process(data) + self._compressor.finish()
+
+
+def _parse_accept_encoding(value: str) -> Dict[str, float]:
+    """
+    Zerlegt einen Accept-Encoding-Header in Kodierungen mit ihren q-Werten.
+
+    Args:
+        value: Inhalt des Accept-Encoding-Headers
+
+    Returns:
+        Dict: Kodierung -> q-Wert
+    """
+    result = {}
+    for part in value.split(","):
+        items = part.strip().split(";")
+        coding = items[0].strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in items[1:]:
+            name, _, param_value = param.strip().partition("=")
+            if name.strip() == "q":
+                try:
+                    quality = float(param_value)
+                except ValueError:
+                    quality = 0.0
+        result[coding] = quality
+    return result
+
+
+class CompressionMiddleware:
+    """
+    ASGI-Middleware für Gzip- und Brotli-Komprimierung.
+
+    Komprimiert werden nur Antworten, deren Content-Type in der Allowlist steht,
+    die noch keine Content-Encoding besitzen und die mindestens minimum_size
+    Bytes groß sind. Bei gestreamten Antworten ist die Größe vorab unbekannt,
+    sie werden daher immer komprimiert.
+    """
+
+    def __init__(
+        self,
+        app: Callable,
+        minimum_size: int = DEFAULT_MINIMUM_SIZE,
+        gzip_level: int = DEFAULT_GZIP_LEVEL,
+        brotli_quality: int = DEFAULT_BROTLI_QUALITY,
+        content_types: Iterable[str] = DEFAULT_CONTENT_TYPES,
+    ):
+        """
+        Initialisiert die Middleware.
+
+        Args:
+            app: Die zu umschließende ASGI-Anwendung
+            minimum_size: Minimale Antwortgröße in Bytes für die Komprimierung
+            gzip_level: Gzip-Kompressionsstufe (1-9)
+            brotli_quality: Brotli-Qualitätsstufe (0-11)
+            content_types: Content-Types, die komprimiert werden dürfen
+        """
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.content_types = tuple(ct.strip().lower() for ct in content_types if ct.strip())
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable, send: Callable) -> None:
+        if scope["type"] != "http" or scope.get("method") == "HEAD":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = self._select_encoding(scope)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        responder = _CompressionResponder(self, encoding, send)
+        await self.app(scope, receive, responder.send)
+
+    def _select_encoding(self, scope: Dict[str, Any]) -> Optional[str]:
+        """Wählt die beste vom Client akzeptierte Kodierung aus."""
+        for name, value in scope.get("headers", []):
+            if name == b"accept-encoding":
+                accepted = _parse_accept_encoding(value.decode("latin-1"))
+                break
+        else:
+            return None
+
+        if brotli is not None and accepted.get("br", 0) > 0:
+            return "br"
+        if accepted.get("gzip", accepted.get("*", 0)) > 0:
+            return "gzip"
+        return None
+
+    def is_compressible(self, content_type: str) -> bool:
+        """Prüft, ob ein Content-Type in der Allowlist steht."""
+        media_type = content_type.split(";", 1)[0].strip().lower()
+        return media_type in self.content_types
+
+    def create_compressor(self, encoding: str):
+        """Erstellt einen Kompressor für die gewählte Kodierung."""
+        if encoding == "br":
+            return _BrotliCompressor(self.brotli_quality)
+        return _GzipCompressor(self.gzip_level)
+
+
+class _CompressionResponder:
+    """Verarbeitet die ASGI-Nachrichten einer einzelnen Antwort."""
+
+    def __init__(self, middleware: CompressionMiddleware, encoding: str, send: Callable):
+        self.middleware = middleware
+        self.encoding = encoding
+        self._send = send
+        self._start_message: Optional[Dict[str, Any]] = None
+        self._compressor = None
+        self._passthrough = False
+
+    async def send(self, message: Dict[str, Any]) -> None:
+        message_type = message["type"]
+
+        if message_type == "http.response.start":
+            # Start-Nachricht zurückhalten, bis der erste Body-Chunk bekannt ist
+            self._start_message = message
+            return
+
+        if message_type != "http.response.body" or self._passthrough:
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self._start_message is not None:
+            start = self._start_message
+            self._start_message = None
+
+            if not self._should_compress(start, body, more_body):
+                self._passthrough = True
+                await self._send(start)
+                await self._send(message)
+                return
+
+            self._compressor = self.middleware.create_compressor(self.encoding)
+            headers = self._compressed_headers(start["headers"])
+
+            if not more_body:
+                # Vollständige Antwort in einem Stück
+                body = self._compressor.finish(body)
+                headers.append((b"content-length", str(len(body)).encode("latin-1")))
+                await self._send({**start, "headers": headers})
+                await self._send({"type": "http.response.body", "body": body})
+                return
+
+            # Gestreamte Antwort: Länge ist unbekannt, jeder Chunk wird sofort weitergereicht
+            await self._send({**start, "headers": headers})
+
+        if more_body:
+            chunk = self._compressor.compress(body)
+            if chunk:
+                await self._send({"type": "http.response.body", "body": chunk, "more_body": True})
+        else:
+            await self._send({"type": "http.response.body", "body": self._compressor.finish(body)})
+
+    def _should_compress(self, start: Dict[str, Any], body: bytes, more_body: bool) -> bool:
+        """Entscheidet anhand von Status, Headern und Größe über die Komprimierung."""
+        if start.get("status") in _NO_BODY_STATUS:
+            return False
+
+        content_type = ""
+        for name, value in start.get("headers", []):
+            name = name.lower()
+            if name == b"content-encoding":
+                return False
+            if name == b"content-type":
+                content_type = value.decode("latin-1")
+
+        if not self.middleware.is_compressible(content_type):
+            return False
+
+        return more_body or len(body) >= self.middleware.minimum_size
+
+    def _compressed_headers(
+        self, headers: Iterable[Tuple[bytes, bytes]]
+    ) -> List[Tuple[bytes, bytes]]:
+        """Entfernt Content-Length und ergänzt Content-Encoding und Vary."""
+        result = []
+        vary = None
+        for name, value in headers:
+            lower = name.lower()
+            if lower == b"content-length":
+                continue
+            if lower == b"vary":
+                vary = value
+                continue
+            result.append((name, value))
+
+        if vary is None:
+            vary = b"Accept-Encoding"
+        elif b"accept-encoding" not in vary.lower():
+            vary = vary + b", Accept-Encoding"
+
+        result.append((b"vary", vary))
+        result.append((b"content-encoding", self.encoding.encode("latin-1")))
+        return result
+
+
+def add_compression(app: Any) -> None:
+    """
+    Registriert die Komprimierungs-Middleware anhand der Umgebungsvariablen.
+
+    Unterstützte Variablen:
+        COMPRESSION_ENABLED: "false" deaktiviert die Komprimierung
+        COMPRESSION_MIN_SIZE: Minimale Antwortgröße in Bytes
+        COMPRESSION_GZIP_LEVEL: Gzip-Kompressionsstufe (1-9)
+        COMPRESSION_BROTLI_QUALITY: Brotli-Qualitätsstufe (0-11)
+        COMPRESSION_CONTENT_TYPES: Kommagetrennte Liste komprimierbarer Content-Types
+
+    Args:
+        app: FastAPI- bzw. Starlette-Anwendung
+    """
+    if os.getenv("COMPRESSION_ENABLED", "true").lower() == "false":
+        return
+
+    content_types = os.getenv("COMPRESSION_CONTENT_TYPES")
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=int(os.getenv("COMPRESSION_MIN_SIZE", str(DEFAULT_MINIMUM_SIZE))),
+        gzip_level=int(os.getenv("COMPRESSION_GZIP_LEVEL", str(DEFAULT_GZIP_LEVEL))),
+        brotli_quality=int(os.getenv("COMPRESSION_BROTLI_QUALITY", str(DEFAULT_BROTLI_QUALITY))),
+        content_types=content_types.split(",") if content_types else DEFAULT_CONTENT_TYPES,
+    )
@@ -0,0 +1,336 @@
+"""
+SwissAirDry Sensordaten-Ringpuffer
+----------------------------------
+
+Speichert die letzten Messwerte jedes Geräts spaltenweise in kompakten
+array-Strukturen: ein Zeitstempel (Epoch-Sekunden) und ein float64-Wert pro
+Metrik und Messung. Ein Datenpunkt belegt so rund 60 Byte statt mehrerer
+hundert Byte als Dictionary mit ISO-Zeitstempel, womit auch kleine
+Edge-Geräte mehrere Tage Verlauf für Hunderte von Trocknern halten können.
+Die Arrays beginnen klein und wachsen bei Bedarf durch Verdoppeln bis zur
+Kapazität, sodass ein Gerät mit wenigen Messungen nur wenig Speicher belegt.
+
+Fehlende Werte werden als NaN gespeichert. Auswertungen über Zeitfenster
+(Minimum, Maximum, Mittelwert) laufen mit NumPy vektorisiert, ohne NumPy
+über eine einfache Schleife.
+
+@author Swiss Air Dry Team <info@swissairdry.com>
+@copyright 2023-2025 Swiss Air Dry Team
+"""
+
+import math
+import time
+from array import array
+from datetime import datetime
+from typing import Dict, List, Optional, Any, Iterable
+
+# NumPy ist optional und beschleunigt nur die Auswertungen
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Numerische Metriken der Sensordaten
+METRICS = ("temperature", "humidity", "power", "energy", "runtime")
+
+NAN = float("nan")
+
+# Anfangsgröße der Spalten-Arrays eines neuen Ringpuffers
+INITIAL_ALLOCATION = 16
+
+
+class SensorSeries:
+    """Ringpuffer mit fester Höchstkapazität für die Messwerte eines Geräts"""
+
+    def __init__(self, capacity: int, metrics: Iterable[str] = METRICS):
+        """
+        Initialisiert den Ringpuffer.
+
+        Args:
+            capacity: Maximale Anzahl an Messungen
+            metrics: Namen der numerischen Metriken
+        """
+        self.capacity = max(1, capacity)
+        self.metrics = tuple(metrics)
+        allocated = min(self.capacity, INITIAL_ALLOCATION)
+        self.timestamps = array("d", [0.0]) * allocated
+        self.columns = {metric: array("d", [NAN]) * allocated for metric in self.metrics}
+        # Relaiszustand: 1 = an, 0 = aus, -1 = unbekannt
+        self.relay_state = array("b", [-1]) * allocated
+        self._next = 0  # Nächste Schreibposition
+        self._size = 0
+        # Änderungszähler, ungerade während append() schreibt (für ordered_buffers())
+        self._version = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def next_index(self) -> int:
+        """Nächste Schreibposition im Puffer."""
+        return self._next
+
+    def append(self, values: Dict[str, Any], timestamp: Optional[float] = None) -> None:
+        """
+        Fügt eine Messung hinzu und überschreibt bei voller Kapazität die älteste.
+
+        Args:
+            values: Messwerte (Metrik -> Wert, fehlende Werte sind erlaubt)
+            timestamp: Zeitpunkt in Epoch-Sekunden (Standard: jetzt)
+        """
+        self._version += 1
+        try:
+            index = self._next
+            if index == len(self.timestamps):
+                self._grow()
+            self.timestamps[index] = time.time() if timestamp is None else timestamp
+            for metric, column in self.columns.items():
+                value = values.get(metric)
+                column[index] = NAN if value is None else float(value)
+            relay = values.get("relay_state")
+            self.relay_state[index] = -1 if relay is None else int(bool(relay))
+
+            self._next = (index + 1) % self.capacity
+            if self._size < self.capacity:
+                self._size += 1
+        finally:
+            self._version += 1
+
+    def _grow(self) -> None:
+        """
+        Verdoppelt die Spalten-Arrays, höchstens bis zur Kapazität.
+
+        Solange die Arrays kleiner als die Kapazität sind, ist der Puffer noch
+        nicht umgelaufen, die neuen Einträge werden also hinten angehängt.
+        """
+        extra = min(max(1, len(self.timestamps)), self.capacity - len(self.timestamps))
+        self.timestamps.extend(array("d", [0.0]) * extra)
+        for column in self.columns.values():
+            column.extend(array("d", [NAN]) * extra)
+        self.relay_state.extend(array("b", [-1]) * extra)
+
+    def _indices(self, limit: Optional[int] = None) -> List[int]:
+        """Gibt die Pufferpositionen der letzten limit Messungen, älteste zuerst, zurück."""
+        count = self._size if limit is None else min(limit, self._size)
+        start = (self._next - count) % self.capacity
+        return [(start + i) % self.capacity for i in range(count)]
+
+    def records(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Gibt die letzten Messungen als Dictionaries zurück, älteste zuerst.
+
+        Args:
+            limit: Maximale Anzahl an Messungen
+
+        Returns:
+            List[Dict]: Messungen mit ISO-Zeitstempel
+        """
+        result = []
+        for index in self._indices(limit):
+            record = {"timestamp": datetime.fromtimestamp(self.timestamps[index]).isoformat()}
+            for metric, column in self.columns.items():
+                value = column[index]
+                record[metric] = None if math.isnan(value) else value
+            relay = self.relay_state[index]
+            record["relay_state"] = None if relay < 0 else bool(relay)
+            if record.get("runtime") is not None:
+                record["runtime"] = int(record["runtime"])
+            result.append(record)
+        return result
+
+    def _ordered(self, column: array):
+        """Gibt eine Spalte in zeitlicher Reihenfolge als NumPy-Array zurück."""
+        data = np.frombuffer(column, dtype=np.float64)
+        if self._size < self.capacity:
+            return data[:self._size]
+        return np.roll(data, -self._next)
+
+    def stats(
+        self,
+        start: Optional[float] = None,
+        end: Optional[float] = None,
+        metrics: Optional[Iterable[str]] = None,
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        Berechnet Minimum, Maximum und Mittelwert je Metrik im Zeitfenster.
+
+        Args:
+            start: Beginn des Fensters in Epoch-Sekunden (einschließlich)
+            end: Ende des Fensters in Epoch-Sekunden (einschließlich)
+            metrics: Auszuwertende Metriken (Standard: alle)
+
+        Returns:
+            Dict: Metrik -> {"min", "max", "mean", "count"}
+        """
+        metrics = [metric for metric in (metrics or self.metrics) if metric in self.columns]
+        if np is not None:
+            return self._stats_numpy(start, end, metrics)
+
+        indices = [
+            index for index in self._indices()
+            if (start is None or self.timestamps[index] >= start)
+            and (end is None or self.timestamps[index] <= end)
+        ]
+        result = {}
+        for metric in metrics:
+            column = self.columns[metric]
+            values = [column[index] for index in indices if not math.isnan(column[index])]
+            result[metric] = {
+                "min": min(values) if values else None,
+                "max": max(values) if values else None,
+                "mean": sum(values) / len(values) if values else None,
+                "count": len(values),
+            }
+        return result
+
+    def _stats_numpy(self, start, end, metrics: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Vektorisierte Variante von stats()."""
+        timestamps = self._ordered(self.timestamps)
+        # Zeitstempel sind aufsteigend sortiert, das Fenster per Binärsuche bestimmen
+        lower = 0 if start is None else int(np.searchsorted(timestamps, start, side="left"))
+        upper = (len(timestamps) if end is None
+                 else int(np.searchsorted(timestamps, end, side="right")))
+
+        result = {}
+        for metric in metrics:
+            values = self._ordered(self.columns[metric])[lower:upper]
+            values = values[~np.isnan(values)]
+            if values.size:
+                result[metric] = {
+                    "min": float(values.min()),
+                    "max": float(values.max()),
+                    "mean": float(values.mean()),
+                    "count": int(values.size),
+                }
+            else:
+                result[metric] = {"min": None, "max": None, "mean": None, "count": 0}
+        return result
+
+    def buffers(self) -> List[array]:
+        """Gibt alle Spalten-Arrays in fester Reihenfolge zurück (für Snapshots)."""
+        columns = [self.columns[metric] for metric in self.metrics]
+        return [self.timestamps] + columns + [self.relay_state]
+
+    def ordered_buffers(self) -> List[array]:
+        """
+        Kopiert die belegten Einträge aller Spalten, älteste zuerst (für Snapshots).
+
+        Darf aus einem anderen Thread als append() aufgerufen werden: Wird der
+        Puffer während der Kopie verändert, wird sie wiederholt.
+        """
+        while True:
+            version = self._version
+            if version % 2 == 0:
+                size = self._size
+                start = self._next if size == self.capacity else 0
+                copies = [buffer[start:size] + buffer[:start] for buffer in self.buffers()]
+                if self._version == version:
+                    return copies
+            time.sleep(0)
+
+    @classmethod
+    def from_buffers(
+        cls,
+        capacity: int,
+        metrics: Iterable[str],
+        next_index: int,
+        size: int,
+        buffers: List[array],
+    ) -> "SensorSeries":
+        """
+        Erstellt einen Ringpuffer aus gespeicherten Spalten-Arrays.
+
+        Args:
+            capacity: Kapazität des Ringpuffers
+            metrics: Namen der Metriken in der Reihenfolge der Arrays
+            next_index: Nächste Schreibposition
+            size: Anzahl belegter Einträge
+            buffers: Arrays in der Reihenfolge von buffers() (höchstens capacity Einträge)
+
+        Returns:
+            SensorSeries: Wiederhergestellter Ringpuffer
+        """
+        series = cls.__new__(cls)
+        series.capacity = capacity
+        series.metrics = tuple(metrics)
+        series.timestamps = buffers[0]
+        series.columns = dict(zip(series.metrics, buffers[1:-1]))
+        series.relay_state = buffers[-1]
+        series._next = next_index
+        series._size = size
+        series._version = 0
+        return series
+
+    def resized(self, capacity: int) -> "SensorSeries":
+        """Gibt eine Kopie mit anderer Kapazität und den neuesten Messungen zurück."""
+        series = SensorSeries(capacity, self.metrics)
+        for index in self._indices(capacity):
+            target = series._next
+            if target == len(series.timestamps):
+                series._grow()
+            series.timestamps[target] = self.timestamps[index]
+            for metric, column in self.columns.items():
+                series.columns[metric][target] = column[index]
+            series.relay_state[target] = self.relay_state[index]
+            series._next = (target + 1) % series.capacity
+            series._size = min(series._size + 1, series.capacity)
+        return series
+
+    def memory_usage(self) -> int:
+        """Gibt den belegten Speicher der Puffer in Byte zurück."""
+        size = self.timestamps.buffer_info()[1] * self.timestamps.itemsize
+        size += sum(column.buffer_info()[1] * column.itemsize for column in self.columns.values())
+        size += self.relay_state.buffer_info()[1] * self.relay_state.itemsize
+        return size
+
+
+class SensorStore:
+    """Verwaltet die Ringpuffer aller Geräte"""
+
+    def __init__(self, capacity: int = 10080, metrics: Iterable[str] = METRICS):
+        """
+        Initialisiert den Speicher.
+
+        Args:
+            capacity: Maximale Anzahl an Messungen pro Gerät
+            metrics: Namen der numerischen Metriken
+        """
+        self.capacity = capacity
+        self.metrics = tuple(metrics)
+        self._series: Dict[str, SensorSeries] = {}
+
+    def __contains__(self, device_id: str) -> bool:
+        return device_id in self._series
+
+    def __len__(self) -> int:
+        return len(self._series)
+
+    def get(self, device_id: str) -> Optional[SensorSeries]:
+        """Gibt den Ringpuffer eines Geräts zurück."""
+        return self._series.get(device_id)
+
+    def append(self, device_id: str, values: Dict[str, Any],
+               timestamp: Optional[float] = None) -> None:
+        """Fügt eine Messung für ein Gerät hinzu und legt den Puffer bei Bedarf an."""
+        series = self._series.get(device_id)
+        if series is None:
+            series = self._series[device_id] = SensorSeries(self.capacity, self.metrics)
+        series.append(values, timestamp)
+
+    def items(self):
+        """Gibt alle Geräte-IDs mit ihren Ringpuffern zurück."""
+        return self._series.items()
+
+    def add_series(self, device_id: str, series: SensorSeries) -> None:
+        """Übernimmt einen vorhandenen Ringpuffer, z.B. aus einem Snapshot."""
+        if series.capacity != self.capacity:
+            series = series.resized(self.capacity)
+        self._series[device_id] = series
+
+    def remove(self, device_id: str) -> None:
+        """Entfernt den Ringpuffer eines Geräts."""
+        self._series.pop(device_id, None)
+
+    def memory_usage(self) -> int:
+        """Gibt den belegten Speicher aller Puffer in Byte zurück."""
+        return sum(series.memory_usage() for series in self._series.values())
@@ -16,6 +16,9 @@ import time
 import random
 import string
 import socket
+import contextlib
+import copy
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from typing import Dict, Any, List, Optional
 
@@ -26,6 +29,16 @@ from fastapi.templating import Jinja2Templates
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 
+# Komprimierungs-Middleware und Sensordaten-Speicher importieren
+try:
+    from compression import add_compression
+    from sensor_store import SensorStore
+    from state_snapshot import dump_snapshot, load_snapshot
+except ImportError:
+    from swissairdry.api.compression import add_compression
+    from swissairdry.api.sensor_store import SensorStore
+    from swissairdry.api.state_snapshot import dump_snapshot, load_snapshot
+
 # Eigene MQTT-Client-Klasse importieren
 try:
     from mqtt_client import MQTTClient
@@ -50,6 +63,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Gzip/Brotli-Komprimierung für größere JSON-Antworten
+add_compression(app)
+
 # Templates und statische Dateien einrichten
 current_dir = os.path.dirname(os.path.abspath(__file__))
 templates_dir = os.path.join(current_dir, "app", "templates")
@@ -63,9 +79,19 @@ else:
     templates = None
     print(f"Warnung: Verzeichnis {templates_dir} nicht gefunden")
 
-# Simulierte Daten für die API
-devices = [
-    {
+# Maximale Anzahl gespeicherter Datenpunkte pro Gerät (Standard: eine Woche
+# bei einer Messung pro Minute, rund 60 Byte pro Datenpunkt)
+SENSOR_DATA_HISTORY = int(os.getenv("SIMPLE_API_SENSOR_HISTORY", "10080"))
+# Maximale Anzahl an Datenpunkten pro Abfrage von /api/device/{id}/data
+SENSOR_DATA_PAGE = 1000
+
+# Snapshots des In-Memory-Zustands (Intervall 0 deaktiviert die Snapshots)
+SNAPSHOT_PATH = os.getenv("SIMPLE_API_SNAPSHOT_PATH", "simple_api_state.bin")
+SNAPSHOT_INTERVAL = float(os.getenv("SIMPLE_API_SNAPSHOT_INTERVAL", "60"))  # Sekunden
+
+# Simulierte Daten für die API, nach Geräte-ID indiziert
+devices = {
+    "device001": {
         "id": 1,
         "device_id": "device001",
         "name": "Luftentfeuchter 1",
@@ -74,7 +100,7 @@ devices = [
         "last_seen": datetime.now().isoformat(),
         "created_at": datetime.now().isoformat(),
     },
-    {
+    "device002": {
         "id": 2,
         "device_id": "device002",
         "name": "Luftentfeuchter 2",
@@ -83,34 +109,27 @@ devices = [
         "last_seen": datetime.now().isoformat(),
         "created_at": datetime.now().isoformat(),
     }
-]
-
-# Sensordaten für die Geräte
-sensor_data = {
-    "device001": [
-        {
-            "timestamp": datetime.now().isoformat(),
-            "temperature": 22.5,
-            "humidity": 65.8,
-            "power": 450.0,
-            "energy": 12.5,
-            "relay_state": True,
-            "runtime": 3600
-        }
-    ],
-    "device002": [
-        {
-            "timestamp": datetime.now().isoformat(),
-            "temperature": 21.0,
-            "humidity": 70.2,
-            "power": 0.0,
-            "energy": 8.3,
-            "relay_state": False,
-            "runtime": 7200
-        }
-    ]
 }
 
+# Sensordaten für die Geräte als spaltenweiser Ringpuffer fester Größe
+sensor_data = SensorStore(capacity=SENSOR_DATA_HISTORY)
+sensor_data.append("device001", {
+    "temperature": 22.5,
+    "humidity": 65.8,
+    "power": 450.0,
+    "energy": 12.5,
+    "relay_state": True,
+    "runtime": 3600
+})
+sensor_data.append("device002", {
+    "temperature": 21.0,
+    "humidity": 70.2,
+    "power": 0.0,
+    "energy": 8.3,
+    "relay_state": False,
+    "runtime": 7200
+})
+
 # Status-Variablen
 server_start_time = datetime.now()
 api_stats = {
@@ -122,6 +141,43 @@ api_stats = {
 # MQTT-Client initialisieren
 mqtt_client = None
 
+# Hintergrundaufgabe für die Snapshots
+snapshot_task = None
+# Ein einzelner Schreib-Thread, damit Snapshots in der Reihenfolge ihrer
+# Erstellung geschrieben werden und sich nicht überholen
+snapshot_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="snapshot")
+
+
+def touch_device(device_id: str, name: str) -> Dict[str, Any]:
+    """
+    Markiert ein Gerät als online und legt es bei Bedarf an.
+    
+    Args:
+        device_id: Geräte-ID
+        name: Name für automatisch erstellte Geräte
+        
+    Returns:
+        Dict: Gerätedaten
+    """
+    now = datetime.now().isoformat()
+    device = devices.get(device_id)
+    if device is None:
+        device = {
+            "id": len(devices) + 1,
+            "device_id": device_id,
+            "name": name,
+            "type": "standard",
+            "status": "online",
+            "last_seen": now,
+            "created_at": now,
+        }
+        devices[device_id] = device
+        print(f"Neues Gerät erstellt: {device_id}")
+    else:
+        device["status"] = "online"
+        device["last_seen"] = now
+    return device
+
 
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
@@ -189,32 +245,48 @@ async def health_check():
         "version": "1.0.0",
         "uptime": (datetime.now() - server_start_time).total_seconds(),
         "stats": api_stats,
+        "sensor_data_bytes": sensor_data.memory_usage(),
     }
 
 
 @app.get("/api/devices", response_model=List[Dict[str, Any]])
 async def get_devices():
     """Gibt eine Liste aller Geräte zurück."""
-    return devices
+    return list(devices.values())
 
 
 @app.get("/api/devices/{device_id}", response_model=Dict[str, Any])
 async def get_device(device_id: str):
     """Gibt ein Gerät anhand seiner ID zurück."""
-    for device in devices:
-        if device["device_id"] == device_id:
-            return device
+    device = devices.get(device_id)
+    if device is not None:
+        return device
     return JSONResponse(status_code=404, content={"detail": "Gerät nicht gefunden"})
 
 
 @app.get("/api/device/{device_id}/data", response_model=List[Dict[str, Any]])
-async def get_sensor_data(device_id: str):
-    """Gibt die Sensordaten eines Geräts zurück."""
-    if device_id in sensor_data:
-        return sensor_data[device_id]
+async def get_sensor_data(device_id: str, limit: int = SENSOR_DATA_PAGE):
+    """Gibt die letzten Sensordaten eines Geräts zurück."""
+    series = sensor_data.get(device_id)
+    if series is not None:
+        return series.records(limit)
     return JSONResponse(status_code=404, content={"detail": "Keine Daten für dieses Gerät gefunden"})
 
 
+@app.get("/api/device/{device_id}/stats", response_model=Dict[str, Any])
+async def get_sensor_stats(device_id: str, window: int = 3600):
+    """Gibt Minimum, Maximum und Mittelwert der Sensordaten der letzten window Sekunden zurück."""
+    series = sensor_data.get(device_id)
+    if series is None:
+        return JSONResponse(status_code=404, content={"detail": "Keine Daten für dieses Gerät gefunden"})
+    now = time.time()
+    return {
+        "device_id": device_id,
+        "window": window,
+        "metrics": series.stats(start=now - window, end=now),
+    }
+
+
 class SensorDataCreate(BaseModel):
     """Schema für Sensordaten"""
     temperature: Optional[float] = None
@@ -228,31 +300,11 @@ class SensorDataCreate(BaseModel):
 @app.post("/api/device/{device_id}/data")
 async def create_sensor_data(device_id: str, data: SensorDataCreate):
     """Speichert neue Sensordaten für ein Gerät."""
-    # Prüfen, ob das Gerät existiert
-    device_exists = False
-    for device in devices:
-        if device["device_id"] == device_id:
-            device_exists = True
-            device["status"] = "online"
-            device["last_seen"] = datetime.now().isoformat()
-            break
-    
-    # Wenn das Gerät nicht existiert, automatisch erstellen
-    if not device_exists:
-        new_device = {
-            "id": len(devices) + 1,
-            "device_id": device_id,
-            "name": f"Automatisch erstellt: {device_id}",
-            "type": "standard",
-            "status": "online",
-            "last_seen": datetime.now().isoformat(),
-            "created_at": datetime.now().isoformat(),
-        }
-        devices.append(new_device)
+    # Gerät als online markieren, wenn es nicht existiert automatisch erstellen
+    touch_device(device_id, f"Automatisch erstellt: {device_id}")
     
     # Sensordaten erstellen
     new_data = {
-        "timestamp": datetime.now().isoformat(),
         "temperature": data.temperature,
         "humidity": data.humidity,
         "power": data.power,
@@ -262,10 +314,7 @@ async def create_sensor_data(device_id: str, data: SensorDataCreate):
     }
     
     # Daten hinzufügen
-    if device_id not in sensor_data:
-        sensor_data[device_id] = []
-    
-    sensor_data[device_id].append(new_data)
+    sensor_data.append(device_id, new_data)
     
     return {"status": "ok"}
 
@@ -279,10 +328,15 @@ class DeviceCommand(BaseModel):
 @app.on_event("startup")
 async def startup_event():
     """Wird beim Start der Anwendung aufgerufen."""
-    global mqtt_client
+    global mqtt_client, snapshot_task
     
     print("API-Server wird gestartet...")
     
+    # Zustand aus dem letzten Snapshot wiederherstellen
+    if SNAPSHOT_INTERVAL > 0:
+        restore_snapshot()
+        snapshot_task = asyncio.create_task(snapshot_loop())
+    
     # MQTT-Client initialisieren, wenn MQTTClient und paho.mqtt.client verfügbar sind
     if MQTTClient is not None:
         try:
@@ -310,8 +364,14 @@ async def startup_event():
             
             mqtt_client = MQTTClient(mqtt_host, mqtt_port, mqtt_user, mqtt_password, client_id=client_id)
             
-            # Callback für SwissAirDry-Nachrichten
-            mqtt_client.add_message_callback("swissairdry/#", mqtt_message_handler)
+            # Callback für SwissAirDry-Nachrichten. Der MQTT-Client ruft ihn im
+            # paho-Thread auf; die Verarbeitung läuft im Event-Loop, damit Geräte
+            # und Sensordaten nur dort verändert werden (konsistente Snapshots)
+            loop = asyncio.get_running_loop()
+            mqtt_client.add_message_callback(
+                "swissairdry/#",
+                lambda topic, payload: loop.call_soon_threadsafe(mqtt_message_handler, topic, payload)
+            )
             
             # Verbindung herstellen
             connected = await mqtt_client.connect()
@@ -337,12 +397,67 @@ async def shutdown_event():
     
     print("API-Server wird heruntergefahren...")
     
+    # Letzten Snapshot schreiben
+    if snapshot_task is not None:
+        snapshot_task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await snapshot_task
+        # Ein noch laufender Schreibvorgang wird im Schreib-Thread vorher abgeschlossen
+        await save_snapshot()
+        snapshot_executor.shutdown(wait=True)
+    
     # MQTT-Verbindung trennen
     if mqtt_client and mqtt_client.is_connected():
         await mqtt_client.disconnect()
         print("MQTT-Client getrennt")
 
 
+def restore_snapshot():
+    """Stellt Geräte und Sensordaten aus dem letzten Snapshot wieder her."""
+    global sensor_data
+    
+    if not os.path.exists(SNAPSHOT_PATH):
+        return
+    
+    try:
+        restored_devices, restored_data = load_snapshot(SNAPSHOT_PATH, SENSOR_DATA_HISTORY)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Snapshot {SNAPSHOT_PATH} konnte nicht geladen werden: {e}")
+        return
+    
+    devices.clear()
+    devices.update(restored_devices)
+    sensor_data = restored_data
+    print(f"Snapshot geladen: {len(devices)} Geräte, {len(sensor_data)} Datenreihen")
+
+
+async def save_snapshot():
+    """Schreibt einen Snapshot von Geräten und Sensordaten."""
+    # Im Event-Loop (dort laufen alle Änderungen, auch aus MQTT) nur die Geräte
+    # und die Liste der Ringpuffer kopieren; die Puffer selbst kopiert und
+    # schreibt der Snapshot-Thread
+    device_copy = copy.deepcopy(devices)
+    series_items = list(sensor_data.items())
+    loop = asyncio.get_running_loop()
+    try:
+        await loop.run_in_executor(
+            snapshot_executor, dump_snapshot, device_copy, series_items, SNAPSHOT_PATH
+        )
+    except OSError as e:
+        print(f"Fehler beim Schreiben des Snapshots: {e}")
+
+
+async def snapshot_loop():
+    """Schreibt periodisch Snapshots des In-Memory-Zustands."""
+    while True:
+        await asyncio.sleep(SNAPSHOT_INTERVAL)
+        try:
+            await save_snapshot()
+        except Exception as e:
+            # Ein fehlgeschlagener Snapshot darf die weiteren nicht beenden
+            print(f"Fehler beim Erstellen des Snapshots: {e}")
+
+
 def mqtt_message_handler(topic: str, payload: Any):
     """
     Callback-Funktion für MQTT-Nachrichten.
@@ -387,32 +502,11 @@ def process_sensor_data(device_id: str, data: Dict[str, Any]):
         device_id: Geräte-ID
         data: Sensordaten
     """
-    # Prüfen, ob das Gerät existiert
-    device_exists = False
-    for device in devices:
-        if device["device_id"] == device_id:
-            device_exists = True
-            device["status"] = "online"
-            device["last_seen"] = datetime.now().isoformat()
-            break
-    
-    # Wenn das Gerät nicht existiert, automatisch erstellen
-    if not device_exists:
-        new_device = {
-            "id": len(devices) + 1,
-            "device_id": device_id,
-            "name": f"MQTT Gerät: {device_id}",
-            "type": "standard",
-            "status": "online",
-            "last_seen": datetime.now().isoformat(),
-            "created_at": datetime.now().isoformat(),
-        }
-        devices.append(new_device)
-        print(f"Neues Gerät erstellt: {device_id}")
+    # Gerät als online markieren, wenn es nicht existiert automatisch erstellen
+    touch_device(device_id, f"MQTT Gerät: {device_id}")
     
     # Sensordaten erstellen
     new_data = {
-        "timestamp": datetime.now().isoformat(),
         "temperature": data.get("temperature"),
         "humidity": data.get("humidity"),
         "power": data.get("power"),
@@ -421,14 +515,8 @@ def process_sensor_data(device_id: str, data: Dict[str, Any]):
         "runtime": data.get("runtime")
     }
     
-    # Daten hinzufügen
-    if device_id not in sensor_data:
-        sensor_data[device_id] = []
-    
-    # Begrenze die Anzahl der Datenpunkte auf 1000
-    sensor_data[device_id].append(new_data)
-    if len(sensor_data[device_id]) > 1000:
-        sensor_data[device_id] = sensor_data[device_id][-1000:]
+    # Daten hinzufügen (der Ringpuffer begrenzt die Anzahl der Datenpunkte)
+    sensor_data.append(device_id, new_data)
     
     print(f"Sensordaten gespeichert für Gerät: {device_id}")
 
@@ -441,19 +529,19 @@ def update_device_status(device_id: str, status: Any):
         device_id: Geräte-ID
         status: Statusdaten
     """
-    for device in devices:
-        if device["device_id"] == device_id:
-            if isinstance(status, dict):
-                # Status-Attribute aktualisieren
-                if "status" in status:
-                    device["status"] = status["status"]
-                device["last_seen"] = datetime.now().isoformat()
-            elif isinstance(status, str):
-                # Einfacher Status-String
-                device["status"] = status
-                device["last_seen"] = datetime.now().isoformat()
-            print(f"Status aktualisiert für Gerät: {device_id}")
-            return
+    device = devices.get(device_id)
+    if device is not None:
+        if isinstance(status, dict):
+            # Status-Attribute aktualisieren
+            if "status" in status:
+                device["status"] = status["status"]
+            device["last_seen"] = datetime.now().isoformat()
+        elif isinstance(status, str):
+            # Einfacher Status-String
+            device["status"] = status
+            device["last_seen"] = datetime.now().isoformat()
+        print(f"Status aktualisiert für Gerät: {device_id}")
+        return
     
     # Wenn das Gerät nicht existiert, ignoriere die Statusmeldung
     print(f"Statusmeldung ignoriert: Gerät {device_id} nicht gefunden")
@@ -467,15 +555,14 @@ def update_device_config(device_id: str, config: Any):
         device_id: Geräte-ID
         config: Konfigurationsdaten
     """
-    for device in devices:
-        if device["device_id"] == device_id:
-            if isinstance(config, dict):
-                # Konfiguration in Gerätedaten speichern
-                if "configuration" not in device:
-                    device["configuration"] = {}
-                device["configuration"].update(config)
-                print(f"Konfiguration aktualisiert für Gerät: {device_id}")
-                return
+    device = devices.get(device_id)
+    if device is not None and isinstance(config, dict):
+        # Konfiguration in Gerätedaten speichern
+        if "configuration" not in device:
+            device["configuration"] = {}
+        device["configuration"].update(config)
+        print(f"Konfiguration aktualisiert für Gerät: {device_id}")
+        return
     
     # Wenn das Gerät nicht existiert, ignoriere die Konfiguration
     print(f"Konfiguration ignoriert: Gerät {device_id} nicht gefunden")
@@ -485,13 +572,7 @@ def update_device_config(device_id: str, config: Any):
 async def send_device_command(device_id: str, command: DeviceCommand):
     """Sendet einen Befehl an ein Gerät über MQTT."""
     # Prüfen, ob das Gerät existiert
-    device_exists = False
-    for device in devices:
-        if device["device_id"] == device_id:
-            device_exists = True
-            break
-    
-    if not device_exists:
+    if device_id not in devices:
         return JSONResponse(status_code=404, content={"detail": "Gerät nicht gefunden"})
     
     # Befehl über MQTT senden, wenn der Client verbunden ist
@@ -11,6 +11,9 @@ import uvicorn
 if __name__ == "__main__":
     port = int(os.getenv("PORT", 5001))  # Verwende einen anderen Port (5001)
     host = os.getenv("HOST", "0.0.0.0")
+    # Automatisches Neuladen nur für die Entwicklung, jeder Reload startet den
+    # Server neu (der Zustand wird dabei über den Snapshot übernommen)
+    reload = os.getenv("SIMPLE_API_RELOAD", "false").lower() == "true"
     
     print(f"SwissAirDry Simple API Server startet auf Port {port}...")
     
@@ -19,6 +22,6 @@ if __name__ == "__main__":
         "simple_app:app",
         host=host,
         port=port,
-        reload=True,
+        reload=reload,
         log_level="info"
     )
\ No newline at end of file
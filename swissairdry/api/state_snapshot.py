@@ -0,0 +1,200 @@
+"""
+SwissAirDry Snapshots für die einfache API
+------------------------------------------
+
+Sichert die Geräteliste und die Sensordaten-Ringpuffer der einfachen API in
+einer kompakten Binärdatei, damit der In-Memory-Zustand einen Neustart ohne
+Datenbank übersteht.
+
+Dateiformat:
+    4 Byte   Kennung b"SADS"
+    2 Byte   Formatversion (little endian)
+    4 Byte   Länge des JSON-Headers
+    n Byte   JSON-Header (Geräte, Ringpuffer-Metadaten)
+    Rohdaten der Spalten-Arrays aller Ringpuffer, jeweils auf 8 Byte ausgerichtet
+
+Ab Version 2 enthält jede Spalte nur die belegten Einträge, älteste zuerst;
+Version 1 (volle Kapazität mit Schreibposition) wird weiterhin gelesen.
+
+Im Event-Loop werden nur die Gerätedaten kopiert. Die Spalten kopiert und
+schreibt dump_snapshot() in einem Thread (siehe SensorSeries.ordered_buffers()),
+Teil für Teil ohne die Datei vorher im Speicher zusammenzusetzen. Beim Start
+wird die Datei per mmap geöffnet und die Spalten direkt aus der Abbildung in
+die Arrays übernommen.
+
+@author Swiss Air Dry Team <info@swissairdry.com>
+@copyright 2023-2025 Swiss Air Dry Team
+"""
+
+import os
+import sys
+import json
+import mmap
+import struct
+from array import array
+from typing import Dict, Iterable, List, Tuple, Any
+
+try:
+    from sensor_store import SensorSeries, SensorStore
+except ImportError:
+    from swissairdry.api.sensor_store import SensorSeries, SensorStore
+
+MAGIC = b"SADS"
+VERSION = 2
+# Version 1 speicherte die Arrays in voller Kapazität samt Schreibposition
+SUPPORTED_VERSIONS = (1, 2)
+_PREFIX = struct.Struct("<4sHI")
+_ALIGN = 8
+
+
+def _padding(offset: int) -> int:
+    """Anzahl der Füllbytes bis zur nächsten 8-Byte-Grenze."""
+    return -offset % _ALIGN
+
+
+def _snapshot_parts(devices: Dict[str, Dict[str, Any]],
+                    series_items: Iterable[Tuple[str, SensorSeries]]) -> List[Any]:
+    """
+    Erstellt die Teile eines Snapshots (Präfix, Header, Füllbytes, Spalten).
+
+    Args:
+        devices: Geräte nach Geräte-ID
+        series_items: (Geräte-ID, Ringpuffer)-Paare
+    """
+    series_meta = []
+    columns = []
+    for device_id, series in series_items:
+        buffers = series.ordered_buffers()
+        series_meta.append({
+            "device_id": device_id,
+            "capacity": series.capacity,
+            "metrics": list(series.metrics),
+            "size": len(buffers[0]),
+            "typecodes": [buffer.typecode for buffer in buffers],
+        })
+        columns.extend(buffers)
+
+    header = json.dumps({
+        "byteorder": sys.byteorder,
+        "devices": devices,
+        "series": series_meta,
+    }, ensure_ascii=False, default=str).encode("utf-8")
+
+    parts = [_PREFIX.pack(MAGIC, VERSION, len(header)), header]
+    offset = _PREFIX.size + len(header)
+    for column in columns:
+        padding = _padding(offset)
+        if padding:
+            parts.append(b"\0" * padding)
+        # array unterstützt das Buffer-Protokoll und wird ohne Kopie geschrieben
+        parts.append(column)
+        offset += padding + len(column) * column.itemsize
+    return parts
+
+
+def capture_snapshot(devices: Dict[str, Dict[str, Any]], store: SensorStore) -> bytes:
+    """
+    Serialisiert Geräte und Sensordaten in das Snapshot-Format.
+
+    Args:
+        devices: Geräte nach Geräte-ID
+        store: Sensordaten-Speicher
+
+    Returns:
+        bytes: Snapshot-Daten
+    """
+    return b"".join(bytes(part) for part in _snapshot_parts(devices, store.items()))
+
+
+def _write_parts(parts: Iterable[Any], path: str) -> None:
+    """Schreibt Teile atomar in eine Datei (temporäre Datei, fsync, Umbenennen)."""
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "wb") as f:
+        for part in parts:
+            f.write(part)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+
+
+def write_snapshot(data: bytes, path: str) -> None:
+    """
+    Schreibt einen Snapshot atomar (temporäre Datei, fsync, Umbenennen).
+
+    Args:
+        data: Snapshot-Daten aus capture_snapshot()
+        path: Zieldatei
+    """
+    _write_parts([data], path)
+
+
+def dump_snapshot(devices: Dict[str, Dict[str, Any]],
+                  series_items: Iterable[Tuple[str, SensorSeries]], path: str) -> None:
+    """
+    Erstellt und schreibt einen Snapshot (für einen Thread außerhalb des Event-Loops).
+
+    Args:
+        devices: Kopie der Geräte nach Geräte-ID
+        series_items: (Geräte-ID, Ringpuffer)-Paare, die Puffer dürfen sich
+            währenddessen ändern
+        path: Zieldatei
+    """
+    _write_parts(_snapshot_parts(devices, series_items), path)
+
+
+def load_snapshot(path: str, capacity: int) -> Tuple[Dict[str, Dict[str, Any]], SensorStore]:
+    """
+    Lädt Geräte und Sensordaten aus einem Snapshot.
+
+    Args:
+        path: Snapshot-Datei
+        capacity: Gewünschte Kapazität pro Gerät (abweichende Puffer werden angepasst)
+
+    Returns:
+        Tuple: (Geräte nach Geräte-ID, Sensordaten-Speicher)
+
+    Raises:
+        ValueError: Wenn die Datei kein gültiger Snapshot ist
+    """
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        view = memoryview(mapped)
+        try:
+            if len(view) < _PREFIX.size:
+                raise ValueError("Snapshot-Datei ist unvollständig")
+            magic, version, header_size = _PREFIX.unpack_from(view)
+            if magic != MAGIC or version not in SUPPORTED_VERSIONS:
+                raise ValueError("Unbekanntes Snapshot-Format")
+
+            offset = _PREFIX.size
+            header = json.loads(bytes(view[offset:offset + header_size]).decode("utf-8"))
+            offset += header_size
+            swap = header.get("byteorder", sys.byteorder) != sys.byteorder
+
+            store = SensorStore(capacity=capacity)
+            for meta in header["series"]:
+                # Version 2: nur belegte Einträge, älteste zuerst
+                count = meta["capacity"] if version == 1 else meta["size"]
+                buffers = []
+                for typecode in meta["typecodes"]:
+                    offset += _padding(offset)
+                    buffer = array(typecode)
+                    length = count * buffer.itemsize
+                    if offset + length > len(view):
+                        raise ValueError("Snapshot-Datei ist unvollständig")
+                    buffer.frombytes(view[offset:offset + length])
+                    if swap:
+                        buffer.byteswap()
+                    buffers.append(buffer)
+                    offset += length
+
+                if version == 1:
+                    next_index = meta["next"]
+                else:
+                    next_index = meta["size"] % meta["capacity"]
+                store.add_series(meta["device_id"], SensorSeries.from_buffers(
+                    meta["capacity"], meta["metrics"], next_index, meta["size"], buffers
+                ))
+        finally:
+            view.release()
+
+    return header["devices"], store
@@ -14,6 +14,7 @@ from swissairdry.api.app.crud import (
     get_device,
     get_device_by_device_id, 
     get_devices, 
+    get_device_rows,
     create_device, 
     update_device, 
     delete_device,
@@ -21,6 +22,7 @@ from swissairdry.api.app.crud import (
     # Sensordaten-Operationen
     get_sensor_data,
     get_sensor_data_by_device,
+    get_sensor_data_rows_by_device,
     create_sensor_data,
     
     # Kunden-Operationen
@@ -56,6 +58,7 @@ __all__ = [
     "get_device",
     "get_device_by_device_id", 
     "get_devices", 
+    "get_device_rows",
     "create_device", 
     "update_device", 
     "delete_device",
@@ -63,6 +66,7 @@ __all__ = [
     # Sensordaten-Operationen
     "get_sensor_data",
     "get_sensor_data_by_device",
+    "get_sensor_data_rows_by_device",
     "create_sensor_data",
     
     # Kunden-Operationen
@@ -14,7 +14,19 @@ from swissairdry.api.app.database import (
     SessionLocal,
     engine,
     get_db,
+    get_pool_status,
+    get_read_db,
+    get_async_read_db,
     SQLALCHEMY_DATABASE_URL,
+    async_engine,
+    AsyncSessionLocal,
+    get_async_db,
+    require_async_database,
+    ASYNC_DATABASE_URL,
+    ASYNC_DATABASE_AVAILABLE,
+    replica_engine,
+    ReplicaSessionLocal,
+    DATABASE_REPLICA_URL,
 )
 
 # Exportierte Namen
@@ -23,5 +35,17 @@ __all__ = [
     "SessionLocal",
     "engine",
     "get_db",
+    "get_pool_status",
+    "get_read_db",
+    "get_async_read_db",
     "SQLALCHEMY_DATABASE_URL",
+    "async_engine",
+    "AsyncSessionLocal",
+    "get_async_db",
+    "require_async_database",
+    "ASYNC_DATABASE_URL",
+    "ASYNC_DATABASE_AVAILABLE",
+    "replica_engine",
+    "ReplicaSessionLocal",
+    "DATABASE_REPLICA_URL",
 ]
\ No newline at end of file
@@ -1,14 +1,46 @@
 """
-Platzhalter für Deck-Integration
+Deck-Integration
 
-Dieses Modul ist ein Platzhalter für die alte Nextcloud Deck-Integration, die durch eine eigenständige
-Job-Management-API ersetzt wurde.
+Legt für den ExApp-Daemon (nextcloud/daemon.py, siehe deck_worker.py) Alarm-,
+Auftrags- und Gerätekarten in Nextcloud Deck an. Die Auftragsverwaltung selbst
+liegt in der eigenständigen Job-Management-API; Deck dient nur noch als
+Anzeige für Alarme und Aufträge.
 
-Diese Implementierung ist nur für Kompatibilitätszwecke während der Migration vorhanden und
-sollte in neuen Code nicht mehr verwendet werden.
+Ist eine Nextcloud-URL konfiguriert (und requests installiert), arbeitet der
+Client gegen die Deck-REST-API v1.0; Verbindungs- und HTTP-Fehler werden als
+DeckAPIException gemeldet. Ohne URL liefern alle Methoden Platzhalter-Daten.
+
+Lesende Zugriffe auf Boards, Stacks und Labels laufen über einen
+Metadaten-Cache (siehe cache.py) mit ETag-Revalidierung.
 """
 
-from typing import Dict, List, Optional, Any, Union
+import asyncio
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional, Any
+
+from .cache import DeckMetadataCache, fetch_json, static_fetch
+
+try:
+    import requests
+    REQUESTS_AVAILABLE = True
+except ImportError:
+    REQUESTS_AVAILABLE = False
+
+logger = logging.getLogger("swissairdry_deck")
+
+DECK_API_PATH = "/index.php/apps/deck/api/v1.0"
+DECK_HEADERS = {"OCS-APIRequest": "true", "Accept": "application/json"}
+DECK_REQUEST_TIMEOUT = 10
+
+# Stacks des Hauptboards: Schlüssel -> Titel
+STATUS_STACK_TITLES = {
+    "new": "In Vorbereitung",
+    "in_progress": "In Bearbeitung",
+    "done": "Abgeschlossen",
+    "alarms": "Alarme",
+}
+ALARM_LABEL_TITLE = "Alarm"
 
 
 class DeckAPIException(Exception):
@@ -18,90 +50,357 @@ class DeckAPIException(Exception):
 
 class DeckAPIClient:
     """
-    Platzhalter für den Deck API Client.
-    
-    Diese Klasse ist ein Platzhalter für die alte Deck API Client-Implementierung.
+    Client für die Deck-REST-API.
+
+    Ohne konfigurierte Nextcloud-URL arbeitet der Client im Platzhalter-Modus:
+    Lesende Methoden liefern leere Daten, schreibende die ID 1.
     """
 
-    def __init__(self, base_url: str = "", username: str = "", password: str = ""):
+    def __init__(self, base_url: str = "", username: str = "", password: str = "",
+                 metadata: Optional[DeckMetadataCache] = None):
         """Initialisiert den Deck API Client."""
         self.base_url = base_url
         self.username = username
         self.password = password
         self.is_connected = False
+        self.metadata = metadata or DeckMetadataCache()
+        self._session = None
+        if base_url and REQUESTS_AVAILABLE:
+            self._session = requests.Session()
+            self._session.auth = (username, password)
+
+    @property
+    def online(self) -> bool:
+        """True, wenn der Client gegen eine echte Deck-API arbeitet."""
+        return self._session is not None
+
+    def _url(self, path: str) -> str:
+        return f"{self.base_url.rstrip('/')}{DECK_API_PATH}{path}"
+
+    def _request(self, method: str, path: str, payload: Optional[Dict[str, Any]] = None) -> Any:
+        """
+        Führt eine schreibende Anfrage gegen die Deck-API aus.
+
+        Raises:
+            DeckAPIException: Bei Verbindungs- oder HTTP-Fehlern
+        """
+        try:
+            response = self._session.request(
+                method, self._url(path), json=payload, headers=DECK_HEADERS,
+                timeout=DECK_REQUEST_TIMEOUT
+            )
+            response.raise_for_status()
+            result = response.json()
+        except (requests.RequestException, ValueError) as e:
+            raise DeckAPIException(f"{method} {path} fehlgeschlagen: {e}") from e
+        self.is_connected = True
+        return result
+
+    def _fetch(self, path: str, placeholder: Any):
+        """Abruffunktion für den Metadaten-Cache"""
+        if self._session is None:
+            return static_fetch(placeholder)
+        url = self._url(path)
+
+        def fetch(etag):
+            try:
+                result = fetch_json(self._session, url, etag, timeout=DECK_REQUEST_TIMEOUT)
+            except (requests.RequestException, ValueError) as e:
+                raise DeckAPIException(f"GET {path} fehlgeschlagen: {e}") from e
+            self.is_connected = True
+            return result
+
+        return fetch
 
     def get_all_boards(self) -> List[Dict[str, Any]]:
-        """Gibt eine leere Liste zurück (Platzhalter)."""
-        return []
-    
+        """Gibt alle Boards zurück (zwischengespeichert)."""
+        return self.metadata.get("boards", self._fetch("/boards", []))
+
+    def get_boards(self) -> List[Dict[str, Any]]:
+        """Alias für get_all_boards()."""
+        return self.get_all_boards()
+
+    def find_board_id(self, title: str) -> Optional[int]:
+        """Sucht die ID eines aktiven Boards anhand seines Titels."""
+        for board in self.get_all_boards():
+            if board.get("archived") or board.get("deletedAt"):
+                continue
+            if board.get("title") == title:
+                return board.get("id")
+        return None
+
     def create_board(self, title: str, color: str = "#0082c9") -> int:
-        """Erstellt ein virtuelles Board (Platzhalter)."""
-        return 1
-    
+        """Erstellt ein Board und gibt dessen ID zurück."""
+        if not self.online:
+            return 1
+        board = self._request("POST", "/boards", {"title": title, "color": color.lstrip("#")})
+        self.metadata.invalidate("boards")
+        return board["id"]
+
     def get_board_by_id(self, board_id: int) -> Dict[str, Any]:
-        """Gibt ein leeres Board-Dict zurück (Platzhalter)."""
-        return {
+        """Gibt ein Board inklusive Labels zurück (zwischengespeichert)."""
+        return self.metadata.get(f"board:{board_id}", self._fetch(f"/boards/{board_id}", {
             "id": board_id,
             "title": "Platzhalter-Board",
-            "stacks": []
-        }
-    
-    def create_stack(self, board_id: int, title: str) -> int:
-        """Erstellt einen virtuellen Stack (Platzhalter)."""
-        return 1
-    
-    def create_card(self, board_id: int, stack_id: int, title: str, description: str = "", 
-                   labels: Optional[List[int]] = None, assignees: Optional[List[int]] = None, due_date: Optional[str] = None) -> int:
-        """Erstellt eine virtuelle Karte (Platzhalter)."""
-        return 1
-    
-    def update_card(self, board_id: int, stack_id: int, card_id: int, 
-                   data: Dict[str, Any]) -> Dict[str, Any]:
-        """Aktualisiert eine virtuelle Karte (Platzhalter)."""
-        return {"id": card_id}
-    
-    def assign_label(self, board_id: int, card_id: int, label_id: int) -> bool:
-        """Weist ein virtuelles Label zu (Platzhalter)."""
+            "stacks": [],
+            "labels": []
+        }))
+
+    def get_stacks(self, board_id: int) -> List[Dict[str, Any]]:
+        """Gibt die Stacks eines Boards zurück (zwischengespeichert)."""
+        return self.metadata.get(
+            f"stacks:{board_id}", self._fetch(f"/boards/{board_id}/stacks", [])
+        )
+
+    def find_stack_id(self, board_id: int, title: str) -> Optional[int]:
+        """Sucht die ID eines Stacks anhand seines Titels."""
+        for stack in self.get_stacks(board_id):
+            if stack.get("title") == title:
+                return stack.get("id")
+        return None
+
+    def find_label_id(self, board_id: int, title: str) -> Optional[int]:
+        """Sucht die ID eines Labels anhand seines Titels."""
+        for label in self.get_board_by_id(board_id).get("labels", []):
+            if label.get("title") == title:
+                return label.get("id")
+        return None
+
+    def create_stack(self, board_id: int, title: str, order: int = 0) -> int:
+        """Erstellt einen Stack und gibt dessen ID zurück."""
+        if not self.online:
+            return 1
+        stack = self._request(
+            "POST", f"/boards/{board_id}/stacks", {"title": title, "order": order}
+        )
+        self.metadata.invalidate(f"stacks:{board_id}")
+        return stack["id"]
+
+    def create_card(self, board_id: int, stack_id: int, title: str, description: str = "",
+                    labels: Optional[List[int]] = None, assignees: Optional[List[str]] = None,
+                    due_date: Optional[str] = None) -> int:
+        """Erstellt eine Karte, weist Labels und Benutzer zu und gibt die Karten-ID zurück."""
+        if not self.online:
+            return 1
+        card = self._request("POST", f"/boards/{board_id}/stacks/{stack_id}/cards", {
+            "title": title,
+            "type": "plain",
+            "order": 999,
+            "description": description,
+            "duedate": due_date,
+        })
+        card_id = card["id"]
+        for label_id in labels or []:
+            self.assign_label(board_id, card_id, label_id, stack_id=stack_id)
+        for user_id in assignees or []:
+            self._request("PUT", f"/boards/{board_id}/stacks/{stack_id}/cards/{card_id}/assignUser",
+                          {"userId": user_id})
+        return card_id
+
+    def update_card(self, board_id: int, stack_id: int, card_id: int,
+                    data: Dict[str, Any]) -> Dict[str, Any]:
+        """Aktualisiert eine Karte (data enthält die vollständigen Kartenfelder)."""
+        if not self.online:
+            return {"id": card_id}
+        return self._request("PUT", f"/boards/{board_id}/stacks/{stack_id}/cards/{card_id}", data)
+
+    def move_card(self, board_id: int, stack_id: int, card_id: int, target_stack_id: int,
+                  order: int = 0) -> bool:
+        """Verschiebt eine Karte in einen anderen Stack."""
+        if not self.online:
+            return True
+        self._request("PUT", f"/boards/{board_id}/stacks/{stack_id}/cards/{card_id}/reorder",
+                      {"order": order, "stackId": target_stack_id})
         return True
 
+    def assign_label(self, board_id: int, card_id: int, label_id: int,
+                     stack_id: Optional[int] = None) -> bool:
+        """
+        Weist einer Karte ein Label zu.
+
+        Ohne stack_id wird der Stack der Karte in den Stacks des Boards gesucht.
+        """
+        if not self.online:
+            return True
+        if stack_id is None:
+            stack_id = self._stack_of_card(board_id, card_id)
+        self._request("PUT", f"/boards/{board_id}/stacks/{stack_id}/cards/{card_id}/assignLabel",
+                      {"labelId": label_id})
+        return True
+
+    def _stack_of_card(self, board_id: int, card_id: int) -> int:
+        """Sucht den Stack einer Karte, bei Bedarf mit frisch geladenen Stacks."""
+        for attempt in range(2):
+            for stack in self.get_stacks(board_id):
+                if any(card.get("id") == card_id for card in stack.get("cards") or []):
+                    return stack["id"]
+            # Die Karte ist eventuell neuer als der Cache-Eintrag
+            self.metadata.invalidate(f"stacks:{board_id}")
+        raise DeckAPIException(f"Karte {card_id} auf Board {board_id} nicht gefunden")
+
 
 class SwissAirDryDeckIntegration:
     """
-    Platzhalter für die SwissAirDry Deck Integration.
-    
-    Diese Klasse ist ein Platzhalter für die alte SwissAirDry Deck Integration.
+    SwissAirDry Deck Integration.
+
+    Verwaltet das Hauptboard mit seinen Status-Stacks und legt Geräte-,
+    Auftrags- und Alarmkarten an.
     """
 
-    def __init__(self, base_url: str = "", username: str = "", password: str = ""):
+    def __init__(self, base_url: str = "", username: str = "", password: str = "",
+                 board_name: str = "SwissAirDry"):
         """Initialisiert die SwissAirDry Deck Integration."""
         self.deck_client = DeckAPIClient(base_url, username, password)
+        self.metadata = self.deck_client.metadata
+        self.board_name = board_name
+        self.board_id: Optional[int] = None
+        self.stacks: Dict[str, int] = {}
         self.main_board_id = 1
         self.status_stacks = {
             "new": 1,
             "in_progress": 2,
             "done": 3
         }
-    
-    def create_job_board(self, job_id: str, job_title: str, customer_name: str) -> int:
-        """Erstellt ein virtuelles Auftragsboard (Platzhalter)."""
-        return 1
-    
-    def add_device_card(self, board_id: int, device_id: str, device_name: str, status: str = "In Vorbereitung") -> int:
-        """Fügt eine virtuelle Gerätekarte hinzu (Platzhalter)."""
-        return 1
-    
-    def update_device_status(self, board_id: int, card_id: int, source_stack_id: int, 
-                          target_status: str, measurement_data: Optional[Dict[str, Any]] = None) -> bool:
-        """Aktualisiert den Status einer virtuellen Gerätekarte (Platzhalter)."""
+
+    @property
+    def client(self) -> DeckAPIClient:
+        """Deck API Client (Name wie in der ExApp-Integration)."""
+        return self.deck_client
+
+    def setup(self) -> bool:
+        """
+        Sucht oder erstellt das Hauptboard und seine Stacks.
+
+        Raises:
+            DeckAPIException: Bei Fehlern der Deck-API
+        """
+        if not self.deck_client.online:
+            self.board_id = self.main_board_id
+            self.stacks = dict(self.status_stacks)
+            return True
+
+        board_id = self.deck_client.find_board_id(self.board_name)
+        if board_id is None:
+            board_id = self.deck_client.create_board(self.board_name)
+
+        stacks = {}
+        for order, (key, title) in enumerate(STATUS_STACK_TITLES.items()):
+            stack_id = self.deck_client.find_stack_id(board_id, title)
+            if stack_id is None:
+                stack_id = self.deck_client.create_stack(board_id, title, order=order)
+            stacks[key] = stack_id
+
+        self.board_id = self.main_board_id = board_id
+        self.stacks = stacks
+        self.status_stacks = {key: stacks[key] for key in ("new", "in_progress", "done")}
         return True
-    
-    def add_task_card(self, board_id: int, task_title: str, task_description: str, 
-                   assigned_to: Optional[str] = None, due_date: Optional[str] = None, 
-                   stack_name: str = "In Vorbereitung") -> int:
-        """Fügt eine virtuelle Aufgabenkarte hinzu (Platzhalter)."""
-        return 1
-    
-    def complete_task(self, board_id: int, card_id: int, source_stack_id: int, 
-                   completion_note: Optional[str] = None) -> bool:
-        """Markiert eine virtuelle Aufgabe als abgeschlossen (Platzhalter)."""
-        return True
\ No newline at end of file
+
+    async def initialize(self) -> bool:
+        """Richtet Board und Stacks ein, ohne den Event-Loop zu blockieren."""
+        return await self._run(self.setup)
+
+    async def create_alarm_card(self, device_id: str, alarm_type: str, description: str,
+                                timestamp: Optional[datetime] = None) -> bool:
+        """Legt eine Alarmkarte im Stack "Alarme" an."""
+        return await self._run(self._create_alarm_card, device_id, alarm_type, description,
+                               timestamp or datetime.now())
+
+    async def create_job_card(self, job_id: str, title: str, description: str, status: str,
+                              details: Optional[Dict[str, Any]] = None) -> bool:
+        """Legt eine Auftragskarte im Stack des Status an (sonst "In Vorbereitung")."""
+        return await self._run(
+            self._create_job_card, job_id, title, description, status, details or {}
+        )
+
+    async def _run(self, func, *args) -> bool:
+        """Führt eine blockierende Deck-Operation in einem Thread aus."""
+        try:
+            return await asyncio.to_thread(func, *args)
+        except DeckAPIException as e:
+            logger.error(f"Deck-Operation {func.__name__} fehlgeschlagen: {e}")
+            return False
+
+    def _require_board(self) -> int:
+        if self.board_id is None:
+            raise DeckAPIException("Deck-Integration ist nicht initialisiert")
+        return self.board_id
+
+    def _create_alarm_card(self, device_id: str, alarm_type: str, description: str,
+                           timestamp: datetime) -> bool:
+        board_id = self._require_board()
+        label_id = self.deck_client.find_label_id(board_id, ALARM_LABEL_TITLE)
+        self.deck_client.create_card(
+            board_id,
+            self.stacks.get("alarms", self.status_stacks["new"]),
+            f"Alarm {device_id}: {alarm_type}",
+            description=f"{description}\n\nZeitpunkt: {timestamp.isoformat(timespec='seconds')}",
+            labels=[label_id] if label_id is not None else None,
+        )
+        return True
+
+    def _create_job_card(self, job_id: str, title: str, description: str, status: str,
+                         details: Dict[str, Any]) -> bool:
+        board_id = self._require_board()
+        stack_id = self.deck_client.find_stack_id(board_id, status) or self.status_stacks["new"]
+        lines = [description, "", f"Auftrag: {job_id}"] if description else [f"Auftrag: {job_id}"]
+        lines += [f"{key}: {value}" for key, value in details.items()]
+        self.deck_client.create_card(
+            board_id, stack_id, f"{job_id}: {title}", description="\n".join(lines)
+        )
+        return True
+
+    def create_job_board(self, job_id: str, job_title: str, customer_name: str) -> int:
+        """Erstellt ein Board für einen Auftrag."""
+        board_id = self.deck_client.create_board(f"{job_id} - {job_title} ({customer_name})")
+        for order, key in enumerate(("new", "in_progress", "done")):
+            self.deck_client.create_stack(board_id, STATUS_STACK_TITLES[key], order=order)
+        return board_id
+
+    def add_device_card(self, board_id: int, device_id: str, device_name: str,
+                        status: str = "In Vorbereitung") -> int:
+        """
+        Fügt eine Gerätekarte hinzu.
+
+        Existiert für das Gerät bereits eine Karte, wird deren ID zurückgegeben.
+        Im Platzhalter-Modus wird keine Karten-ID vermerkt.
+        """
+        card_id = self.metadata.card_for_device(device_id)
+        if card_id is not None:
+            return card_id
+
+        # Stack aus dem Metadaten-Cache, damit nur die Karte selbst angelegt wird
+        stack_id = self.deck_client.find_stack_id(board_id, status) or self.status_stacks["new"]
+        card_id = self.deck_client.create_card(
+            board_id, stack_id, device_name, description=f"Gerät: {device_id}"
+        )
+        if self.deck_client.online:
+            self.metadata.remember_card(device_id, card_id)
+        return card_id
+
+    def update_device_status(self, board_id: int, card_id: int, source_stack_id: int,
+                             target_status: str,
+                             measurement_data: Optional[Dict[str, Any]] = None) -> bool:
+        """Verschiebt eine Gerätekarte in den Stack des Zielstatus."""
+        if not self.deck_client.online:
+            return True
+        target_stack_id = self.deck_client.find_stack_id(board_id, target_status)
+        if target_stack_id is None:
+            raise DeckAPIException(f"Stack '{target_status}' auf Board {board_id} nicht gefunden")
+        return self.deck_client.move_card(board_id, source_stack_id, card_id, target_stack_id)
+
+    def add_task_card(self, board_id: int, task_title: str, task_description: str,
+                      assigned_to: Optional[str] = None, due_date: Optional[str] = None,
+                      stack_name: str = "In Vorbereitung") -> int:
+        """Fügt eine Aufgabenkarte im Stack stack_name hinzu."""
+        stack_id = self.deck_client.find_stack_id(board_id, stack_name) or self.status_stacks["new"]
+        return self.deck_client.create_card(
+            board_id, stack_id, task_title, description=task_description,
+            assignees=[assigned_to] if assigned_to else None, due_date=due_date
+        )
+
+    def complete_task(self, board_id: int, card_id: int, source_stack_id: int,
+                      completion_note: Optional[str] = None) -> bool:
+        """Verschiebt eine Aufgabe in den Stack "Abgeschlossen"."""
+        done_stack_id = self.deck_client.find_stack_id(board_id, STATUS_STACK_TITLES["done"])
+        target_stack_id = done_stack_id or self.status_stacks["done"]
+        return self.deck_client.move_card(board_id, source_stack_id, card_id, target_stack_id)
@@ -0,0 +1,194 @@
+"""
+Metadaten-Cache für die Deck-Integration
+
+Boards, Stacks und Labels ändern sich selten, werden aber für jede Karte
+benötigt (Stack suchen, Label zuweisen). Der Cache hält sie für
+DECK_METADATA_TTL Sekunden vor. Danach wird ein Eintrag mit seinem ETag
+(If-None-Match) gegen die Deck-API revalidiert: antwortet Nextcloud mit
+304 Not Modified, bleibt der Eintrag ohne erneute Übertragung gültig.
+
+Zusätzlich merkt sich der Cache die Karten-ID je Gerät, damit für ein Gerät
+keine zweite Karte angelegt und keine Suche über alle Karten nötig ist.
+
+@author Swiss Air Dry Team <info@swissairdry.com>
+@copyright 2023-2025 Swiss Air Dry Team
+"""
+
+import os
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+DECK_METADATA_TTL = float(os.environ.get("DECK_METADATA_TTL", "300"))
+DECK_METADATA_MAX_ENTRIES = int(os.environ.get("DECK_METADATA_MAX_ENTRIES", "256"))
+
+# Rückgabe einer Abruffunktion, wenn sich die Daten seit dem ETag nicht geändert haben
+NOT_MODIFIED = object()
+# Kein gültiger Eintrag vorhanden
+_MISSING = object()
+
+# Ruft Metadaten ab: ETag des Cache-Eintrags -> (Daten, neuer ETag) oder NOT_MODIFIED
+FetchFunc = Callable[[Optional[str]], Any]
+
+
+class _Entry:
+    """Ein zwischengespeicherter Metadaten-Eintrag"""
+
+    __slots__ = ("value", "etag", "expires")
+
+    def __init__(self, value: Any, etag: Optional[str], expires: float):
+        self.value = value
+        self.etag = etag
+        self.expires = expires
+
+
+class DeckMetadataCache:
+    """TTL-Cache mit ETag-Revalidierung für Deck-Metadaten (threadsicher)"""
+
+    def __init__(self, ttl: float = DECK_METADATA_TTL,
+                 max_entries: int = DECK_METADATA_MAX_ENTRIES):
+        """
+        Initialisiert den Cache.
+
+        Args:
+            ttl: Sekunden, die ein Eintrag ohne Rückfrage verwendet wird
+            max_entries: Maximale Anzahl an Metadaten-Einträgen
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._key_locks: Dict[str, threading.Lock] = {}
+        self._card_ids: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "revalidated": 0, "fetched": 0}
+
+    def get(self, key: str, fetch: FetchFunc) -> Any:
+        """
+        Gibt die Metadaten zu key zurück und lädt sie bei Bedarf.
+
+        Gleichzeitige Abrufe desselben Schlüssels führen nur eine Anfrage aus.
+
+        Args:
+            key: Schlüssel, z.B. "boards" oder "stacks:1"
+            fetch: Abruffunktion, erhält den bisherigen ETag
+        """
+        value = self._fresh(key)
+        if value is not _MISSING:
+            return value
+
+        with self._key_lock(key):
+            # Ein anderer Thread hat den Eintrag eventuell gerade geladen
+            value = self._fresh(key)
+            if value is not _MISSING:
+                return value
+
+            with self._lock:
+                entry = self._entries.get(key)
+            result = fetch(entry.etag if entry else None)
+            expires = time.monotonic() + self.ttl
+
+            with self._lock:
+                if result is NOT_MODIFIED and entry is not None:
+                    entry.expires = expires
+                    self._entries[key] = entry
+                    self._entries.move_to_end(key)
+                    self.stats["revalidated"] += 1
+                    return entry.value
+
+                value, etag = result
+                self._entries[key] = _Entry(value, etag, expires)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                self.stats["fetched"] += 1
+                return value
+
+    def invalidate(self, key: Optional[str] = None) -> None:
+        """
+        Verwirft einen Eintrag nach einer eigenen Änderung (z.B. neuer Stack).
+
+        Args:
+            key: Schlüssel des Eintrags, None verwirft alle Metadaten
+        """
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def card_for_device(self, device_id: str) -> Optional[int]:
+        """Gibt die bekannte Karten-ID eines Geräts zurück."""
+        with self._lock:
+            return self._card_ids.get(device_id)
+
+    def remember_card(self, device_id: str, card_id: int) -> None:
+        """Vermerkt die Karten-ID eines Geräts."""
+        with self._lock:
+            self._card_ids[device_id] = card_id
+
+    def forget_card(self, device_id: str) -> None:
+        """Entfernt die Karten-ID eines Geräts (z.B. nach dem Löschen der Karte)."""
+        with self._lock:
+            self._card_ids.pop(device_id, None)
+
+    def status(self) -> Dict[str, Any]:
+        """Kennzahlen für Status-Endpunkte"""
+        with self._lock:
+            return {
+                **self.stats,
+                "entries": len(self._entries),
+                "device_cards": len(self._card_ids),
+                "ttl": self.ttl,
+            }
+
+    def _fresh(self, key: str) -> Any:
+        """Gibt einen noch gültigen Eintrag zurück, sonst _MISSING."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.expires <= time.monotonic():
+                return _MISSING
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return entry.value
+
+    def _key_lock(self, key: str) -> threading.Lock:
+        """Gibt die Sperre für Abrufe eines Schlüssels zurück."""
+        with self._lock:
+            lock = self._key_locks.get(key)
+            if lock is None:
+                lock = self._key_locks[key] = threading.Lock()
+            return lock
+
+
+def fetch_json(session: Any, url: str, etag: Optional[str] = None, timeout: float = 10,
+               **kwargs) -> Any:
+    """
+    Ruft eine Ressource der Deck-API mit ETag-Revalidierung ab.
+
+    Args:
+        session: requests-Session (mit Authentifizierung)
+        url: URL der Ressource
+        etag: ETag des Cache-Eintrags
+        timeout: Timeout in Sekunden
+        **kwargs: Weitere Argumente für requests
+
+    Returns:
+        NOT_MODIFIED bei 304, sonst (JSON-Daten, ETag)
+
+    Raises:
+        requests.RequestException: Bei Verbindungs- oder HTTP-Fehlern
+    """
+    headers = {"OCS-APIRequest": "true", "Accept": "application/json"}
+    if etag:
+        headers["If-None-Match"] = etag
+    response = session.get(url, headers=headers, timeout=timeout, **kwargs)
+    if response.status_code == 304:
+        return NOT_MODIFIED
+    response.raise_for_status()
+    return response.json(), response.headers.get("ETag")
+
+
+def static_fetch(value: Any) -> Callable[[Optional[str]], Tuple[Any, None]]:
+    """Abruffunktion für feste Daten (ohne konfigurierte Nextcloud)."""
+    return lambda etag: (value, None)
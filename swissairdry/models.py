@@ -15,7 +15,9 @@ from swissairdry.api.app.models import (
     Customer, 
     Job, 
     Report, 
-    EnergyCost
+    EnergyCost,
+    Alert,
+    DeviceLocationEvent
 )
 
 # Konstanten und Enum-Klassen für die Modelle
@@ -37,6 +39,8 @@ __all__ = [
     "Job", 
     "Report", 
     "EnergyCost",
+    "Alert",
+    "DeviceLocationEvent",
     "JOB_STATUS_NEW",
     "JOB_STATUS_IN_PROGRESS",
     "JOB_STATUS_COMPLETED",
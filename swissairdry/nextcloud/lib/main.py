@@ -8,15 +8,20 @@ Die ExApp dient als Brücke zwischen der Nextcloud-Oberfläche und dem SwissAirD
 
 import os
 import json
+import time
+import asyncio
 import logging
-from typing import Dict, Any, List, Optional
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple
+from urllib.parse import urlsplit
 import uuid
 
+import httpx
 import uvicorn
 from fastapi import FastAPI, Request, HTTPException, Depends
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import JSONResponse, HTMLResponse, RedirectResponse
+from fastapi.responses import JSONResponse, HTMLResponse, RedirectResponse, Response
 from pydantic import BaseModel
 
 # Nextcloud Python API
@@ -36,6 +41,26 @@ API_URL = os.environ.get("API_URL", "https://api.swissairdry.ch")
 MQTT_BROKER = os.environ.get("MQTT_BROKER", "mqtt.swissairdry.ch")
 MQTT_PORT = int(os.environ.get("MQTT_PORT", 1883))
 
+# HTTP-Client für den API-Proxy
+PROXY_MAX_CONNECTIONS = int(os.environ.get("PROXY_MAX_CONNECTIONS", 20))
+PROXY_MAX_KEEPALIVE = int(os.environ.get("PROXY_MAX_KEEPALIVE", 10))
+PROXY_CONCURRENCY = int(os.environ.get("PROXY_CONCURRENCY", 50))
+PROXY_TIMEOUT = float(os.environ.get("PROXY_TIMEOUT", 10))
+PROXY_CONNECT_TIMEOUT = float(os.environ.get("PROXY_CONNECT_TIMEOUT", 3))
+# Abweichende Timeouts je Upstream-Host als JSON, z.B. {"api.swissairdry.ch": 5}
+PROXY_UPSTREAM_TIMEOUTS = json.loads(os.environ.get("PROXY_UPSTREAM_TIMEOUTS", "{}") or "{}")
+
+# Zwischenspeicher für Benutzereinstellungen
+USER_SETTINGS_CACHE_TTL = float(os.environ.get("USER_SETTINGS_CACHE_TTL", 60))
+USER_SETTINGS_CACHE_SIZE = int(os.environ.get("USER_SETTINGS_CACHE_SIZE", 1000))
+
+# HTTP/2 nur, wenn das Paket h2 installiert ist
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
 # Logging konfigurieren
 logging.basicConfig(
     level=logging.DEBUG if DEBUG else logging.INFO,
@@ -68,6 +93,33 @@ except:
 # Nextcloud-App initialisieren
 nc_app = NextcloudApp()
 
+# Gemeinsamer HTTP-Client mit Verbindungspool, wird beim Start erstellt
+http_client: Optional[httpx.AsyncClient] = None
+# Begrenzt die gleichzeitigen Proxy-Anfragen
+proxy_semaphore: Optional[asyncio.Semaphore] = None
+
+# Kennzahlen des API-Proxys
+proxy_metrics = {
+    "requests": 0,
+    "errors": 0,
+    "timeouts": 0,
+    "in_flight": 0,
+    "upstreams": {},
+}
+
+# Zwischenspeicher für Benutzereinstellungen: Benutzer-ID -> (Ablaufzeit, Einstellungen)
+settings_cache: "OrderedDict[str, Tuple[float, UserSettings]]" = OrderedDict()
+# Laufende Ladevorgänge je Benutzer, damit gleichzeitige Anfragen nur einmal laden
+settings_loads: Dict[str, "asyncio.Future"] = {}
+# Wird bei jedem Speichern erhöht, damit ein älterer Ladevorgang den Cache nicht überschreibt
+settings_versions: Dict[str, int] = {}
+
+# Header, die nicht an die API weitergegeben werden
+HOP_BY_HOP_HEADERS = {
+    "host", "cookie", "user-agent", "content-length", "connection",
+    "keep-alive", "transfer-encoding", "upgrade",
+}
+
 
 # Modelle
 class APICredentials(BaseModel):
@@ -95,17 +147,8 @@ class UserSettings(BaseModel):
 
 
 # Hilfsfunktionen
-def get_user_settings(user_id: str) -> UserSettings:
-    """Lädt Benutzereinstellungen aus Nextcloud"""
-    try:
-        # Versuche, Einstellungen aus Nextcloud zu laden
-        settings_json = nc_app.user_settings.get_settings("swissairdry_settings", user_id=user_id)
-        if settings_json:
-            return UserSettings.parse_raw(settings_json)
-    except Exception as e:
-        logger.warning(f"Fehler beim Laden der Benutzereinstellungen: {e}")
-    
-    # Standardeinstellungen verwenden
+def default_user_settings() -> UserSettings:
+    """Gibt die Standardeinstellungen zurück"""
     return UserSettings(
         api_credentials=APICredentials(
             api_url=API_URL,
@@ -118,25 +161,162 @@ def get_user_settings(user_id: str) -> UserSettings:
     )
 
 
-def save_user_settings(user_id: str, settings: UserSettings) -> bool:
-    """Speichert Benutzereinstellungen in Nextcloud"""
+def fetch_user_settings(user_id: str) -> Optional[UserSettings]:
+    """
+    Lädt Benutzereinstellungen aus Nextcloud.
+    
+    Gibt None zurück, wenn Nextcloud nicht erreichbar ist, damit das
+    Ergebnis nicht zwischengespeichert wird.
+    """
+    try:
+        settings_json = nc_app.user_settings.get_settings("swissairdry_settings", user_id=user_id)
+    except Exception as e:
+        logger.warning(f"Fehler beim Laden der Benutzereinstellungen: {e}")
+        return None
+    
+    if settings_json:
+        try:
+            return UserSettings.parse_raw(settings_json)
+        except Exception as e:
+            logger.warning(f"Ungültige Benutzereinstellungen für {user_id}: {e}")
+    
+    # Keine gespeicherten Einstellungen: Standardeinstellungen verwenden
+    return default_user_settings()
+
+
+def cache_user_settings(user_id: str, settings: UserSettings):
+    """Legt Einstellungen im Zwischenspeicher ab und verdrängt bei Bedarf den ältesten Eintrag"""
+    if USER_SETTINGS_CACHE_TTL <= 0:
+        return
+    settings_cache[user_id] = (time.monotonic() + USER_SETTINGS_CACHE_TTL, settings)
+    settings_cache.move_to_end(user_id)
+    while len(settings_cache) > USER_SETTINGS_CACHE_SIZE:
+        settings_cache.popitem(last=False)
+
+
+async def get_user_settings(user_id: str) -> UserSettings:
+    """
+    Gibt die Benutzereinstellungen zurück.
+    
+    Die Einstellungen werden USER_SETTINGS_CACHE_TTL Sekunden zwischengespeichert.
+    Gleichzeitige Anfragen desselben Benutzers warten auf einen gemeinsamen
+    Ladevorgang, statt Nextcloud mehrfach abzufragen.
+    """
+    entry = settings_cache.get(user_id)
+    if entry is not None:
+        if entry[0] > time.monotonic():
+            settings_cache.move_to_end(user_id)
+            return entry[1]
+        del settings_cache[user_id]
+    
+    pending = settings_loads.get(user_id)
+    if pending is None:
+        pending = asyncio.get_running_loop().create_future()
+        settings_loads[user_id] = pending
+        version = settings_versions.get(user_id, 0)
+        try:
+            # Der Nextcloud-Aufruf ist blockierend und läuft daher in einem Thread
+            settings = await asyncio.to_thread(fetch_user_settings, user_id)
+        except asyncio.CancelledError:
+            pending.cancel()
+            raise
+        except Exception as e:
+            pending.set_exception(e)
+            # Ausnahme als abgerufen markieren, falls niemand wartet
+            pending.exception()
+            raise
+        finally:
+            settings_loads.pop(user_id, None)
+        
+        if settings is None:
+            settings = default_user_settings()
+        elif settings_versions.get(user_id, 0) == version:
+            cache_user_settings(user_id, settings)
+        pending.set_result(settings)
+        return settings
+    
+    return await asyncio.shield(pending)
+
+
+async def save_user_settings(user_id: str, settings: UserSettings) -> bool:
+    """Speichert Benutzereinstellungen in Nextcloud und aktualisiert den Zwischenspeicher"""
+    # Laufende Ladevorgänge dürfen ihr (veraltetes) Ergebnis nicht mehr ablegen
+    settings_versions[user_id] = settings_versions.get(user_id, 0) + 1
+    settings_cache.pop(user_id, None)
     try:
-        nc_app.user_settings.set_settings(
+        await asyncio.to_thread(
+            nc_app.user_settings.set_settings,
             "swissairdry_settings", 
             settings.json(), 
             user_id=user_id
         )
-        return True
     except Exception as e:
         logger.error(f"Fehler beim Speichern der Benutzereinstellungen: {e}")
         return False
+    
+    cache_user_settings(user_id, settings)
+    return True
+
+
+def upstream_timeout(url: str) -> httpx.Timeout:
+    """Gibt den Timeout für einen Upstream-Host zurück"""
+    host = urlsplit(url).hostname or ""
+    total = float(PROXY_UPSTREAM_TIMEOUTS.get(host, PROXY_TIMEOUT))
+    return httpx.Timeout(total, connect=min(PROXY_CONNECT_TIMEOUT, total))
+
+
+def record_proxy_request(host: str, status_code: Optional[int], duration: float, error: Optional[str] = None):
+    """Aktualisiert die Proxy-Kennzahlen für einen Upstream"""
+    upstream = proxy_metrics["upstreams"].setdefault(host, {
+        "requests": 0,
+        "errors": 0,
+        "total_time": 0.0,
+        "last_status": None,
+    })
+    upstream["requests"] += 1
+    upstream["total_time"] += duration
+    upstream["last_status"] = status_code
+    if error is not None:
+        upstream["errors"] += 1
+        proxy_metrics["errors"] += 1
+        if error == "timeout":
+            proxy_metrics["timeouts"] += 1
+
+
+@app.on_event("startup")
+async def startup_event():
+    """Erstellt den gemeinsamen HTTP-Client"""
+    global http_client, proxy_semaphore
+    
+    http_client = httpx.AsyncClient(
+        http2=HTTP2_AVAILABLE,
+        limits=httpx.Limits(
+            max_connections=PROXY_MAX_CONNECTIONS,
+            max_keepalive_connections=PROXY_MAX_KEEPALIVE,
+        ),
+        timeout=httpx.Timeout(PROXY_TIMEOUT, connect=PROXY_CONNECT_TIMEOUT),
+    )
+    proxy_semaphore = asyncio.Semaphore(PROXY_CONCURRENCY)
+    logger.info(f"HTTP-Client für den API-Proxy erstellt (HTTP/2: {HTTP2_AVAILABLE})")
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Schließt den gemeinsamen HTTP-Client"""
+    if http_client is not None:
+        await http_client.aclose()
 
 
 # API-Routen
 @app.get("/health")
 async def health_check():
     """Gesundheitscheck-Endpunkt für Container-Prüfung"""
-    return {"status": "ok", "version": "2.1.0"}
+    return {
+        "status": "ok",
+        "version": "2.1.0",
+        "proxy": proxy_metrics,
+        "settings_cache": {"entries": len(settings_cache), "loading": len(settings_loads)},
+    }
 
 
 @app.get("/enabled", response_model=EnabledInfo)
@@ -165,7 +345,7 @@ async def app_capabilities():
 async def index(request: Request, user_info: UserInfo = Depends(app_api_auth)):
     """Hauptseite der App"""
     # Benutzereinstellungen laden
-    settings = get_user_settings(user_info.id)
+    settings = await get_user_settings(user_info.id)
     
     return templates.TemplateResponse(
         "index.html",
@@ -182,7 +362,7 @@ async def index(request: Request, user_info: UserInfo = Depends(app_api_auth)):
 async def settings_page(request: Request, user_info: UserInfo = Depends(app_api_auth)):
     """Einstellungsseite der App"""
     # Benutzereinstellungen laden
-    settings = get_user_settings(user_info.id)
+    settings = await get_user_settings(user_info.id)
     
     return templates.TemplateResponse(
         "settings.html",
@@ -200,7 +380,7 @@ async def update_settings(
     user_info: UserInfo = Depends(app_api_auth)
 ):
     """Aktualisiert die Benutzereinstellungen"""
-    success = save_user_settings(user_info.id, settings)
+    success = await save_user_settings(user_info.id, settings)
     
     if not success:
         raise HTTPException(
@@ -218,10 +398,8 @@ async def proxy_api(
     user_info: UserInfo = Depends(app_api_auth)
 ):
     """Proxy-Endpunkt zur Weiterleitung an die SwissAirDry API"""
-    import requests
-    
     # Benutzereinstellungen laden
-    settings = get_user_settings(user_info.id)
+    settings = await get_user_settings(user_info.id)
     
     # API-Zugangsdaten überprüfen
     if not settings.api_credentials.api_key:
@@ -230,39 +408,67 @@ async def proxy_api(
             detail="API-Schlüssel nicht konfiguriert"
         )
     
-    # Header und Query-Parameter kopieren
-    headers = dict(request.headers)
+    # Header kopieren, Cookies, User-Agent und Verbindungs-Header entfernen
+    headers = {
+        key: value for key, value in request.headers.items()
+        if key.lower() not in HOP_BY_HOP_HEADERS
+    }
     headers["X-API-Key"] = settings.api_credentials.api_key
     
-    # Cookies und User-Agent entfernen
-    headers.pop("cookie", None)
-    headers.pop("user-agent", None)
-    
     # URL zusammensetzen
     url = f"{settings.api_credentials.api_url}/{path}"
+    host = urlsplit(url).hostname or ""
+    
+    body = await request.body() if request.method in ["POST", "PUT"] else None
     
+    proxy_metrics["requests"] += 1
+    proxy_metrics["in_flight"] += 1
+    start_time = time.monotonic()
     try:
-        # Request an die API weiterleiten
-        response = requests.request(
-            method=request.method,
-            url=url,
-            headers=headers,
-            params=dict(request.query_params),
-            json=await request.json() if request.method in ["POST", "PUT"] else None,
-            timeout=10,
-        )
-        
-        # Antwort zurücksenden
-        return JSONResponse(
-            content=response.json() if response.content else {},
-            status_code=response.status_code,
+        # Request über den gemeinsamen Client weiterleiten (Keep-Alive, begrenzte Parallelität)
+        async with proxy_semaphore:
+            response = await http_client.request(
+                method=request.method,
+                url=url,
+                headers=headers,
+                params=dict(request.query_params),
+                content=body,
+                timeout=upstream_timeout(url),
+            )
+        record_proxy_request(host, response.status_code, time.monotonic() - start_time)
+    except httpx.TimeoutException as e:
+        record_proxy_request(host, None, time.monotonic() - start_time, "timeout")
+        logger.error(f"Zeitüberschreitung bei API-Proxy-Anfrage an {host}: {e}")
+        raise HTTPException(
+            status_code=504,
+            detail="Zeitüberschreitung bei der Kommunikation mit der API"
         )
-    except Exception as e:
+    except httpx.HTTPError as e:
+        record_proxy_request(host, None, time.monotonic() - start_time, "error")
         logger.error(f"Fehler bei API-Proxy-Anfrage: {e}")
         raise HTTPException(
             status_code=502,
             detail=f"Fehler bei der Kommunikation mit der API: {str(e)}"
         )
+    finally:
+        proxy_metrics["in_flight"] -= 1
+    
+    # Antwort zurücksenden
+    content_type = response.headers.get("content-type", "")
+    if not response.content:
+        return JSONResponse(content={}, status_code=response.status_code)
+    if "json" in content_type:
+        # JSON unverändert durchreichen, ohne es neu zu serialisieren
+        return Response(
+            content=response.content,
+            status_code=response.status_code,
+            media_type="application/json",
+        )
+    return Response(
+        content=response.content,
+        status_code=response.status_code,
+        media_type=content_type or None,
+    )
 
 
 if __name__ == "__main__":
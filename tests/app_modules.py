@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Lädt Module aus swissairdry/api/app direkt aus ihren Dateien
+
+Das Paket swissairdry.api.app lässt sich derzeit nicht importieren: Das leere
+Paket models/ verdeckt models.py, an dem die Paket-Initialisierung scheitert.
+Die Tests laden die benötigten Module deshalb per Pfad. Für die Dauer des
+Ladens steht ein leeres Paketobjekt für swissairdry.api.app, damit die
+absoluten Importe der Module untereinander funktionieren; danach wird
+sys.modules wiederhergestellt.
+"""
+
+import sys
+import types
+import importlib.util
+from pathlib import Path
+
+APP_DIR = Path(__file__).resolve().parent.parent / "swissairdry" / "api" / "app"
+PACKAGE = "swissairdry.api.app"
+
+
+def _package_modules():
+    return {
+        key: module for key, module in sys.modules.items()
+        if key == PACKAGE or key.startswith(PACKAGE + ".")
+    }
+
+
+def load_app_modules(*names):
+    """
+    Lädt swissairdry.api.app.<name> für alle names aus ihren Dateien.
+
+    Abhängigkeiten müssen vor den Modulen stehen, die sie importieren
+    (z.B. "database", "models", "delta_sync").
+
+    Returns:
+        Die geladenen Module in der Reihenfolge von names
+    """
+    saved = _package_modules()
+    package = types.ModuleType(PACKAGE)
+    package.__path__ = [str(APP_DIR)]
+    sys.modules[PACKAGE] = package
+    loaded = []
+    try:
+        for name in names:
+            full_name = f"{PACKAGE}.{name}"
+            spec = importlib.util.spec_from_file_location(full_name, APP_DIR / f"{name}.py")
+            module = importlib.util.module_from_spec(spec)
+            sys.modules[full_name] = module
+            spec.loader.exec_module(module)
+            setattr(package, name, module)
+            loaded.append(module)
+    finally:
+        for key in _package_modules():
+            if key not in saved:
+                del sys.modules[key]
+        sys.modules.update(saved)
+    return loaded
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Tests für Circuit Breaker und Retry-Budget
+"""
+
+import asyncio
+
+import pytest
+
+from tests.app_modules import load_app_modules
+
+# circuit_breaker benötigt requests (optionale Abhängigkeit der Tests)
+pytest.importorskip("requests")
+(circuit_breaker,) = load_app_modules("circuit_breaker")
+CircuitBreaker = circuit_breaker.CircuitBreaker
+CircuitOpenError = circuit_breaker.CircuitOpenError
+RetryBudget = circuit_breaker.RetryBudget
+
+
+class FakeClock:
+    """Manuell fortgeschriebene Zeitquelle"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def failing():
+    raise ConnectionError("nicht erreichbar")
+
+
+class TestCircuitBreaker:
+    """Testklasse für die Zustandswechsel des Breakers"""
+
+    def test_closed_open_half_open_closed(self):
+        """Nach dem Schwellwert öffnet der Breaker, nach dem Timeout schließt eine erfolgreiche Probe"""
+        clock = FakeClock()
+        breaker = CircuitBreaker("api", failure_threshold=2, reset_timeout=30, clock=clock)
+
+        for _ in range(2):
+            with pytest.raises(ConnectionError):
+                breaker.call(failing)
+        assert breaker.state == circuit_breaker.OPEN
+        with pytest.raises(CircuitOpenError):
+            breaker.call(lambda: "ok")
+
+        clock.now += 30
+        assert breaker.state == circuit_breaker.HALF_OPEN
+        assert breaker.call(lambda: "ok") == "ok"
+        assert breaker.state == circuit_breaker.CLOSED
+
+    def test_failed_probe_reopens(self):
+        """Eine fehlgeschlagene Probe öffnet den Breaker für eine weitere Wartezeit"""
+        clock = FakeClock()
+        breaker = CircuitBreaker("api", failure_threshold=1, reset_timeout=30, clock=clock)
+        with pytest.raises(ConnectionError):
+            breaker.call(failing)
+
+        clock.now += 30
+        with pytest.raises(ConnectionError):
+            breaker.call(failing)
+        assert breaker.state == circuit_breaker.OPEN
+        assert breaker.retry_after() == 30
+
+    def test_half_open_allows_single_probe(self):
+        """Im halb offenen Zustand wird nur ein Probeaufruf zugelassen"""
+        clock = FakeClock()
+        breaker = CircuitBreaker("api", failure_threshold=1, reset_timeout=30, clock=clock)
+        breaker.record_failure()
+
+        clock.now += 30
+        assert breaker.allow()
+        assert not breaker.allow()
+
+    def test_cancelled_probe_releases_breaker(self):
+        """Ein abgebrochener Probeaufruf blockiert weitere Proben nicht"""
+        clock = FakeClock()
+        breaker = CircuitBreaker("api", failure_threshold=1, reset_timeout=30, clock=clock)
+        breaker.record_failure()
+        clock.now += 30
+
+        async def cancelled():
+            raise asyncio.CancelledError()
+
+        with pytest.raises(asyncio.CancelledError):
+            asyncio.run(breaker.call_async(cancelled))
+        assert breaker.allow()
+
+
+class TestRetryBudget:
+    """Testklasse für das Retry-Budget"""
+
+    def test_budget_grows_with_requests_and_expires(self):
+        """Erlaubt sind min_retries plus ratio mal die Anfragen im Zeitfenster"""
+        budget = RetryBudget(ratio=0.5, min_retries=1, window=10)
+        for _ in range(4):
+            budget.record_request(now=100.0)
+
+        assert [budget.try_retry(now=100.0) for _ in range(4)] == [True, True, True, False]
+        # Nach Ablauf des Fensters gilt nur noch das Mindestbudget
+        assert budget.try_retry(now=111.0)
+        assert not budget.try_retry(now=111.0)
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Tests für die Komprimierungs-Middleware des SwissAirDry-Projekts
+"""
+
+import asyncio
+import gzip
+
+from swissairdry.api.compression import CompressionMiddleware
+
+
+def make_app(chunks, content_type=b"application/json"):
+    """Erstellt eine minimale ASGI-App, die die angegebenen Chunks sendet"""
+    async def app(scope, receive, send):
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [(b"content-type", content_type)],
+        })
+        for index, chunk in enumerate(chunks):
+            await send({
+                "type": "http.response.body",
+                "body": chunk,
+                "more_body": index < len(chunks) - 1,
+            })
+    return app
+
+
+def run(app, accept_encoding=b"gzip"):
+    """Führt eine Anfrage gegen die App aus und sammelt die gesendeten Nachrichten"""
+    messages = []
+
+    async def send(message):
+        messages.append(message)
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    scope = {
+        "type": "http",
+        "method": "GET",
+        "headers": [(b"accept-encoding", accept_encoding)],
+    }
+    asyncio.run(app(scope, receive, send))
+    return messages
+
+
+class TestCompressionMiddleware:
+    """Testklasse für die Komprimierungs-Middleware"""
+
+    def test_small_response_not_compressed(self):
+        """Kleine Antworten bleiben unverändert"""
+        app = CompressionMiddleware(make_app([b'{"a":1}']), minimum_size=100)
+        messages = run(app)
+
+        headers = dict(messages[0]["headers"])
+        assert b"content-encoding" not in headers
+        assert messages[1]["body"] == b'{"a":1}'
+
+    def test_large_response_compressed(self):
+        """Große Antworten werden gzip-komprimiert"""
+        body = b'{"values":[' + b",".join(b"1" for _ in range(2000)) + b"]}"
+        app = CompressionMiddleware(make_app([body]), minimum_size=100)
+        messages = run(app)
+
+        headers = dict(messages[0]["headers"])
+        assert headers[b"content-encoding"] == b"gzip"
+        assert int(headers[b"content-length"]) == len(messages[1]["body"])
+        assert gzip.decompress(messages[1]["body"]) == body
+
+    def test_content_type_not_in_allowlist(self):
+        """Nicht freigegebene Content-Types werden nicht komprimiert"""
+        body = b"\x00" * 5000
+        app = CompressionMiddleware(make_app([body], b"application/octet-stream"), minimum_size=100)
+        messages = run(app)
+
+        assert b"content-encoding" not in dict(messages[0]["headers"])
+        assert messages[1]["body"] == body
+
+    def test_streaming_response_compressed_per_chunk(self):
+        """Gestreamte Antworten werden ohne Pufferung Chunk für Chunk komprimiert"""
+        chunks = [b"id;value\n", b"1;22.5\n" * 50, b"2;23.0\n" * 50]
+        app = CompressionMiddleware(make_app(chunks, b"text/csv"), minimum_size=100000)
+        messages = run(app)
+
+        headers = dict(messages[0]["headers"])
+        assert headers[b"content-encoding"] == b"gzip"
+        assert b"content-length" not in headers
+
+        # Für jeden Eingabe-Chunk wird sofort ein komprimierter Chunk gesendet
+        body_messages = messages[1:]
+        assert len(body_messages) == len(chunks)
+        assert all(message["more_body"] for message in body_messages[:-1])
+        compressed = b"".join(message["body"] for message in body_messages)
+        assert gzip.decompress(compressed) == b"".join(chunks)
+
+    def test_client_without_gzip_support(self):
+        """Ohne passende Accept-Encoding wird nicht komprimiert"""
+        body = b"x" * 5000
+        app = CompressionMiddleware(make_app([body], b"text/plain"), minimum_size=100)
+        messages = run(app, accept_encoding=b"identity")
+
+        assert b"content-encoding" not in dict(messages[0]["headers"])
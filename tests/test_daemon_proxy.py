@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Tests für den API-Proxy des ExApp-Daemons
+"""
+
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip("flask")
+pytest.importorskip("flask_cors")
+pytest.importorskip("requests")
+pytest.importorskip("paho.mqtt.client")
+
+from nextcloud import daemon
+
+
+class RecordingHandler(BaseHTTPRequestHandler):
+    """Gegenstelle, die Header und Inhalt der letzten Anfrage speichert"""
+
+    received = {}
+
+    def do_POST(self):
+        length = self.headers.get("Content-Length")
+        body = self.rfile.read(int(length)) if length else b""
+        RecordingHandler.received = {"headers": dict(self.headers), "body": body}
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"{}")
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    """Startet die Gegenstelle und leitet den Proxy dorthin"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), RecordingHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setattr(daemon, "API_URL", f"http://127.0.0.1:{server.server_address[1]}")
+    yield RecordingHandler
+    server.shutdown()
+    server.server_close()
+
+
+class TestApiProxy:
+    """Testklasse für die Weiterleitung von Anfragen"""
+
+    def test_post_body_is_forwarded_with_content_length(self, upstream):
+        """Ein POST-Inhalt wird mit Content-Length und ohne chunked weitergeleitet"""
+        body = b'{"device_id": "SAD-001", "humidity": 55.0}'
+        client = daemon.app.test_client()
+
+        response = client.post(
+            "/api/proxy?path=devices", data=body, headers={"Content-Type": "application/json"}
+        )
+
+        assert response.status_code == 200
+        headers = {k.lower(): v for k, v in upstream.received["headers"].items()}
+        assert headers["content-length"] == str(len(body))
+        assert "transfer-encoding" not in headers
+        assert upstream.received["body"] == body
+
+    def test_cache_key_and_vary(self, monkeypatch):
+        """Accept-Encoding unterscheidet Cache-Einträge, Vary auf andere Header verhindert das Speichern"""
+        import requests
+
+        monkeypatch.setattr(daemon, "PROXY_CACHE_TTL", 60)
+        with daemon.app.test_request_context("/api/proxy", headers={"Accept-Encoding": "gzip"}):
+            gzip_key = daemon.proxy_cache_key("http://api/devices")
+        with daemon.app.test_request_context("/api/proxy"):
+            plain_key = daemon.proxy_cache_key("http://api/devices")
+        assert gzip_key != plain_key
+
+        resp = requests.Response()
+        resp.status_code = 200
+        resp.headers.update({"Content-Length": "2", "Vary": "Accept-Encoding"})
+        assert daemon.is_cacheable(resp)
+        resp.headers["Vary"] = "Accept-Encoding, User-Agent"
+        assert not daemon.is_cacheable(resp)
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Tests für den Metadaten-Cache der Deck-Integration
+"""
+
+import pytest
+
+from swissairdry.integration.deck import DeckAPIException, SwissAirDryDeckIntegration
+from swissairdry.integration.deck.cache import DeckMetadataCache, NOT_MODIFIED
+
+
+class TestDeckMetadataCache:
+    """Testklasse für TTL und ETag-Revalidierung"""
+
+    def test_fresh_entry_is_not_fetched_again(self):
+        """Innerhalb der TTL wird die Abruffunktion nicht erneut aufgerufen"""
+        calls = []
+
+        def fetch(etag):
+            calls.append(etag)
+            return [{"id": 1}], '"v1"'
+
+        cache = DeckMetadataCache(ttl=60)
+        assert cache.get("boards", fetch) == [{"id": 1}]
+        assert cache.get("boards", fetch) == [{"id": 1}]
+        assert calls == [None]
+
+    def test_expired_entry_is_revalidated_with_etag(self):
+        """Nach Ablauf der TTL wird mit dem ETag revalidiert, 304 behält den Eintrag"""
+        calls = []
+
+        def fetch(etag):
+            calls.append(etag)
+            return NOT_MODIFIED if etag else ([{"id": 1}], '"v1"')
+
+        cache = DeckMetadataCache(ttl=0)
+        cache.get("stacks:1", fetch)
+        assert cache.get("stacks:1", fetch) == [{"id": 1}]
+        assert calls == [None, '"v1"']
+        assert cache.status()["revalidated"] == 1
+
+    def test_placeholder_card_is_not_remembered(self):
+        """Die Platzhalter-ID wird keinem Gerät zugeordnet"""
+        integration = SwissAirDryDeckIntegration()
+        assert integration.add_device_card(1, "SAD-001", "Trockner 1") == 1
+        assert integration.metadata.card_for_device("SAD-001") is None
+
+    def test_read_errors_are_deck_api_exceptions(self):
+        """HTTP-Fehler beim Laden der Metadaten werden als DeckAPIException gemeldet"""
+        requests = pytest.importorskip("requests")
+
+        class FailingSession:
+            def get(self, url, **kwargs):
+                response = requests.Response()
+                response.status_code = 500
+                return response
+
+        integration = SwissAirDryDeckIntegration("https://cloud.example.com", "user", "secret")
+        integration.client._session = FailingSession()
+        with pytest.raises(DeckAPIException):
+            integration.client.get_boards()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Tests für den Deck-Client der Nextcloud-Integration
+"""
+
+import asyncio
+
+import pytest
+
+from swissairdry.integration.deck import DeckAPIException, SwissAirDryDeckIntegration
+
+DECK_URL = "https://cloud.example.com/index.php/apps/deck/api/v1.0"
+STACK_TITLES = ["In Vorbereitung", "In Bearbeitung", "Abgeschlossen", "Alarme"]
+
+
+class FakeResponse:
+    """Antwort der Deck-API mit festem Status und Inhalt"""
+
+    def __init__(self, status_code, data=None):
+        self.status_code = status_code
+        self.data = data
+        self.headers = {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            import requests
+            raise requests.HTTPError(f"{self.status_code} Fehler")
+
+    def json(self):
+        return self.data
+
+
+class FakeSession:
+    """Simuliert die Deck-API: ein Board mit Stacks, neue Objekte werden fortlaufend nummeriert"""
+
+    def __init__(self, status_code=200):
+        self.status_code = status_code
+        self.calls = []
+        self.next_id = 100
+
+    def get(self, url, **kwargs):
+        self.calls.append(("GET", url))
+        if url.endswith("/boards"):
+            return FakeResponse(self.status_code, [{"id": 7, "title": "SwissAirDry"}])
+        if url.endswith("/stacks"):
+            stacks = [{"id": 70 + i, "title": title} for i, title in enumerate(STACK_TITLES)]
+            return FakeResponse(self.status_code, stacks)
+        return FakeResponse(self.status_code, {"id": 7, "labels": []})
+
+    def request(self, method, url, json=None, **kwargs):
+        self.calls.append((method, url))
+        self.next_id += 1
+        return FakeResponse(self.status_code, {"id": self.next_id})
+
+
+def online_integration(session, **kwargs):
+    """Integration mit konfigurierter URL, deren Session durch session ersetzt ist"""
+    integration = SwissAirDryDeckIntegration("https://cloud.example.com", "user", "secret", **kwargs)
+    integration.deck_client._session = session
+    return integration
+
+
+class TestDeckClient:
+    """Testklasse für Initialisierung, Kartenanlage und Fehlerbehandlung"""
+
+    def test_initialize_uses_existing_board_and_stacks(self):
+        """Vorhandenes Board und Stacks werden übernommen, nichts wird angelegt"""
+        session = FakeSession()
+        integration = online_integration(session, board_name="SwissAirDry")
+
+        assert asyncio.run(integration.initialize())
+        assert integration.board_id == 7
+        assert integration.stacks == {"new": 70, "in_progress": 71, "done": 72, "alarms": 73}
+        assert all(method == "GET" for method, url in session.calls)
+
+    def test_initialize_creates_missing_board(self):
+        """Fehlt das Board, werden Board und Stacks angelegt"""
+        session = FakeSession()
+        integration = online_integration(session, board_name="SwissAirDry ExApp")
+
+        assert asyncio.run(integration.initialize())
+        assert ("POST", f"{DECK_URL}/boards") in session.calls
+        assert integration.board_id == integration.main_board_id != 7
+
+    def test_alarm_card_is_one_request(self):
+        """Nach der Initialisierung kostet eine Alarmkarte genau eine Anfrage"""
+        session = FakeSession()
+        integration = online_integration(session, board_name="SwissAirDry")
+        asyncio.run(integration.initialize())
+        asyncio.run(integration.create_alarm_card("SAD-001", "Feuchte", "zu hoch"))
+
+        session.calls.clear()
+        assert asyncio.run(integration.create_alarm_card("SAD-002", "Feuchte", "zu hoch"))
+        assert session.calls == [("POST", f"{DECK_URL}/boards/7/stacks/73/cards")]
+
+    def test_device_card_is_reused(self):
+        """Für ein Gerät wird nur eine Karte angelegt und ihre ID vermerkt"""
+        session = FakeSession()
+        integration = online_integration(session)
+        card_id = integration.add_device_card(7, "SAD-001", "Trockner 1")
+
+        assert integration.add_device_card(7, "SAD-001", "Trockner 1") == card_id
+        assert integration.metadata.card_for_device("SAD-001") == card_id
+        assert [call for call in session.calls if call[0] == "POST"] == [
+            ("POST", f"{DECK_URL}/boards/7/stacks/70/cards")
+        ]
+
+    def test_http_errors_are_deck_api_exceptions(self):
+        """HTTP-Fehler werden als DeckAPIException gemeldet, die Karten-Methoden liefern False"""
+        pytest.importorskip("requests")
+        integration = online_integration(FakeSession(status_code=500))
+
+        with pytest.raises(DeckAPIException):
+            integration.client.create_card(7, 70, "Karte")
+        assert not asyncio.run(integration.initialize())
+        assert not asyncio.run(integration.create_alarm_card("SAD-001", "Feuchte", "zu hoch"))
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Tests für die Delta-Synchronisation zur ExApp
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from tests.app_modules import load_app_modules
+
+pytest.importorskip("sqlalchemy")
+pytest.importorskip("dotenv")
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+# Die echten Modelle aus models.py, nicht das leere Paket models/
+database, models, delta_sync = load_app_modules("database", "models", "delta_sync")
+
+
+class FakeClock:
+    """Manuell fortgeschriebene Zeitquelle"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class Recorder:
+    """Sammelt die gesendeten Batches, optional mit Fehlschlag ab einem Aufruf"""
+
+    def __init__(self, fail_from: int = None):
+        self.batches = []
+        self.fail_from = fail_from
+
+    def __call__(self, entity, changes):
+        if self.fail_from is not None and len(self.batches) >= self.fail_from:
+            return False
+        self.batches.append((entity, [change["id"] for change in changes]))
+        return True
+
+    def ids(self, entity):
+        return [i for name, ids in self.batches if name == entity for i in ids]
+
+
+@pytest.fixture
+def session_factory():
+    """SQLite-Datenbank im Speicher mit allen Tabellen"""
+    engine = create_engine("sqlite://")
+    models.Base.metadata.create_all(engine)
+    return sessionmaker(bind=engine)
+
+
+def add_devices(session_factory, count, updated_at):
+    db = session_factory()
+    for i in range(count):
+        db.add(models.Device(id=f"d{i + 1}", device_id=f"SAD-{i + 1:03d}", name=f"Trockner {i + 1}",
+                             updated_at=updated_at))
+    db.commit()
+    db.close()
+
+
+class TestDeltaSync:
+    """Testklasse für Wasserstandsmarken, Batches und Checkpoints"""
+
+    def test_pages_through_changes_once(self, session_factory, tmp_path):
+        """Änderungen werden seitenweise und nur einmal übertragen"""
+        add_devices(session_factory, 5, datetime.utcnow() - timedelta(minutes=1))
+        send = Recorder()
+        engine = delta_sync.DeltaSyncEngine(
+            session_factory, send, str(tmp_path / "checkpoint.json"), batch_size=2, lag=5
+        )
+
+        engine.run_once()
+        assert [len(ids) for entity, ids in send.batches if entity == "devices"] == [2, 2, 1]
+        assert send.ids("devices") == ["d1", "d2", "d3", "d4", "d5"]
+
+        engine.run_once()
+        assert send.ids("devices") == ["d1", "d2", "d3", "d4", "d5"]
+
+    def test_updated_row_is_sent_again(self, session_factory, tmp_path):
+        """Eine spätere Änderung schiebt den Datensatz hinter die Marke"""
+        add_devices(session_factory, 3, datetime.utcnow() - timedelta(minutes=2))
+        send = Recorder()
+        engine = delta_sync.DeltaSyncEngine(session_factory, send, str(tmp_path / "checkpoint.json"), lag=5)
+        engine.run_once()
+
+        db = session_factory()
+        db.query(models.Device).filter(models.Device.id == "d1").update(
+            {"updated_at": datetime.utcnow() - timedelta(minutes=1)}
+        )
+        db.commit()
+        db.close()
+
+        engine.run_once()
+        assert send.ids("devices") == ["d1", "d2", "d3", "d1"]
+
+    def test_resumes_from_checkpoint(self, session_factory, tmp_path):
+        """Nach einem Fehlschlag setzt eine neue Instanz beim letzten Checkpoint fort"""
+        add_devices(session_factory, 4, datetime.utcnow() - timedelta(minutes=1))
+        path = str(tmp_path / "checkpoint.json")
+
+        failing = Recorder(fail_from=1)
+        with pytest.raises(RuntimeError):
+            delta_sync.DeltaSyncEngine(session_factory, failing, path, batch_size=2, lag=5).run_once()
+        assert failing.ids("devices") == ["d1", "d2"]
+
+        resumed = Recorder()
+        delta_sync.DeltaSyncEngine(session_factory, resumed, path, batch_size=2, lag=5).run_once()
+        assert resumed.ids("devices") == ["d3", "d4"]
+
+    def test_recent_rows_are_held_back(self, session_factory, tmp_path):
+        """Zu junge Änderungen und ids werden erst nach Ablauf von lag übertragen"""
+        add_devices(session_factory, 1, datetime.utcnow() + timedelta(minutes=1))
+        db = session_factory()
+        db.add(models.SensorData(device_id="d1", humidity=55.0))
+        db.commit()
+        db.close()
+
+        clock = FakeClock()
+        send = Recorder()
+        engine = delta_sync.DeltaSyncEngine(
+            session_factory, send, str(tmp_path / "checkpoint.json"), lag=5, clock=clock
+        )
+        engine.run_once()
+        assert send.ids("devices") == []
+        assert send.ids("sensor_data") == []
+
+        clock.now += 5
+        engine.run_once()
+        assert send.ids("sensor_data") == [1]
@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Tests für die Offline-Erkennung
+"""
+
+from tests.app_modules import load_app_modules
+
+(offline_detector,) = load_app_modules("offline_detector")
+OfflineDetector = offline_detector.OfflineDetector
+
+
+class TestOfflineDetector:
+    """Testklasse für Fristen und Meldeintervalle"""
+
+    def test_report_interval_sets_deadline(self):
+        """Ein Gerät gilt nach missed_reports verpassten Meldungen als offline"""
+        detector = OfflineDetector(timeout=900, missed_reports=3, tick=5, now=1000.0)
+        detector.heartbeat("SAD-001", timestamp=1000.0, report_interval=60)
+
+        assert detector.expired(now=1175.0) == []
+        assert detector.expired(now=1185.0) == [("SAD-001", 1000.0)]
+
+    def test_string_interval_is_converted(self):
+        """Ein Meldeintervall als Zeichenkette wird als Zahl gelesen"""
+        detector = OfflineDetector(timeout=900, missed_reports=3, tick=5)
+        assert detector.timeout_for("60") == 180.0
+
+    def test_invalid_interval_uses_default_timeout(self):
+        """Ungültige Meldeintervalle ergeben die Standard-Frist"""
+        detector = OfflineDetector(timeout=900, missed_reports=3, tick=5, now=1000.0)
+        for interval in ("schnell", [60], 0, -5, "nan", float("inf")):
+            assert detector.timeout_for(interval) == 900
+
+        detector.heartbeat("SAD-001", timestamp=1000.0, report_interval="schnell")
+        assert detector.expired(now=1895.0) == []
+        assert detector.expired(now=1905.0) == [("SAD-001", 1000.0)]
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Tests für den Sensordaten-Ringpuffer des SwissAirDry-Projekts
+"""
+
+from swissairdry.api.sensor_store import SensorSeries, SensorStore
+from swissairdry.api.state_snapshot import (
+    capture_snapshot, dump_snapshot, write_snapshot, load_snapshot
+)
+
+
+class TestSensorSeries:
+    """Testklasse für den Ringpuffer eines Geräts"""
+
+    def test_overwrites_oldest_when_full(self):
+        """Bei voller Kapazität wird die älteste Messung überschrieben"""
+        series = SensorSeries(capacity=3)
+        for i in range(5):
+            series.append({"temperature": float(i)}, timestamp=1000.0 + i)
+
+        records = series.records()
+        assert len(series) == 3
+        assert [record["temperature"] for record in records] == [2.0, 3.0, 4.0]
+        assert [record["temperature"] for record in series.records(limit=2)] == [3.0, 4.0]
+
+    def test_missing_values_roundtrip(self):
+        """Fehlende Werte werden als None zurückgegeben"""
+        series = SensorSeries(capacity=2)
+        series.append({"humidity": 55.0, "relay_state": True, "runtime": 60}, timestamp=1000.0)
+
+        record = series.records()[0]
+        assert record["temperature"] is None
+        assert record["humidity"] == 55.0
+        assert record["relay_state"] is True
+        assert record["runtime"] == 60
+
+    def test_window_stats(self):
+        """Statistiken berücksichtigen nur Messungen im Zeitfenster"""
+        series = SensorSeries(capacity=4)
+        for i, value in enumerate([10.0, 20.0, None, 30.0, 40.0]):
+            series.append({"temperature": value}, timestamp=1000.0 + i)
+
+        stats = series.stats(start=1002.0, end=1003.0)["temperature"]
+        assert stats == {"min": 30.0, "max": 30.0, "mean": 30.0, "count": 1}
+
+        stats = series.stats()["temperature"]
+        assert stats["min"] == 20.0
+        assert stats["max"] == 40.0
+        assert stats["mean"] == 30.0
+        assert stats["count"] == 3
+
+    def test_buffers_grow_up_to_capacity(self):
+        """Die Arrays wachsen mit den Messungen und laufen erst bei voller Kapazität um"""
+        series = SensorSeries(capacity=40)
+        for i in range(50):
+            series.append({"temperature": float(i)}, timestamp=1000.0 + i)
+
+        assert len(series.timestamps) == 40
+        assert [record["temperature"] for record in series.records()] == [float(i) for i in range(10, 50)]
+        assert series.stats()["temperature"]["min"] == 10.0
+
+    def test_single_reading_uses_little_memory(self):
+        """Ein Gerät mit einer Messung belegt nicht die volle Kapazität"""
+        series = SensorSeries(capacity=10080)
+        series.append({"temperature": 21.0}, timestamp=1000.0)
+
+        assert series.memory_usage() < 1024
+        assert series.records()[0]["temperature"] == 21.0
+
+
+class TestSensorStore:
+    """Testklasse für den Sensordaten-Speicher"""
+
+    def test_creates_series_per_device(self):
+        """Für jedes Gerät wird ein eigener Puffer angelegt"""
+        store = SensorStore(capacity=10)
+        store.append("device001", {"temperature": 21.0})
+        store.append("device002", {"temperature": 22.0})
+
+        assert "device001" in store
+        assert len(store) == 2
+        assert store.get("device002").records()[0]["temperature"] == 22.0
+        assert store.memory_usage() > 0
+
+
+class TestStateSnapshot:
+    """Testklasse für die Snapshots der einfachen API"""
+
+    def test_roundtrip(self, tmp_path):
+        """Geräte und Ringpuffer überstehen Speichern und Laden"""
+        store = SensorStore(capacity=4)
+        for i in range(6):
+            store.append("device001", {"temperature": float(i), "relay_state": i % 2}, timestamp=1000.0 + i)
+        devices = {"device001": {"id": 1, "device_id": "device001", "status": "online"}}
+
+        path = str(tmp_path / "state.bin")
+        write_snapshot(capture_snapshot(devices, store), path)
+        restored_devices, restored = load_snapshot(path, capacity=4)
+
+        assert restored_devices == devices
+        assert restored.get("device001").records() == store.get("device001").records()
+
+    def test_restore_with_smaller_capacity(self, tmp_path):
+        """Bei kleinerer Kapazität bleiben die neuesten Messungen erhalten"""
+        store = SensorStore(capacity=4)
+        for i in range(4):
+            store.append("device001", {"temperature": float(i)}, timestamp=1000.0 + i)
+
+        path = str(tmp_path / "state.bin")
+        write_snapshot(capture_snapshot({}, store), path)
+        _, restored = load_snapshot(path, capacity=2)
+
+        assert [r["temperature"] for r in restored.get("device001").records()] == [2.0, 3.0]
+
+    def test_only_valid_samples_are_written(self, tmp_path):
+        """Der Snapshot enthält nur die belegten Einträge, nicht die volle Kapazität"""
+        store = SensorStore(capacity=10080)
+        store.append("device001", {"temperature": 21.0}, timestamp=1000.0)
+        store.append("device002", {"humidity": 55.0}, timestamp=1001.0)
+
+        path = tmp_path / "state.bin"
+        dump_snapshot({}, list(store.items()), str(path))
+        _, restored = load_snapshot(str(path), capacity=10080)
+
+        assert path.stat().st_size < 1024
+        assert restored.get("device002").records() == store.get("device002").records()
+        restored.append("device001", {"temperature": 22.0}, timestamp=1002.0)
+        assert [r["temperature"] for r in restored.get("device001").records()] == [21.0, 22.0]